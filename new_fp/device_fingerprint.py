@@ -1,9 +1,22 @@
+import os
+import json
+import shutil
+import tempfile
+import contextlib
 import pandas as pd
 import numpy as np
-import uuid
 import time
 from collections import defaultdict
 import psutil
+from concurrent.futures import ProcessPoolExecutor
+
+from fingerprint_store import (SignatureStore, InvertedIndex, CandidateSet, CategoryDictionary, FingerprintIdMap,
+                               save_category_dictionaries, load_category_dictionaries)
+from fingerprint_io import (external_sort_csv, open_result_writer, write_results, now_ms, parse_times_ms,
+                           columnar_input_format, read_columnar_input, iter_columnar_input)
+from fingerprint_metrics import MatcherMetrics
+from fingerprint_trace import FingerprintTracer
+from fingerprint_profile import DatasetProfile, profile_csv
 
 # Try to use numba for critical functions
 try:
@@ -21,6 +34,213 @@ except ImportError:
         return decorator
 
 
+# Bump whenever the on-disk layout written by SmartFingerprintProcessor.save_snapshot changes; load_snapshot
+# only reads this version
+SNAPSHOT_FORMAT_VERSION = 4
+
+# The compiled kernel links every active fingerprint into its posting lists before matching (about as costly
+# as matching 1/16 as many rows in python), so engine='numba' falls back to python for smaller batches
+NUMBA_MIN_BATCH_FRACTION = 1 / 16
+
+# Feature values treated as missing, on top of real nulls
+NULL_FEATURE_VALUES = ['[]', '{}', '', 'nan', 'None']
+
+
+def _previous_snapshot_path(path):
+    return os.path.normpath(path) + '.previous'
+
+
+def snapshot_exists(path):
+    """
+    Whether `path` holds a complete snapshot. A save_snapshot interrupted after moving the previous
+    snapshot aside is rolled back first, so the previous snapshot is found again.
+    """
+    previous_path = _previous_snapshot_path(path)
+    if not os.path.exists(path) and os.path.exists(os.path.join(previous_path, 'manifest.json')):
+        os.replace(previous_path, path)
+    return os.path.exists(os.path.join(path, 'manifest.json'))
+
+
+# Compiled matching engine (engine="numba").
+# The index is kept as intrusive doubly-linked lists over flat int32 arrays so the whole row loop can
+# run in nopython mode: for fingerprint fp and feature j, next_fp[fp, j] / prev_fp[fp, j] link fp into
+# the posting list of its current code, whose head and size live at slot value_offsets[j] + code.
+
+@jit(nopython=True, cache=True)
+def _link_posting(fingerprint_id, feature_idx, slot, heads, counts, next_fp, prev_fp):
+    head = heads[slot]
+    next_fp[fingerprint_id, feature_idx] = head
+    prev_fp[fingerprint_id, feature_idx] = -1
+    if head >= 0:
+        prev_fp[head, feature_idx] = fingerprint_id
+    heads[slot] = fingerprint_id
+    counts[slot] += 1
+
+
+@jit(nopython=True, cache=True)
+def _unlink_posting(fingerprint_id, feature_idx, slot, heads, counts, next_fp, prev_fp):
+    prev_id = prev_fp[fingerprint_id, feature_idx]
+    next_id = next_fp[fingerprint_id, feature_idx]
+    if prev_id >= 0:
+        next_fp[prev_id, feature_idx] = next_id
+    else:
+        heads[slot] = next_id
+    if next_id >= 0:
+        prev_fp[next_id, feature_idx] = prev_id
+    counts[slot] -= 1
+
+
+@jit(nopython=True, cache=True)
+def _agrees_on_reducers(row_codes, row, signatures, fingerprint_id, n_reducers):
+    for j in range(1, 1 + n_reducers):
+        code = row_codes[row, j]
+        if code >= 0 and signatures[fingerprint_id, j] != code:
+            return False
+    return True
+
+
+@jit(nopython=True, cache=True)
+def _match_rows_kernel(row_codes, signatures, n_fingerprints, value_offsets, n_values, n_reducers):
+    """
+    Run the anchor, reducer and matcher phases over encoded rows.
+
+    Feature columns are ordered [anchor, reducers..., matchers...]. `signatures` must have room for
+    n_fingerprints + n_rows rows and is updated in place.
+
+    Returns (fingerprint id per row, matched feature index per row or -1 for a new fingerprint,
+    final fingerprint count, ids of the existing fingerprints that matched a row, and their signatures
+    before the batch), so the caller can update its index from what changed.
+    """
+    n_rows, n_features = row_codes.shape
+    # Only ids up to n_fingerprints + n_rows can be used, however large the signature matrix is
+    capacity = n_fingerprints + n_rows
+    n_existing = n_fingerprints
+
+    heads = np.full(n_values, -1, dtype=np.int32)
+    counts = np.zeros(n_values, dtype=np.int32)
+    next_fp = np.full((capacity, n_features), -1, dtype=np.int32)
+    prev_fp = np.full((capacity, n_features), -1, dtype=np.int32)
+
+    # Index the fingerprints we already know about
+    for fingerprint_id in range(n_fingerprints):
+        for j in range(n_features):
+            code = signatures[fingerprint_id, j]
+            if code >= 0:
+                _link_posting(fingerprint_id, j, value_offsets[j] + code, heads, counts, next_fp, prev_fp)
+
+    out_fingerprint = np.empty(n_rows, dtype=np.int64)
+    out_feature = np.full(n_rows, -1, dtype=np.int32)
+    candidates = np.empty(capacity, dtype=np.int32)
+    matched_before = np.zeros(n_existing, dtype=np.bool_)
+    matched_ids = np.empty(n_rows, dtype=np.int64)
+    old_signatures = np.empty((n_rows, n_features), dtype=np.int32)
+    n_matched = 0
+
+    for row in range(n_rows):
+        matched_id = -1
+        matched_feature = -1
+
+        # Phase 1: anchor
+        anchor_code = row_codes[row, 0]
+        if anchor_code >= 0:
+            fingerprint_id = heads[value_offsets[0] + anchor_code]
+            while fingerprint_id >= 0:
+                if matched_id < 0 or fingerprint_id < matched_id:
+                    matched_id = fingerprint_id
+                fingerprint_id = next_fp[fingerprint_id, 0]
+            if matched_id >= 0:
+                matched_feature = 0
+
+        if matched_id < 0:
+            # Phase 2: find the smallest reducer posting list; a present reducer value without fingerprints
+            # rules out a match
+            best_reducer = -1
+            best_count = 0
+            has_empty_reducer = False
+            for j in range(1, 1 + n_reducers):
+                code = row_codes[row, j]
+                if code < 0:
+                    continue
+                count = counts[value_offsets[j] + code]
+                if count == 0:
+                    has_empty_reducer = True
+                    break
+                if best_reducer < 0 or count < best_count:
+                    best_reducer = j
+                    best_count = count
+
+            if best_reducer >= 0 and not has_empty_reducer:
+                # Phase 3: first matcher (in feature order) shared with a candidate, oldest fingerprint wins.
+                # A matcher posting list no longer than the candidate bound is walked and checked against
+                # the reducers; otherwise the candidates are collected once from the smallest reducer list.
+                n_candidates = -1
+                for j in range(1 + n_reducers, n_features):
+                    code = row_codes[row, j]
+                    if code < 0:
+                        continue
+                    slot = value_offsets[j] + code
+                    if counts[slot] == 0:
+                        continue
+
+                    if counts[slot] <= (n_candidates if n_candidates >= 0 else best_count):
+                        fingerprint_id = heads[slot]
+                        while fingerprint_id >= 0:
+                            if (matched_id < 0 or fingerprint_id < matched_id) and _agrees_on_reducers(
+                                    row_codes, row, signatures, fingerprint_id, n_reducers):
+                                matched_id = fingerprint_id
+                            fingerprint_id = next_fp[fingerprint_id, j]
+                    else:
+                        if n_candidates < 0:
+                            n_candidates = 0
+                            fingerprint_id = heads[value_offsets[best_reducer] + row_codes[row, best_reducer]]
+                            while fingerprint_id >= 0:
+                                if _agrees_on_reducers(row_codes, row, signatures, fingerprint_id, n_reducers):
+                                    candidates[n_candidates] = fingerprint_id
+                                    n_candidates += 1
+                                fingerprint_id = next_fp[fingerprint_id, best_reducer]
+                            if n_candidates == 0:
+                                break
+                        for k in range(n_candidates):
+                            fingerprint_id = candidates[k]
+                            if signatures[fingerprint_id, j] == code and (matched_id < 0 or fingerprint_id < matched_id):
+                                matched_id = fingerprint_id
+
+                    if matched_id >= 0:
+                        matched_feature = j
+                        break
+
+        if matched_id < 0:
+            # Register a new fingerprint
+            matched_id = n_fingerprints
+            n_fingerprints += 1
+            for j in range(n_features):
+                code = row_codes[row, j]
+                if code >= 0:
+                    signatures[matched_id, j] = code
+                    _link_posting(matched_id, j, value_offsets[j] + code, heads, counts, next_fp, prev_fp)
+        else:
+            if matched_id < n_existing and not matched_before[matched_id]:
+                matched_before[matched_id] = True
+                matched_ids[n_matched] = matched_id
+                old_signatures[n_matched] = signatures[matched_id]
+                n_matched += 1
+            # Update the matched fingerprint with the latest values
+            for j in range(n_features):
+                code = row_codes[row, j]
+                existing = signatures[matched_id, j]
+                if code < 0 or code == existing:
+                    continue
+                if existing >= 0:
+                    _unlink_posting(matched_id, j, value_offsets[j] + existing, heads, counts, next_fp, prev_fp)
+                signatures[matched_id, j] = code
+                _link_posting(matched_id, j, value_offsets[j] + code, heads, counts, next_fp, prev_fp)
+
+        out_fingerprint[row] = matched_id
+        out_feature[row] = matched_feature
+
+    return out_fingerprint, out_feature, n_fingerprints, matched_ids[:n_matched], old_signatures[:n_matched]
+
+
 class SmartFingerprintProcessor:
     """
     Smart fingerprint processor that maintains complete matching capability while optimizing performance:
@@ -30,143 +250,468 @@ class SmartFingerprintProcessor:
     4. Memory-efficient storage of fingerprint metadata
     """
 
-    def __init__(self, debug_anchor_value=None):
-        # Store fingerprint signatures: fingerprint_id -> {feature -> latest_value}
-        self.fingerprint_signatures = {}
-        # Reverse lookup: feature_value -> set of fingerprint_ids that have this value
-        self.feature_to_fingerprints = {}
-        # Track which features are most discriminative for each fingerprint
-        self.fingerprint_discriminators = {}
-
+    def __init__(self, debug_anchor_value=None, category_dictionaries=None, metrics=None, tracer=None,
+                 id_seed=None):
+        # Store fingerprint signatures: dense fingerprint_id -> row of latest encoded feature values
+        self.signature_store = None
+        # Dense fingerprint id -> external (output) id, derived from the seed when results are written
+        self.id_map = FingerprintIdMap(id_seed)
+        # Reverse lookup: feature -> feature_value -> posting list of fingerprint_ids that have this value
+        self.inverted_index = None
+        # Append-only value -> code dictionary per feature, so codes stay stable across batches.
+        # May be shared with other processors (e.g. loaded with load_category_dictionaries).
+        self.category_dictionaries = category_dictionaries if category_dictionaries is not None else {}
+
+        # Optional MatcherMetrics collecting hot-path counters
+        self.metrics = metrics
+
+        # Optional FingerprintTracer; debug_anchor_value is shorthand for tracing a single anchor
         self.debug_anchor_value = debug_anchor_value
-        self.debug_logs = []  # Store all debug events
-
-    def _debug_log(self, message, row_idx=None):
-        """Log debug message if we're tracking this anchor."""
-        log_entry = {
-            'row_idx': row_idx,
-            'message': message,
-            'timestamp': time.time()
-        }
-        self.debug_logs.append(log_entry)
-        print(f"[DEBUG Row {row_idx}] {message}")
+        if tracer is None and debug_anchor_value:
+            tracer = FingerprintTracer(anchor_values=[debug_anchor_value])
+        self.tracer = tracer
+
+        # Optional ColdFingerprintTier holding evicted fingerprints on disk (see fingerprint_pool)
+        self.cold_tier = None
+        # Fingerprints evicted or expired (inactive in the signature store); their dense ids stay reserved
+        self.n_inactive = 0
+
+    @property
+    def debug_logs(self):
+        """Trace events still held in the tracer's ring buffer."""
+        return list(self.tracer.events) if self.tracer is not None else []
+
+    def _debug_log(self, message, row_idx=None, **fields):
+        """Record a trace event for a traced row."""
+        self.tracer.log(message, row_idx, **fields)
 
     def process_fingerprints_smart(self, df, initial_anchor_feature, search_space_reducers,
-                                   final_identification_features):
+                                   final_identification_features, engine='python', time_column=None,
+                                   anchor_fast_path=True):
         """
         Smart processing that maintains complete fingerprint signatures.
+
+        engine='numba' runs the matching loop as a compiled kernel; it falls back to the python
+        engine when numba is not installed, when tracing is enabled, or when the batch is small next to
+        the number of active fingerprints (see NUMBA_MIN_BATCH_FRACTION).
+
+        With anchor_fast_path, anchor groups that can only ever match themselves are fingerprinted
+        vectorized (see _anchor_only_pass) and only the remaining rows go through the matching loop.
+
+        Every fingerprint remembers when it was last seen: the `time_column` value of its latest row
+        when given, otherwise the time of this call.
+
+        Fingerprints are dense integer ids internally; they are mapped to external ids (see
+        FingerprintIdMap) only when the result is built.
+        """
+        try:
+            fingerprint_rows, feature_rows = self._match_batch(
+                df, initial_anchor_feature, search_space_reducers, final_identification_features, engine=engine,
+                time_column=time_column, anchor_fast_path=anchor_fast_path
+            )
+        finally:
+            if self.tracer is not None:
+                # Events of a later batch reopen the trace file
+                self.tracer.close()
+
+        all_features = [initial_anchor_feature] + search_space_reducers + final_identification_features
+        new_fingerprints = self.id_map.external_ids(fingerprint_rows)
+        is_new_fingerprint = feature_rows < 0
+        # Index -1 (no match) picks the trailing 'No Match' label
+        match_at_feature = np.asarray(all_features + ['No Match'], dtype=object)[feature_rows]
+
+        # Create result DataFrame
+        result_df = df.copy()
+        result_df['new_fingerprint'] = new_fingerprints
+        result_df['is_new_fingerprint'] = is_new_fingerprint
+        result_df['match_at_feature'] = match_at_feature
+
+        print(f"Final fingerprint count: {len(self.signature_store):,}")
+        return result_df
+
+    def _match_batch(self, df, initial_anchor_feature, search_space_reducers, final_identification_features,
+                     engine='python', time_column=None, anchor_fast_path=True):
         """
+        Match a batch and update the state; returns (dense fingerprint id per row, matched feature index
+        per row or -1 for a new fingerprint).
+        """
+        if engine not in ('python', 'numba'):
+            raise ValueError(f"Unknown engine '{engine}', expected 'python' or 'numba'")
         n_rows = len(df)
         print(f"Processing {n_rows:,} rows with smart signature matching...")
 
-        if self.debug_anchor_value:
-            debug_rows = df[df[initial_anchor_feature] == self.debug_anchor_value].index.tolist()
+        # Traced rows are located once, so the row loop only does a set lookup per row
+        traced_rows = frozenset()
+        if self.tracer is not None:
+            traced_rows = self.tracer.traced_rows(df[initial_anchor_feature])
             print(f"\n{'='*80}")
-            print(f"DEBUG MODE: Tracking anchor value '{self.debug_anchor_value}'")
-            print(f"Found {len(debug_rows)} rows with this anchor: {debug_rows[:10]}")
+            print(f"DEBUG MODE: Tracking anchor values {sorted(self.tracer.anchor_values)} "
+                  f"and fingerprints {sorted(self.tracer.fingerprint_ids)}")
+            print(f"Found {len(traced_rows)} rows with these anchors: {sorted(traced_rows)[:10]}")
             print(f"{'='*80}\n")
 
+        all_features = [initial_anchor_feature] + search_space_reducers + final_identification_features
+        # Codes at or past the dictionary sizes are values this batch sees for the first time
+        known_codes = [len(self.category_dictionaries.get(feature, ())) for feature in all_features]
+
         # Preprocess features
         encoded_arrays, feature_info = self._preprocess_features(
             df, initial_anchor_feature, search_space_reducers, final_identification_features
         )
 
-        # DEBUG: Show encoding for our target anchor value
-        if self.debug_anchor_value:
-            anchor_series = df[initial_anchor_feature]
-            mask = anchor_series == self.debug_anchor_value
-            if mask.any():
-                encoded_val = encoded_arrays[initial_anchor_feature][mask][0]
+        # DEBUG: Show encoding for the traced anchor values
+        if self.tracer is not None:
+            dictionary = feature_info[initial_anchor_feature]['dictionary']
+            for anchor_value in sorted(self.tracer.anchor_values):
+                encoded_val = dictionary.lookup(anchor_value)
                 print(f"\n{'=' * 80}")
                 print(f"ENCODING INFO:")
-                print(f"Original value: '{self.debug_anchor_value}'")
+                print(f"Original value: '{anchor_value}'")
                 print(f"Encoded as: {encoded_val}")
-                print(f"Category index: {encoded_val}")
-
-                # Show the category mapping
-                categories = feature_info[initial_anchor_feature]['categories']
-                print(f"Total categories: {len(categories)}")
-                if encoded_val >= 0 and encoded_val < len(categories):
-                    print(f"Decodes back to: '{categories[encoded_val]}'")
+                print(f"Total categories: {len(dictionary)}")
+                if encoded_val >= 0:
+                    print(f"Decodes back to: '{dictionary.decode(encoded_val)}'")
                 print(f"{'=' * 80}\n")
 
-        all_features = [initial_anchor_feature] + search_space_reducers + final_identification_features
+        # Initialize signature and feature lookup structures
+        self._ensure_state(all_features)
 
-        # Initialize feature lookup structures
-        for feature in all_features:
-            self.feature_to_fingerprints[feature] = defaultdict(set)
+        if engine == 'numba' and not NUMBA_AVAILABLE:
+            print("WARNING: numba is not installed, falling back to engine='python'")
+            engine = 'python'
+        if engine == 'numba' and self.tracer is not None:
+            print("WARNING: tracing is only supported by the python engine, falling back to engine='python'")
+            engine = 'python'
 
-        # Pre-allocate results
-        new_fingerprints = np.empty(n_rows, dtype=object)
-        is_new_fingerprint = np.zeros(n_rows, dtype=bool)
-        match_at_feature = np.full(n_rows, 'No Match', dtype=object)
+        # Feature columns side by side: row i holds the codes of row i in feature order (-1 = missing)
+        row_codes = np.column_stack([encoded_arrays[feature] for feature in all_features]).astype(np.int32)
 
-        start_time = time.time()
+        # Evicted fingerprints sharing a value with this batch must be back in the index before matching
+        if self.cold_tier is not None:
+            self.cold_tier.reload_matching(self, row_codes)
 
-        for current_idx in range(n_rows):
-            if current_idx % 10000 == 0:
-                self._print_progress(current_idx, n_rows, start_time)
-
-            # Extract current row signature
-            current_signature = self._extract_signature(current_idx, encoded_arrays, all_features)
-
-            # DEBUG: Check if this is one of our target rows
-            is_debug_row = False
-            if self.debug_anchor_value:
-                original_anchor_val = df.iloc[current_idx][initial_anchor_feature]
-                if original_anchor_val == self.debug_anchor_value:
-                    is_debug_row = True
-                    self._debug_log(f"\n{'=' * 80}", current_idx)
-                    self._debug_log(f"PROCESSING TARGET ROW", current_idx)
-                    self._debug_log(f"Original anchor value: '{original_anchor_val}'", current_idx)
-                    self._debug_log(f"Encoded anchor value: {current_signature.get(initial_anchor_feature)}",
-                                    current_idx)
-                    self._debug_log(f"Full signature: {current_signature}", current_idx)
-
-                    # Show current state of feature_to_fingerprints for anchor
-                    anchor_encoded = current_signature.get(initial_anchor_feature)
-                    if anchor_encoded is not None:
-                        existing_fps = self.feature_to_fingerprints[initial_anchor_feature].get(anchor_encoded, set())
-                        self._debug_log(f"Existing fingerprints with this encoded anchor: {existing_fps}", current_idx)
-
-                        # Show details of each existing fingerprint
-                        for fp_id in existing_fps:
-                            fp_sig = self.fingerprint_signatures.get(fp_id, {})
-                            self._debug_log(f"  Fingerprint {fp_id}: {fp_sig}", current_idx)
-
-            # Find matching fingerprint using smart signature matching
-            match_result = self._find_match_by_signature(
-                current_signature, initial_anchor_feature, search_space_reducers,
-                final_identification_features, all_features
+        match_start = time.time()
+        loop_rows, loop_codes, batch_rows = None, row_codes, None
+        if anchor_fast_path and n_rows:
+            loop_rows, loop_codes, assigned, group_first = self._anchor_only_pass(
+                row_codes, len(search_space_reducers), known_codes, traced_rows
+            )
+            # Traced rows always go through the loop; map them to their loop positions
+            loop_position = np.cumsum(loop_rows) - 1
+            traced_rows = frozenset(loop_position[sorted(traced_rows)].tolist())
+            batch_rows = np.flatnonzero(loop_rows)
+
+        if engine == 'numba' and loop_codes.shape[0] < self.n_active * NUMBA_MIN_BATCH_FRACTION:
+            print(f"Matching {loop_codes.shape[0]:,} rows against {self.n_active:,} fingerprints with "
+                  f"engine='python' (batch too small for the compiled kernel)")
+            engine = 'python'
+        if engine == 'numba':
+            fingerprint_rows, feature_rows = self._match_rows_numba(loop_codes, len(search_space_reducers))
+        else:
+            fingerprint_rows, feature_rows = self._match_rows_python(
+                loop_codes, len(search_space_reducers), all_features, traced_rows, batch_rows=batch_rows
             )
 
-            if match_result:
-                fingerprint_id = match_result['fingerprint']
-                new_fingerprints[current_idx] = fingerprint_id
-                is_new_fingerprint[current_idx] = False
-                match_at_feature[current_idx] = match_result['feature']
+        if loop_rows is not None:
+            # Expand back to all rows: fast-path rows other than the first row of a new group match at the anchor
+            all_fingerprint_rows = assigned
+            all_feature_rows = np.zeros(n_rows, dtype=np.int32)
+            all_fingerprint_rows[loop_rows] = fingerprint_rows
+            all_feature_rows[loop_rows] = feature_rows
+            grouped_rows = np.flatnonzero(group_first >= 0)
+            all_fingerprint_rows[grouped_rows] = all_fingerprint_rows[group_first[grouped_rows]]
+            fingerprint_rows, feature_rows = all_fingerprint_rows, all_feature_rows
+
+        if time_column:
+            self._touch_by_time(fingerprint_rows, df[time_column])
+        else:
+            self.signature_store.touch(fingerprint_rows, now_ms())
+
+        if self.metrics is not None:
+            self.metrics.record_batch(all_features, feature_rows, time.time() - match_start)
+            self.metrics.observe_state(self)
+            self.metrics.emit(force=True)
+
+        return fingerprint_rows, feature_rows
+
+    def _touch_by_time(self, fingerprint_rows, times):
+        """
+        Advance last_seen from the rows' times. Rows with a null or unparseable time leave their fingerprint's
+        last_seen alone, so they never move the data clock; a fingerprint created only by such rows gets the
+        latest valid time seen so far.
+        """
+        store = self.signature_store
+        times = parse_times_ms(times, fill_missing=False)
+        valid = ~np.isnan(times)
+        store.touch(fingerprint_rows[valid], times[valid].astype(np.int64))
 
-                # Update fingerprint signature with new values (incremental learning)
-                self._update_fingerprint_signature(fingerprint_id, current_signature, all_features)
+        untimed = fingerprint_rows[~valid]
+        untimed = untimed[store.last_seen[untimed] == 0]
+        if untimed.size:
+            store.last_seen[untimed] = store.last_seen[:store.n_fingerprints].max()
 
-            else:
-                # Create new fingerprint
-                fingerprint_id = f"new_{uuid.uuid4()}"
-                new_fingerprints[current_idx] = fingerprint_id
-                is_new_fingerprint[current_idx] = True
-                match_at_feature[current_idx] = 'No Match'
+    def _anchor_only_pass(self, row_codes, n_reducers, known_codes, traced_rows=frozenset()):
+        """
+        Vectorized pre-pass for anchor groups the sequential loop would resolve at the anchor alone.
+
+        Rows are linked through shared anchor and matcher values; reducers alone never produce a match,
+        so shared reducer values do not link rows. A linked group whose rows all carry the same anchor
+        value qualifies when either:
+        - its anchor already has a fingerprint and none of that fingerprint's matcher values occurs in
+          rows outside the group: every row matches it at the anchor and nothing else can reach it, or
+        - none of its anchor / matcher values is in the index: its first row creates a fingerprint that
+          every later row matches at the anchor, and nothing outside the group can match it.
+
+        Fingerprints of the first kind get the group's final signature (the latest value of every
+        feature) right away. Groups of the second kind are collapsed into their first row carrying the
+        final signature, so the matching loop creates the same fingerprint at the same position in the
+        id order as the row-by-row run.
+
+        Returns:
+            (loop_rows, loop_codes, assigned, group_first): mask of the rows kept for the matching loop
+            and their codes, per row the existing fingerprint it was matched to (-1 if none), and per
+            row the first row of its collapsed group (-1 if none)
+        """
+        n_rows, n_features = row_codes.shape
+        link_features = [0] + list(range(n_reducers + 1, n_features))
+        labels = label_connected_components({feature_idx: row_codes[:, feature_idx] for feature_idx in link_features},
+                                            link_features)
+        # Per-component flags are stored at the component label (its first row)
+        anchor_codes = row_codes[:, 0]
+        disqualified = np.zeros(n_rows, dtype=bool)
+        disqualified[labels[(anchor_codes < 0) | (anchor_codes != anchor_codes[labels])]] = True
+        disqualified[labels[np.fromiter(traced_rows, dtype=np.int64, count=len(traced_rows))]] = True
+
+        has_fingerprint = np.zeros(n_rows, dtype=bool)
+        touches_index = np.zeros(n_rows, dtype=bool)
+        postings = self.inverted_index.postings
+        for feature_idx in link_features:
+            column = row_codes[:, feature_idx]
+            # Only values the dictionary knew before this batch can have fingerprints
+            known_rows = np.flatnonzero((column >= 0) & (column < known_codes[feature_idx]))
+            if not known_rows.size:
+                continue
+            values = np.unique(column[known_rows])
+            indexed = np.fromiter((value in postings[feature_idx] for value in values.tolist()),
+                                  dtype=bool, count=values.size)
+            if indexed.any():
+                flags = has_fingerprint if feature_idx == 0 else touches_index
+                flags[labels[known_rows[np.isin(column[known_rows], values[indexed])]]] = True
+
+        components = np.flatnonzero((labels == np.arange(n_rows)) & ~disqualified)
+        existing_groups = components[has_fingerprint[components]]
+        new_groups = components[~has_fingerprint[components] & ~touches_index[components]]
+
+        # The fingerprint an existing group matches must not be reachable from rows outside the group
+        group_fingerprints = np.array([self._match_anchor(anchor) for anchor in anchor_codes[existing_groups].tolist()],
+                                      dtype=np.int64)
+        reachable = np.isin(group_fingerprints, list(self._traced_fingerprints()))
+        fingerprint_codes = self.signature_store.codes[group_fingerprints]
+        for feature_idx in link_features[1:]:
+            column = row_codes[:, feature_idx]
+            present = np.flatnonzero(column >= 0)
+            # Distinct (value, component) pairs, then per value its first component and component count
+            pairs = np.unique(column[present].astype(np.int64) * n_rows + labels[present])
+            values, first_pair, n_components = np.unique(pairs // n_rows, return_index=True, return_counts=True)
+            if not values.size:
+                # No row of the batch has this feature, so it cannot reach any fingerprint
+                continue
+            owner = pairs[first_pair] % n_rows
+
+            stored = fingerprint_codes[:, feature_idx]
+            position = np.minimum(np.searchsorted(values, stored), values.size - 1)
+            in_batch = (stored >= 0) & (values[position] == stored)
+            reachable |= in_batch & ((n_components[position] > 1) | (owner[position] != existing_groups))
+        existing_groups = existing_groups[~reachable]
+        group_fingerprints = group_fingerprints[~reachable]
+
+        # Final signature of every qualifying group: latest value per feature, rows are in time order
+        group_labels = np.concatenate((existing_groups, new_groups))
+        group_of_label = np.full(n_rows, -1, dtype=np.int64)
+        group_of_label[group_labels] = np.arange(group_labels.size)
+        group_of_row = group_of_label[labels]
+        grouped_rows = np.flatnonzero(group_of_row >= 0)
+        latest = np.full((group_labels.size, n_features), -1, dtype=np.int32)
+        for feature_idx in range(n_features):
+            present = grouped_rows[row_codes[grouped_rows, feature_idx] >= 0][::-1]
+            groups, first_hit = np.unique(group_of_row[present], return_index=True)
+            latest[groups, feature_idx] = row_codes[present[first_hit], feature_idx]
+
+        for fingerprint_id, codes in zip(group_fingerprints.tolist(), latest[:existing_groups.size].tolist()):
+            self._update_fingerprint_signature(fingerprint_id, codes)
+
+        assigned = np.full(n_rows, -1, dtype=np.int64)
+        is_existing = (group_of_row >= 0) & (group_of_row < existing_groups.size)
+        assigned[is_existing] = group_fingerprints[group_of_row[is_existing]]
+
+        in_new_group = group_of_row >= existing_groups.size
+        is_first = labels == np.arange(n_rows)
+        loop_rows = (group_of_row < 0) | (in_new_group & is_first)
+        group_first = np.where(in_new_group & ~is_first, labels, -1)
+
+        loop_codes = row_codes[loop_rows]
+        loop_codes[(np.cumsum(loop_rows) - 1)[new_groups]] = latest[existing_groups.size:]
+
+        print(f"Anchor-only fast path: {int(is_existing.sum()):,} rows matched {existing_groups.size:,} existing "
+              f"fingerprints, {int(in_new_group.sum()):,} rows collapsed into {new_groups.size:,} new ones, "
+              f"{int(loop_rows.sum()):,} rows left for the matching loop")
+        return loop_rows, loop_codes, assigned, group_first
+
+    def _ensure_state(self, all_features):
+        """Create the signature store and index on first use; later batches must use the same features."""
+        if self.signature_store is not None and self.signature_store.features != all_features:
+            raise ValueError(f"Processor state was built for features {self.signature_store.features}, "
+                             f"got {all_features}")
+        if self.signature_store is None:
+            self.signature_store = SignatureStore(all_features)
+            self.inverted_index = InvertedIndex(all_features)
+
+    def _match_rows_python(self, row_codes, n_reducers, all_features, traced_rows=frozenset(), block_size=10000,
+                           batch_rows=None):
+        """
+        Interpreted row-by-row matching loop.
 
-                # Register new fingerprint signature
-                self._register_new_fingerprint(fingerprint_id, current_signature, all_features)
+        Rows are read straight from the code matrix as plain int lists, one block at a time, so the loop
+        allocates no per-row dicts or sets. Rows in `traced_rows` (and rows matched to traced fingerprints)
+        are logged to the tracer, under their position in `batch_rows` (the batch row of every loop row) when
+        given. Returns (fingerprint id per row, matched feature index per row or -1 for a new fingerprint).
+        """
+        n_rows = row_codes.shape[0]
 
-        # Create result DataFrame
-        result_df = df.copy()
-        result_df['new_fingerprint'] = new_fingerprints
-        result_df['is_new_fingerprint'] = is_new_fingerprint
-        result_df['match_at_feature'] = match_at_feature
+        # Pre-allocate results
+        fingerprint_rows = np.empty(n_rows, dtype=np.int64)
+        feature_rows = np.full(n_rows, -1, dtype=np.int32)
 
-        print(f"Final fingerprint count: {len(self.fingerprint_signatures):,}")
-        return result_df
+        start_time = time.time()
+        find_match = self._find_match_instrumented if self.metrics is not None else self._find_match_by_codes
+
+        tracing = self.tracer is not None
+        traced_fingerprints = self._traced_fingerprints()
+
+        for block_start in range(0, n_rows, block_size):
+            self._print_progress(block_start, n_rows, start_time)
+            if self.metrics is not None:
+                self.metrics.observe_state(self)
+                self.metrics.emit()
+
+            for current_idx, codes in enumerate(row_codes[block_start:block_start + block_size].tolist(), block_start):
+                # DEBUG: Check if this is one of our target rows
+                traced = tracing and current_idx in traced_rows
+                if traced:
+                    self._debug_row(current_idx if batch_rows is None else int(batch_rows[current_idx]), codes,
+                                    all_features)
+
+                # Find matching fingerprint using smart signature matching
+                match_result = find_match(codes, n_reducers)
+
+                if match_result is not None:
+                    fingerprint_id, feature_idx = match_result
+                    feature_rows[current_idx] = feature_idx
+
+                    # Update fingerprint signature with new values (incremental learning)
+                    self._update_fingerprint_signature(fingerprint_id, codes)
+
+                else:
+                    # Create and register new fingerprint signature
+                    fingerprint_id = self._register_new_fingerprint(codes)
+
+                fingerprint_rows[current_idx] = fingerprint_id
+
+                if tracing and (traced or fingerprint_id in traced_fingerprints):
+                    self._trace_outcome(current_idx if batch_rows is None else int(batch_rows[current_idx]),
+                                        fingerprint_id, match_result, all_features)
+                    if traced and self.tracer.follow_fingerprints:
+                        traced_fingerprints.add(fingerprint_id)
+
+        return fingerprint_rows, feature_rows
+
+    def _traced_fingerprints(self):
+        """Dense ids of the fingerprints whose external id the tracer follows."""
+        if self.tracer is None or not self.tracer.fingerprint_ids or self.signature_store is None:
+            return set()
+        external_ids = self.id_map.external_ids(np.arange(self.signature_store.n_fingerprints))
+        return set(np.flatnonzero(np.isin(external_ids, list(self.tracer.fingerprint_ids))).tolist())
+
+    def _debug_row(self, current_idx, codes, all_features):
+        """Log the matching state before matching a traced row."""
+        anchor_encoded = codes[0]
+        original_anchor_val = self.category_dictionaries[all_features[0]].decode(anchor_encoded)
+        current_signature = {feature: code for feature, code in zip(all_features, codes) if code >= 0}
+        self._debug_log(f"\n{'=' * 80}", current_idx)
+        self._debug_log(f"PROCESSING TARGET ROW", current_idx)
+        self._debug_log(f"Original anchor value: '{original_anchor_val}'", current_idx)
+        self._debug_log(f"Encoded anchor value: {current_signature.get(all_features[0])}", current_idx)
+        self._debug_log(f"Full signature: {current_signature}", current_idx, signature=current_signature)
+
+        # Show current state of the inverted index for anchor
+        if anchor_encoded >= 0:
+            existing_fps = self.inverted_index.get(0, anchor_encoded).tolist()
+            self._debug_log(f"Existing fingerprints with this encoded anchor: {existing_fps}", current_idx)
+
+            # Show details of each existing fingerprint
+            for fp_id in existing_fps:
+                fp_sig = self.signature_store.signature(fp_id)
+                self._debug_log(f"  Fingerprint {self.id_map.external_id(fp_id)}: {fp_sig}", current_idx)
+
+    def _trace_outcome(self, current_idx, fingerprint_id, match_result, all_features):
+        """Log which fingerprint a traced row was assigned to and its signature after the update."""
+        external_id = self.id_map.external_id(fingerprint_id)
+        if match_result is None:
+            message = f"Created new fingerprint {external_id}"
+            matched_feature = None
+        else:
+            matched_feature = all_features[match_result[1]]
+            message = f"Matched fingerprint {external_id} at '{matched_feature}'"
+        self._debug_log(message, current_idx, fingerprint=external_id, matched_feature=matched_feature,
+                        signature=self.signature_store.signature(fingerprint_id))
+
+    def _match_rows_numba(self, row_codes, n_reducers):
+        """Compiled matching loop; produces the same assignments as _match_rows_python."""
+        store = self.signature_store
+        index = self.inverted_index
+        n_rows = row_codes.shape[0]
+        n_existing = store.n_fingerprints
+
+        # One posting slot per (feature, code); every code comes from the feature's dictionary
+        value_counts = np.array([len(self.category_dictionaries[feature]) for feature in store.features],
+                                dtype=np.int64)
+        value_offsets = np.concatenate(([0], np.cumsum(value_counts)[:-1])).astype(np.int64)
+
+        store.reserve(n_existing + n_rows)
+        print("Running compiled matching kernel...")
+        start_time = time.time()
+        out_fingerprint, out_feature, n_fingerprints, matched_ids, old_signatures = _match_rows_kernel(
+            row_codes, store.codes, n_existing, value_offsets, int(value_counts.sum()), n_reducers
+        )
+        elapsed = time.time() - start_time
+        print(f"Kernel processed {n_rows:,} rows in {elapsed:.1f}s ({n_rows / elapsed if elapsed > 0 else 0:.0f}/s)")
+
+        # Keep the python-side structures in sync so analysis and later batches see the same state; only
+        # the fingerprints the batch created or matched changed
+        n_fingerprints = int(n_fingerprints)
+        store.n_fingerprints = n_fingerprints
+        store.active[n_existing:n_fingerprints] = True
+
+        new_signatures = store.codes[matched_ids]
+        changed = new_signatures != old_signatures
+        store.n_present += int((changed & (old_signatures == store.MISSING)).sum())
+        positions, feature_indices = np.nonzero(changed)
+        for fingerprint_id, feature_idx, old_code, code in zip(
+                matched_ids[positions].tolist(), feature_indices.tolist(),
+                old_signatures[positions, feature_indices].tolist(), new_signatures[changed].tolist()):
+            if old_code != store.MISSING:
+                index.discard(feature_idx, old_code, fingerprint_id)
+            index.add(feature_idx, code, fingerprint_id)
+
+        created = store.codes[n_existing:n_fingerprints]
+        present = created != store.MISSING
+        store.n_present += int(present.sum())
+        offsets, feature_indices = np.nonzero(present)
+        for fingerprint_id, feature_idx, code in zip((offsets + n_existing).tolist(), feature_indices.tolist(),
+                                                     created[present].tolist()):
+            index.add(feature_idx, code, fingerprint_id)
+
+        return out_fingerprint, out_feature
 
     def _preprocess_features(self, df, initial_anchor_feature, search_space_reducers,
                              final_identification_features):
@@ -177,257 +722,320 @@ class SmartFingerprintProcessor:
 
         print("Preprocessing features...")
         for feature in all_features:
-            # More efficient cleaning
-            series = df[feature].astype('string')
-
-            # Replace empty values more efficiently
-            mask = series.isin(['[]', '{}', '', 'nan', 'None', np.nan]) | series.isna()
-            series = series.where(~mask, None)  # Use None instead of np.nan
-
-            # Use pandas categorical for better memory usage and faster comparison
-            cat_series = series.astype('category')
-            encoded_arrays[feature] = cat_series.cat.codes.values
+            # Encode through the feature's persistent dictionary: known values keep their code across
+            # batches and runs, unseen values are appended. Empty values are cleaned on the distinct
+            # values only and encode as missing.
+            dictionary = self.category_dictionaries.setdefault(feature, CategoryDictionary())
+            encoded_arrays[feature] = dictionary.encode(df[feature], null_values=NULL_FEATURE_VALUES)
             feature_info[feature] = {
-                'categories': cat_series.cat.categories,
-                'n_categories': len(cat_series.cat.categories)
+                'dictionary': dictionary,
+                'n_categories': len(dictionary)
             }
 
 
         return encoded_arrays, feature_info
 
-    def _extract_signature(self, row_idx, encoded_arrays, all_features):
-        """Extract signature for current row."""
-        signature = {}
-        for feature in all_features:
-            code = encoded_arrays[feature][row_idx]
-            signature[feature] = code if code >= 0 else None
-        return signature
-
-    def _find_match_by_signature(self, current_signature, initial_anchor_feature,
-                                 search_space_reducers, final_identification_features, all_features,
-                                 debug_row_idx=None):
+    def _find_match_by_codes(self, codes, n_reducers):
         """
-        Smart signature-based matching that's much faster than index intersection.
+        Smart signature-based matching for one encoded row.
+
+        `codes` lists the row's codes in feature order [anchor, reducers..., matchers...] with -1 for
+        missing values. Returns (fingerprint_id, matched feature index) or None.
         """
+        fingerprint_id = self._match_anchor(codes[0])
+        if fingerprint_id is not None:
+            return fingerprint_id, 0
 
-        # Phase 1: Quick anchor check
-        anchor_value = current_signature.get(initial_anchor_feature)
-
-        if debug_row_idx is not None:
-            self._debug_log(f"Phase 1: Anchor check", debug_row_idx)
-            self._debug_log(f"  Looking for anchor_value (encoded): {anchor_value}", debug_row_idx)
-            self._debug_log(
-                f"  Available encoded anchor values in lookup: {list(self.feature_to_fingerprints[initial_anchor_feature].keys())[:20]}",
-                debug_row_idx)
-
-        if anchor_value is not None:
-            anchor_candidates = self.feature_to_fingerprints[initial_anchor_feature].get(anchor_value, set())
-            if anchor_candidates:
-                # Check if any of these candidates is a perfect match on anchor
-                for fingerprint_id in anchor_candidates:
-                    if self._is_signature_match(fingerprint_id, current_signature, [initial_anchor_feature]):
-                        return {'fingerprint': fingerprint_id, 'feature': initial_anchor_feature}
-
-        # Phase 2: Search space reduction using signature intersection
-        candidate_fingerprints = None
-
-        # Find the most discriminative reducer feature first
-        best_feature = None
-        min_candidates = float('inf')
-
-        for feature in search_space_reducers:
-            feature_value = current_signature.get(feature)
-            if feature_value is None:
-                continue
+        candidates = self._reduce_candidates(codes, n_reducers)
+        if candidates is None:
+            return None
+        return self._identify_candidate(codes, candidates, n_reducers)
+
+    def _find_match_instrumented(self, codes, n_reducers):
+        """_find_match_by_codes that also records phase timings and candidate sizes in self.metrics."""
+        metrics = self.metrics
+        phase_seconds = metrics.phase_seconds
+        perf_counter = time.perf_counter
+
+        start = perf_counter()
+        fingerprint_id = self._match_anchor(codes[0])
+        anchor_done = perf_counter()
+        phase_seconds[0] += anchor_done - start
+        if fingerprint_id is not None:
+            return fingerprint_id, 0
+
+        candidates = self._reduce_candidates(codes, n_reducers)
+        reducer_done = perf_counter()
+        phase_seconds[1] += reducer_done - anchor_done
+        if candidates is None:
+            metrics.record_candidates(candidates)
+            return None
 
-            feature_candidates = self.feature_to_fingerprints[feature].get(feature_value, set())
-            if len(feature_candidates) < min_candidates and len(feature_candidates) > 0:
-                min_candidates = len(feature_candidates)
-                best_feature = feature
-                candidate_fingerprints = feature_candidates.copy()
+        match_result = self._identify_candidate(codes, candidates, n_reducers)
+        phase_seconds[2] += perf_counter() - reducer_done
+        # After phase 3, which decides whether the candidate set was materialized
+        metrics.record_candidates(candidates)
+        return match_result
+
+    def _match_anchor(self, anchor_value):
+        """Phase 1: Quick anchor check; every fingerprint in the anchor posting list carries this anchor value."""
+        if anchor_value >= 0:
+            anchor_posting = self.inverted_index.postings[0].get(anchor_value)
+            if anchor_posting is not None:
+                return anchor_posting if type(anchor_posting) is int else self.inverted_index.first(0, anchor_value)
+        return None
 
-        if candidate_fingerprints is None or not candidate_fingerprints:
-            return None
+    def _reduce_candidates(self, codes, n_reducers):
+        """
+        Phase 2: Search space reduction; any present reducer without fingerprints rules out a match.
 
-        # Intersect with other reducer features
-        for feature in search_space_reducers:
-            if feature == best_feature:
+        Returns None (no candidates), a single fingerprint id, or a CandidateSet of the reducer terms
+        (possibly empty) that phase 3 only intersects when probing the matcher postings would cost more.
+        """
+        postings = self.inverted_index.postings
+        reducer_terms = []
+        smallest_posting = None
+        smallest_count = 0
+        for feature_idx in range(1, n_reducers + 1):
+            feature_value = codes[feature_idx]
+            if feature_value < 0:
                 continue
 
-            feature_value = current_signature.get(feature)
-            if feature_value is None:
-                continue
+            posting = postings[feature_idx].get(feature_value)
+            if posting is None:
+                return None
 
-            feature_candidates = self.feature_to_fingerprints[feature].get(feature_value, set())
-            candidate_fingerprints &= feature_candidates
+            count = 1 if type(posting) is int else len(posting)
+            if smallest_posting is None or count < smallest_count:
+                smallest_posting = posting
+                smallest_count = count
+            reducer_terms.append((feature_idx, feature_value))
 
-            if not candidate_fingerprints:
-                return None
+        if smallest_posting is None:
+            return None
 
-        # Phase 3: Final identification using signature matching
-        for feature in final_identification_features:
-            feature_value = current_signature.get(feature)
-            if feature_value is None:
-                continue
+        if smallest_count == 1:
+            # Single candidate: a fingerprint is in the posting list of (feature, value) exactly when its
+            # stored code for that feature is value, so check its signature row directly
+            signature = self.signature_store.codes[smallest_posting]
+            for feature_idx, feature_value in reducer_terms:
+                if signature[feature_idx] != feature_value:
+                    return None
+            return smallest_posting
 
-            for fingerprint_id in candidate_fingerprints:
-                if self._is_signature_match(fingerprint_id, current_signature, [feature]):
-                    return {'fingerprint': fingerprint_id, 'feature': feature}
+        return CandidateSet(self.signature_store, self.inverted_index, reducer_terms, smallest_count)
 
-        return None
+    def _identify_candidate(self, codes, candidates, n_reducers):
+        """
+        Phase 3: Final identification; the first matcher shared with a candidate wins, oldest fingerprint first.
 
-    def _is_signature_match(self, fingerprint_id, current_signature, features_to_check):
-        """Check if current signature matches fingerprint signature on specified features."""
-        fingerprint_sig = self.fingerprint_signatures.get(fingerprint_id, {})
+        Each matcher value's posting list is probed and filtered by the reducer values when it is smaller
+        than the candidate set; otherwise the candidates are intersected (once) and their signature
+        column is scanned. The cost per row follows the smaller side instead of the candidate count.
+        """
+        if type(candidates) is int:
+            signature = self.signature_store.codes[candidates].tolist()
+            for feature_idx in range(n_reducers + 1, len(codes)):
+                feature_value = codes[feature_idx]
+                if feature_value >= 0 and signature[feature_idx] == feature_value:
+                    return candidates, feature_idx
+            return None
 
-        for feature in features_to_check:
-            current_val = current_signature.get(feature)
-            fingerprint_val = fingerprint_sig.get(feature)
+        postings = self.inverted_index.postings
+        candidate_ids = None
+        candidate_codes = None
+        for feature_idx in range(n_reducers + 1, len(codes)):
+            feature_value = codes[feature_idx]
+            if feature_value < 0:
+                continue
+            posting = postings[feature_idx].get(feature_value)
+            if posting is None:
+                continue
 
-            # Skip None/empty values
-            if current_val is None or fingerprint_val is None:
+            if type(posting) is int:
+                if posting in candidates:
+                    return posting, feature_idx
                 continue
 
-            if current_val == fingerprint_val:
-                return True
+            if len(posting) <= (candidate_ids.size if candidate_ids is not None else candidates.bound):
+                matched = candidates.filter(posting if type(posting) is np.ndarray else posting.to_array())
+            else:
+                if candidate_ids is None:
+                    candidate_ids = candidates.ids
+                    if not candidate_ids.size:
+                        return None
+                    candidate_codes = self.signature_store.codes[candidate_ids]
+                matched = candidate_ids[candidate_codes[:, feature_idx] == feature_value]
+            if matched.size:
+                # Oldest fingerprint wins when several candidates match
+                return int(matched[0]), feature_idx
 
-        return False
+        return None
 
-    # '''
-    def _update_fingerprint_signature(self, fingerprint_id, current_signature, all_features):
+    def _update_fingerprint_signature(self, fingerprint_id, codes):
         """
         Update fingerprint signature with new values (incremental learning).
         This allows the fingerprint to dynamically evolve with latest values.
         """
-        if fingerprint_id not in self.fingerprint_signatures:
-            self.fingerprint_signatures[fingerprint_id] = {}
-
-        fingerprint_sig = self.fingerprint_signatures[fingerprint_id]
-        updated = False
+        store = self.signature_store
 
-        for feature in all_features:
-            current_val = current_signature.get(feature)
-            if current_val is None:
+        for feature_idx, (current_val, existing_val) in enumerate(zip(codes, store.codes[fingerprint_id].tolist())):
+            if current_val < 0 or current_val == existing_val:
                 continue
 
-            existing_val = fingerprint_sig.get(feature)
-
             # If this feature wasn't seen before, add it
-            if existing_val is None:
-                fingerprint_sig[feature] = current_val
-                self.feature_to_fingerprints[feature][current_val].add(fingerprint_id)
-                updated = True
+            if existing_val < 0:
+                store.set(fingerprint_id, feature_idx, current_val)
+                self.inverted_index.add(feature_idx, current_val, fingerprint_id)
 
             # If we see a different value for this feature, update to latest value
-            elif existing_val != current_val:
-                # Remove fingerprint from old value mapping
-                if existing_val in self.feature_to_fingerprints[feature]:
-                    self.feature_to_fingerprints[feature][existing_val].discard(fingerprint_id)
-                    # # Clean up empty sets to save memory
-                    # if not self.feature_to_fingerprints[feature][existing_val]:
-                    #     del self.feature_to_fingerprints[feature][existing_val]
+            else:
+                # Remove fingerprint from old value mapping (empty posting lists are dropped by the index)
+                self.inverted_index.discard(feature_idx, existing_val, fingerprint_id)
 
                 # Update to new value
-                fingerprint_sig[feature] = current_val
-                self.feature_to_fingerprints[feature][current_val].add(fingerprint_id)
-                updated = True
+                store.set(fingerprint_id, feature_idx, current_val)
+                self.inverted_index.add(feature_idx, current_val, fingerprint_id)
 
-                # print(f"Updated fingerprint {fingerprint_id} feature '{feature}': {existing_val} → {current_val}")
+    def _register_new_fingerprint(self, codes):
+        """Register a new fingerprint with its signature codes and return its dense id."""
+        fingerprint_id = self.signature_store.add(codes)
 
-        # Track discriminative features for this fingerprint
-        if updated:
-            self._update_discriminators(fingerprint_id)
-    # '''
+        for feature_idx, current_val in enumerate(codes):
+            if current_val >= 0:
+                self.inverted_index.add(feature_idx, current_val, fingerprint_id)
 
-    '''
-    def _update_fingerprint_signature(self, fingerprint_id, current_signature, all_features, debug_row_idx=None):
+        return fingerprint_id
+
+    def _sharing_counts(self):
         """
-        Update fingerprint signature with new values (incremental learning).
-        This allows the fingerprint to dynamically evolve with latest values.
+        [n_fingerprints x n_features] matrix of how many other fingerprints share each feature value
+        (-1 where the fingerprint has no value), computed from the current signatures in one pass per feature.
         """
-        if fingerprint_id not in self.fingerprint_signatures:
-            self.fingerprint_signatures[fingerprint_id] = {}
-
-        fingerprint_sig = self.fingerprint_signatures[fingerprint_id]
-        updated = False
-
-        if debug_row_idx is not None:
-            self._debug_log(f"Updating fingerprint signature for {fingerprint_id}", debug_row_idx)
+        store = self.signature_store
+        codes = store.codes[:store.n_fingerprints]
+        sharing = np.full(codes.shape, -1, dtype=np.int64)
 
-        # Get the anchor feature (first in all_features list)
-        anchor_feature = all_features[0]  # This is initial_anchor_feature
+        for feature_idx in range(codes.shape[1]):
+            column = codes[:, feature_idx]
+            present = column >= 0
+            if present.any():
+                value_counts = np.bincount(column[present])
+                sharing[present, feature_idx] = value_counts[column[present]] - 1  # Exclude self
 
-        for feature in all_features:
-            current_val = current_signature.get(feature)
-            if current_val is None:
-                continue
-
-            existing_val = fingerprint_sig.get(feature)
-
-            # If this feature wasn't seen before, add it
-            if existing_val is None:
-                fingerprint_sig[feature] = current_val
-                self.feature_to_fingerprints[feature][current_val].add(fingerprint_id)
-                updated = True
-
-                if debug_row_idx is not None:
-                    self._debug_log(f"  Added new feature '{feature}': {current_val}", debug_row_idx)
-
-            # If we see a different value for this feature, update to latest value
-            # BUT NEVER UPDATE THE ANCHOR - it defines the fingerprint's identity
-            elif existing_val != current_val and feature != anchor_feature:  # ← KEY FIX
-                if debug_row_idx is not None:
-                    self._debug_log(f"  ⚠️  Updating feature '{feature}': {existing_val} → {current_val}",
-                                    debug_row_idx)
-
-                # Remove fingerprint from old value mapping
-                if existing_val in self.feature_to_fingerprints[feature]:
-                    self.feature_to_fingerprints[feature][existing_val].discard(fingerprint_id)
-                    # Clean up empty sets to save memory
-                    if not self.feature_to_fingerprints[feature][existing_val]:
-                        del self.feature_to_fingerprints[feature][existing_val]
-
-                # Update to new value
-                fingerprint_sig[feature] = current_val
-                self.feature_to_fingerprints[feature][current_val].add(fingerprint_id)
-                updated = True
-
-            elif existing_val != current_val and feature == anchor_feature:
-                # This should NEVER happen - log a warning
-                if debug_row_idx is not None:
-                    self._debug_log(f"  ⚠️⚠️⚠️  WARNING: Anchor feature value changed! {existing_val} → {current_val}",
-                                    debug_row_idx)
-
-        # Track discriminative features for this fingerprint
-        if updated:
-            self._update_discriminators(fingerprint_id)
-    '''
-
-
-    def _register_new_fingerprint(self, fingerprint_id, current_signature, all_features):
-        """Register a new fingerprint with its signature."""
-        self.fingerprint_signatures[fingerprint_id] = {}
-
-        for feature in all_features:
-            current_val = current_signature.get(feature)
-            if current_val is not None:
-                self.fingerprint_signatures[fingerprint_id][feature] = current_val
-                self.feature_to_fingerprints[feature][current_val].add(fingerprint_id)
+        return sharing
 
-        self._update_discriminators(fingerprint_id)
+    def get_fingerprint_discriminators(self, fingerprint_ids=None):
+        """
+        Which features are most discriminative for each fingerprint, computed on demand.
 
-    def _update_discriminators(self, fingerprint_id):
-        """Track which features are most discriminative for this fingerprint."""
-        if fingerprint_id not in self.fingerprint_discriminators:
-            self.fingerprint_discriminators[fingerprint_id] = {}
+        Returns {fingerprint_id -> {feature -> number of other fingerprints sharing its value}} for the
+        given dense fingerprint ids (all fingerprints when None).
+        """
+        if self.signature_store is None:
+            return {}
+
+        sharing = self._sharing_counts()
+        if fingerprint_ids is None:
+            fingerprint_ids = range(len(self.signature_store))
+
+        features = self.signature_store.features
+        return {
+            fingerprint_id: {features[feature_idx]: count
+                             for feature_idx, count in enumerate(sharing[fingerprint_id].tolist()) if count >= 0}
+            for fingerprint_id in fingerprint_ids
+        }
 
-        fingerprint_sig = self.fingerprint_signatures[fingerprint_id]
+    def save_snapshot(self, path):
+        """
+        Save signatures, inverted index, category dictionaries and fingerprint ids to a snapshot directory.
 
-        for feature, value in fingerprint_sig.items():
-            if value is not None:
-                # Count how many other fingerprints share this feature value
-                sharing_count = len(self.feature_to_fingerprints[feature][value]) - 1  # Exclude self
-                self.fingerprint_discriminators[fingerprint_id][feature] = sharing_count
+        Everything is written as .npy arrays (memory-mappable, no pickle) next to a manifest.json
+        carrying the format version and the feature list. The snapshot is written to a sibling temp
+        directory and swapped into place, so an interrupted save leaves the previous snapshot intact.
+        """
+        if self.signature_store is None:
+            raise ValueError("Nothing to snapshot: no rows have been processed yet")
+
+        path = os.path.normpath(path)
+        parent = os.path.dirname(path) or '.'
+        os.makedirs(parent, exist_ok=True)
+        # Roll back a swap interrupted by an earlier save before replacing anything
+        snapshot_exists(path)
+        tmp_path = tempfile.mkdtemp(prefix=f'.{os.path.basename(path)}.tmp-', dir=parent)
+        try:
+            self._write_snapshot(tmp_path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        # A directory cannot be renamed over a non-empty one, so the previous snapshot is moved aside first
+        previous_path = _previous_snapshot_path(path)
+        shutil.rmtree(previous_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, previous_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(previous_path, ignore_errors=True)
+
+        print(f"Saved snapshot with {self.signature_store.n_fingerprints:,} fingerprints to {path}")
+
+    def _write_snapshot(self, path):
+        store = self.signature_store
+        np.save(os.path.join(path, 'signatures.npy'), store.codes[:store.n_fingerprints])
+        np.save(os.path.join(path, 'last_seen.npy'), store.last_seen[:store.n_fingerprints])
+        np.save(os.path.join(path, 'active.npy'), store.active[:store.n_fingerprints])
+        for feature_idx, (codes, offsets, ids) in enumerate(self.inverted_index.to_arrays()):
+            np.save(os.path.join(path, f'index_{feature_idx}_codes.npy'), codes)
+            np.save(os.path.join(path, f'index_{feature_idx}_offsets.npy'), offsets)
+            np.save(os.path.join(path, f'index_{feature_idx}_fingerprints.npy'), ids)
+        save_category_dictionaries(os.path.join(path, 'categories'),
+                                   {feature: self.category_dictionaries[feature] for feature in store.features})
+
+        manifest = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'features': store.features,
+            'n_fingerprints': store.n_fingerprints,
+            'id_seed': self.id_map.seed,
+            'created_at': time.time(),
+        }
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load_snapshot(cls, path, debug_anchor_value=None, metrics=None, tracer=None):
+        """Load a processor saved with save_snapshot; it continues matching new rows incrementally."""
+        snapshot_exists(path)
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {manifest.get('format_version')} "
+                             f"(expected {SNAPSHOT_FORMAT_VERSION})")
+
+        processor = cls(debug_anchor_value=debug_anchor_value, metrics=metrics, tracer=tracer)
+        features = manifest['features']
+
+        signatures = np.load(os.path.join(path, 'signatures.npy'), mmap_mode='r')
+        store = SignatureStore(features, initial_capacity=max(len(signatures), 1))
+        store.codes[:len(signatures)] = signatures
+        store.n_fingerprints = len(signatures)
+        store.recount()
+        store.last_seen[:len(signatures)] = np.load(os.path.join(path, 'last_seen.npy'))
+        store.active[:len(signatures)] = np.load(os.path.join(path, 'active.npy'))
+        processor.signature_store = store
+        processor.id_map = FingerprintIdMap(manifest['id_seed'])
+
+        processor.inverted_index = InvertedIndex.from_arrays(features, [
+            (np.load(os.path.join(path, f'index_{feature_idx}_codes.npy'), mmap_mode='r'),
+             np.load(os.path.join(path, f'index_{feature_idx}_offsets.npy')),
+             np.load(os.path.join(path, f'index_{feature_idx}_fingerprints.npy'), mmap_mode='r'))
+            for feature_idx in range(len(features))
+        ])
+        processor.n_inactive = store.n_fingerprints - int(store.active[:store.n_fingerprints].sum())
+        processor.category_dictionaries = load_category_dictionaries(os.path.join(path, 'categories'))
+
+        print(f"Loaded snapshot with {store.n_fingerprints:,} fingerprints from {path}")
+        return processor
 
     def _print_progress(self, current_idx, n_rows, start_time):
         """Enhanced progress reporting with memory and fingerprint stats."""
@@ -442,40 +1050,132 @@ class SmartFingerprintProcessor:
         except:
             memory_mb = 0
 
-        # Fingerprint stats
-        n_fingerprints = len(self.fingerprint_signatures)
-        avg_signature_size = np.mean(
-            [len(sig) for sig in self.fingerprint_signatures.values()]) if n_fingerprints > 0 else 0
+        # Fingerprint stats (the store keeps a running count of non-missing codes)
+        n_fingerprints = len(self.signature_store)
+        avg_signature_size = self.signature_store.mean_signature_size()
 
         print(f'Processed: {current_idx:,}/{n_rows:,} ({current_idx / n_rows * 100:.1f}%), '
               f'elapsed: {elapsed:.0f}s, rate: {rate:.0f}/s, ETA: {eta:.0f}s, '
               f'Memory: {memory_mb:.0f}MB, Fingerprints: {n_fingerprints:,}, '
               f'Avg sig size: {avg_signature_size:.1f}')
 
-    def get_fingerprint_analysis(self):
-        """Get analysis of fingerprint signatures for debugging/optimization."""
+    @property
+    def n_active(self):
+        """Number of fingerprints currently in memory and taking part in matching."""
+        return (self.signature_store.n_fingerprints if self.signature_store is not None else 0) - self.n_inactive
+
+    def _deactivate_fingerprints(self, fingerprint_ids):
+        """
+        Remove fingerprints (sorted unique dense ids) from the signature store and index. Their ids stay
+        reserved and are flagged inactive in the store.
+        """
+        store = self.signature_store
+        index = self.inverted_index
+        codes = store.codes[fingerprint_ids]
+
+        # Few removals: discard postings one by one; many: rebuilding the index is cheaper
+        if codes.size < sum(len(postings) for postings in index.postings) // 4:
+            for fingerprint_id, signature in zip(fingerprint_ids.tolist(), codes.tolist()):
+                for feature_idx, code in enumerate(signature):
+                    if code >= 0:
+                        index.discard(feature_idx, code, fingerprint_id)
+            index.compact(np.flatnonzero((codes != store.MISSING).any(axis=0)).tolist())
+            store.codes[fingerprint_ids] = store.MISSING
+        else:
+            store.codes[fingerprint_ids] = store.MISSING
+            self.inverted_index = InvertedIndex.from_store(store)
+        store.n_present -= int((codes != store.MISSING).sum())
+
+        store.active[fingerprint_ids] = False
+        self.n_inactive += len(fingerprint_ids)
+
+    def expire_fingerprints(self, ttl_ms, now=None, archive_tier=None):
+        """
+        Bulk sweep of fingerprints not seen for more than ttl_ms milliseconds.
+
+        `now` (epoch milliseconds) defaults to the latest last-seen time, i.e. the newest valid row time
+        rather than the wall clock (rows without a usable time never advance it), so historical backfills
+        age the same way as live traffic.
+        Stale fingerprints are dropped, or written to `archive_tier` (a ColdFingerprintTier that is not
+        attached to the processor, so archived fingerprints no longer match). Stale fingerprints in the
+        processor's own cold tier are dropped from it too. Returns the number of fingerprints expired.
+        """
+        store = self.signature_store
+        if store is None or not store.n_fingerprints:
+            return 0
+
+        last_seen = store.last_seen[:store.n_fingerprints]
+        if now is None:
+            now = int(last_seen.max())
+        cutoff = now - ttl_ms
+
+        stale = (last_seen < cutoff) & store.active[:store.n_fingerprints]
+        stale_ids = np.flatnonzero(stale)
+
+        if stale_ids.size:
+            if archive_tier is not None:
+                archive_tier.evict(self, stale_ids)
+            else:
+                self._deactivate_fingerprints(stale_ids)
+
+        n_expired = len(stale_ids)
+        if self.cold_tier is not None and self.cold_tier is not archive_tier:
+            n_expired += self.cold_tier.expire(cutoff)
+
+        if n_expired:
+            print(f"Expired {n_expired:,} fingerprints not seen for {ttl_ms / 86_400_000:.1f} days "
+                  f"({'archived' if archive_tier is not None else 'dropped'}); active: {self.n_active:,}")
+        return n_expired
+
+    def memory_usage(self):
+        """Approximate bytes held by the matching state: signatures and index."""
+        if self.signature_store is None:
+            return 0
+        return self.signature_store.memory_usage() + self.inverted_index.memory_usage()
+
+    def get_fingerprint_analysis(self, include_discriminators=False):
+        """
+        Get analysis of fingerprint signatures for debugging/optimization.
+
+        include_discriminators=True also summarizes, per feature, how many fingerprints it identifies
+        on its own (no other fingerprint shares the value). This is computed on demand from the signatures.
+        """
         analysis = {
-            'total_fingerprints': len(self.fingerprint_signatures),
-            'signature_sizes': [len(sig) for sig in self.fingerprint_signatures.values()],
+            'total_fingerprints': len(self.signature_store) if self.signature_store is not None else 0,
+            'active_fingerprints': self.n_active,
+            'signature_sizes': self.signature_store.signature_sizes().tolist() if self.signature_store is not None else [],
             'feature_usage': {},
             'discriminative_features': {}
         }
 
         # Analyze feature usage across all fingerprints
-        for feature in self.feature_to_fingerprints:
-            total_values = sum(len(fps) for fps in self.feature_to_fingerprints[feature].values())
-            unique_values = len(self.feature_to_fingerprints[feature])
+        features = self.inverted_index.features if self.inverted_index is not None else []
+        for feature_idx, feature in enumerate(features):
+            total_values = self.inverted_index.n_associations(feature_idx)
+            unique_values = self.inverted_index.n_values(feature_idx)
             analysis['feature_usage'][feature] = {
                 'unique_values': unique_values,
                 'total_fingerprint_associations': total_values,
                 'avg_fingerprints_per_value': total_values / unique_values if unique_values > 0 else 0
             }
 
+        if include_discriminators and self.signature_store is not None:
+            sharing = self._sharing_counts()
+            for feature_idx, feature in enumerate(self.signature_store.features):
+                column = sharing[:, feature_idx]
+                column = column[column >= 0]
+                analysis['discriminative_features'][feature] = {
+                    'fingerprints_with_value': int(column.size),
+                    'uniquely_identified': int((column == 0).sum()),
+                    'avg_sharing_count': float(column.mean()) if column.size else 0.0
+                }
+
         return analysis
 
 # Main interface functions
 def process_fingerprints_smart(df, initial_anchor_feature, search_space_reducers,
-                               final_identification_features, debug_anchor_value=None):
+                               final_identification_features, debug_anchor_value=None, engine='python',
+                               processor=None, tracer=None, time_column=None, id_seed=None):
     """
     Main interface for smart fingerprint processing.
 
@@ -485,14 +1185,22 @@ def process_fingerprints_smart(df, initial_anchor_feature, search_space_reducers
         search_space_reducers: Features to narrow down candidates
         final_identification_features: Features for final matching
         debug_anchor_value: Optional anchor value to track for debugging (e.g., "70f16ffc4d6cf98a")
+        engine: 'python' (default) or 'numba' for the compiled matching kernel
+        processor: Optional existing processor (e.g. from load_snapshot) to continue matching with
+        tracer: Optional FingerprintTracer for several anchors / fingerprint ids (instead of debug_anchor_value)
+        time_column: Optional column with the row times recorded as each fingerprint's last-seen time
+        id_seed: Seed of the external fingerprint ids of a new processor (random by default); the same
+            seed and input always produce the same ids
 
     Returns:
         DataFrame with fingerprint matching results
     """
-    processor = SmartFingerprintProcessor(debug_anchor_value=debug_anchor_value)
+    if processor is None:
+        processor = SmartFingerprintProcessor(debug_anchor_value=debug_anchor_value, tracer=tracer, id_seed=id_seed)
 
     result_df = processor.process_fingerprints_smart(
-        df, initial_anchor_feature, search_space_reducers, final_identification_features
+        df, initial_anchor_feature, search_space_reducers, final_identification_features, engine=engine,
+        time_column=time_column
     )
 
     # Print final analysis
@@ -513,6 +1221,196 @@ def process_fingerprints(df, initial_anchor_feature, search_space_reducers, fina
                                       final_identification_features)
 
 
+def label_connected_components(encoded_arrays, features):
+    """
+    Label rows so that rows sharing a value of any feature (directly or transitively) get the same label.
+
+    Rows in different components can never match each other's fingerprints, so components can be
+    fingerprinted independently. Labels are the smallest row position in each component.
+    """
+    n_rows = len(encoded_arrays[features[0]]) if features else 0
+    labels = np.arange(n_rows, dtype=np.int64)
+
+    # Pre-sort every feature once: rows grouped by code, with group boundaries
+    groups = []
+    for feature in features:
+        codes = np.asarray(encoded_arrays[feature])
+        rows = np.flatnonzero(codes >= 0)
+        if not rows.size:
+            continue
+        rows = rows[np.argsort(codes[rows], kind='stable')]
+        sorted_codes = codes[rows]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+        groups.append((rows, starts, np.diff(np.r_[starts, rows.size])))
+
+    changed = True
+    while changed:
+        changed = False
+        for rows, starts, sizes in groups:
+            # Pull every row of a value group down to the group's smallest label
+            group_min = np.minimum.reduceat(labels[rows], starts)
+            new_labels = np.repeat(group_min, sizes)
+            current = labels[rows]
+            if (new_labels < current).any():
+                # Also relabel the old roots so previously merged rows follow
+                np.minimum.at(labels, current, new_labels)
+                labels[rows] = np.minimum(current, new_labels)
+                changed = True
+
+        # Pointer jumping: labels point at rows with smaller or equal labels
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+
+    return labels
+
+
+def _process_partition(partition_df, initial_anchor_feature, search_space_reducers,
+                       final_identification_features, engine):
+    """Worker: fingerprint one partition of independent components with its own processor."""
+    processor = SmartFingerprintProcessor()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return processor._match_batch(
+            partition_df, initial_anchor_feature, search_space_reducers, final_identification_features,
+            engine=engine
+        )
+
+
+def process_fingerprints_parallel(df, initial_anchor_feature, search_space_reducers,
+                                  final_identification_features, n_workers=None, engine='python',
+                                  partitions_per_worker=4, id_seed=None):
+    """
+    Fingerprint independent row components in a process pool.
+
+    Rows are split into connected components of shared anchor/matcher values, components are
+    hash-partitioned across workers and every partition runs its own SmartFingerprintProcessor in time
+    order. Results are identical to the sequential run: dense fingerprint ids are assigned in order of
+    first appearance, as in the sequential run, and mapped to the same external ids for the same id_seed.
+
+    Args:
+        df: Input DataFrame (must be sorted by time)
+        n_workers: Number of worker processes (defaults to the CPU count)
+        engine: Matching engine used inside each worker ('python' or 'numba')
+        partitions_per_worker: Partitions per worker, more partitions balance skewed components better
+        id_seed: Seed of the external fingerprint ids (see FingerprintIdMap), random by default
+
+    Returns:
+        DataFrame with fingerprint matching results
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    all_features = [initial_anchor_feature] + search_space_reducers + final_identification_features
+    n_rows = len(df)
+
+    print(f"Processing {n_rows:,} rows on {n_workers} workers...")
+    start_time = time.time()
+
+    encoded_arrays, _ = SmartFingerprintProcessor()._preprocess_features(
+        df, initial_anchor_feature, search_space_reducers, final_identification_features
+    )
+    # A match needs a shared anchor or matcher value (reducers only narrow candidates down), so rows that
+    # share nothing else but a reducer value cannot affect each other's fingerprints
+    labels = label_connected_components(encoded_arrays, [initial_anchor_feature] + final_identification_features)
+    component_sizes = np.bincount(labels)
+    n_components = int(np.count_nonzero(component_sizes))
+    print(f"Found {n_components:,} independent components in {time.time() - start_time:.1f}s, the largest "
+          f"holding {component_sizes.max(initial=0) / max(n_rows, 1):.1%} of the rows")
+
+    n_partitions = max(1, min(n_workers * partitions_per_worker, n_components))
+    partition_of_row = labels % n_partitions
+    partition_rows = [np.flatnonzero(partition_of_row == partition) for partition in range(n_partitions)]
+    partition_rows = [rows for rows in partition_rows if rows.size]
+
+    feature_df = df[all_features]
+    local_ids = np.empty(n_rows, dtype=np.int64)
+    feature_rows = np.empty(n_rows, dtype=np.int32)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [
+            executor.submit(_process_partition, feature_df.iloc[rows].reset_index(drop=True),
+                            initial_anchor_feature, search_space_reducers, final_identification_features, engine)
+            for rows in partition_rows
+        ]
+        for rows, future in zip(partition_rows, futures):
+            local_ids[rows], feature_rows[rows] = future.result()
+
+    # Partition-local ids follow first appearance within the partition; renumber them globally
+    # in order of first appearance so ids line up with the sequential run
+    is_new_fingerprint = feature_rows < 0
+    new_rows = np.flatnonzero(is_new_fingerprint)
+    global_ids = np.empty(n_rows, dtype=np.int64)
+    global_ids[new_rows] = np.arange(new_rows.size)
+    fingerprint_rows = np.empty(n_rows, dtype=np.int64)
+    for rows in partition_rows:
+        partition_new_rows = rows[is_new_fingerprint[rows]]
+        fingerprint_rows[rows] = global_ids[partition_new_rows][local_ids[rows]]
+
+    new_fingerprints = FingerprintIdMap(id_seed).external_ids(fingerprint_rows)
+    # Index -1 (no match) picks the trailing 'No Match' label
+    match_at_feature = np.asarray(all_features + ['No Match'], dtype=object)[feature_rows]
+
+    result_df = df.copy()
+    result_df['new_fingerprint'] = new_fingerprints
+    result_df['is_new_fingerprint'] = is_new_fingerprint
+    result_df['match_at_feature'] = match_at_feature
+
+    elapsed = time.time() - start_time
+    print(f"Processed {n_rows:,} rows in {elapsed:.1f}s ({n_rows / elapsed if elapsed > 0 else 0:.0f}/s), "
+          f"final fingerprint count: {new_rows.size:,}")
+    return result_df
+
+
+def benchmark_parallel_scaling(df, initial_anchor_feature, search_space_reducers, final_identification_features,
+                               worker_counts=(1, 2, 4, 8), engine='python'):
+    """
+    Measure throughput of the parallel mode per worker count against the sequential run.
+
+    Every parallel result is checked against the sequential one (same fingerprint grouping,
+    is_new_fingerprint and match_at_feature). Returns a list of {workers, seconds, rows_per_sec, speedup}.
+    """
+    n_rows = len(df)
+
+    def grouping(result):
+        return pd.factorize(result['new_fingerprint'])[0]
+
+    start_time = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        sequential = process_fingerprints_smart(df, initial_anchor_feature, search_space_reducers,
+                                                final_identification_features, engine=engine)
+    sequential_time = time.time() - start_time
+
+    report = [{'workers': 'sequential', 'seconds': sequential_time,
+               'rows_per_sec': n_rows / sequential_time if sequential_time > 0 else 0, 'speedup': 1.0}]
+
+    for n_workers in worker_counts:
+        start_time = time.time()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            parallel = process_fingerprints_parallel(df, initial_anchor_feature, search_space_reducers,
+                                                     final_identification_features, n_workers=n_workers,
+                                                     engine=engine)
+        elapsed = time.time() - start_time
+
+        identical = ((grouping(parallel) == grouping(sequential)).all()
+                     and (parallel['is_new_fingerprint'].values == sequential['is_new_fingerprint'].values).all()
+                     and (parallel['match_at_feature'].values == sequential['match_at_feature'].values).all())
+        if not identical:
+            raise AssertionError(f"Parallel run with {n_workers} workers differs from the sequential run")
+
+        report.append({'workers': n_workers, 'seconds': elapsed,
+                       'rows_per_sec': n_rows / elapsed if elapsed > 0 else 0,
+                       'speedup': sequential_time / elapsed if elapsed > 0 else 0})
+
+    print(f"\nParallel scaling on {n_rows:,} rows (engine={engine}):")
+    print(f"{'Workers':<12} {'Seconds':<10} {'Rows/s':<12} {'Speedup'}")
+    print("-" * 46)
+    for entry in report:
+        print(f"{entry['workers']!s:<12} {entry['seconds']:<10.2f} {entry['rows_per_sec']:<12,.0f} "
+              f"{entry['speedup']:.2f}x")
+
+    return report
+
+
 def analyze_dataset_characteristics(df, feature_columns):
     """
     Analyze dataset to recommend optimal feature ordering and processing strategy.
@@ -546,6 +1444,23 @@ def analyze_dataset_characteristics(df, feature_columns):
             'medium_discriminative' if selectivity > 0.01 else 'low_discriminative'
         }
 
+    _print_feature_analysis(analysis)
+    return analysis
+
+
+def analyze_csv_characteristics(csv_file_path, feature_columns, chunk_size=1_000_000, n_workers=1):
+    """
+    Single-pass analyze_dataset_characteristics over a CSV that never holds more than a chunk in memory.
+    Distinct counts (HyperLogLog) and top-10 coverage (Space-Saving) are estimates, null counts are exact;
+    see fingerprint_profile.
+    """
+    print(f"Profiling {len(feature_columns)} features of {csv_file_path}...")
+    analysis = profile_csv(csv_file_path, feature_columns, chunk_size=chunk_size, n_workers=n_workers).analysis()
+    _print_feature_analysis(analysis)
+    return analysis
+
+
+def _print_feature_analysis(analysis):
     # Sort by selectivity
     sorted_features = sorted(analysis.items(), key=lambda x: x[1]['selectivity'], reverse=True)
 
@@ -557,7 +1472,214 @@ def analyze_dataset_characteristics(df, feature_columns):
         print(f"{feature:<30} {stats['selectivity']:<12.4f} {stats['unique_values']:<10,} "
               f"{stats['null_ratio'] * 100:<8.1f} {stats['recommendation']}")
 
-    return analysis
+
+def _columnar_input_from_config(input_path, config):
+    """Columnar input format of `input_path` ('parquet' or 'arrow') or None for CSV."""
+    input_format = columnar_input_format(input_path, config.get('input_format'))
+    if config.get('time_range') is not None:
+        if input_format is None:
+            raise ValueError("'time_range' needs Parquet or Arrow input")
+        if not config.get('timestamp_column'):
+            raise ValueError("'time_range' needs a 'timestamp_column'")
+    return input_format
+
+
+def _columnar_read_options(config):
+    """Projection, time range pushdown and dictionary-encoded feature columns for the columnar readers."""
+    return {
+        'columns': config.get('columns_to_load'),
+        'time_column': config.get('timestamp_column'),
+        'time_range': config.get('time_range'),
+        'dictionary_columns': [config['initial_anchor_feature']] + list(config['search_space_reducers']) +
+                              list(config['final_identification_features']),
+    }
+
+
+def process_csv_fingerprints_streaming(csv_file_path, config):
+    """
+    Streaming workflow: fingerprint a CSV chunk by chunk in time order.
+
+    Only the processor state (signatures, index, category dictionaries) stays in memory; every chunk's
+    rows are written to the output together with new_fingerprint/is_new_fingerprint/match_at_feature
+    as soon as they are matched. Peak memory is bounded by chunk size plus index size.
+
+    With a 'timestamp_column' the input is first put in time order with an external merge sort
+    (set 'external_sort': False to skip it for input that is already sorted; the order is still checked).
+    Parquet / Arrow input is read batch by batch and must already be in time order.
+
+    Args:
+        csv_file_path (str): Path to your CSV file
+        config (dict): Same configuration as process_csv_fingerprints, with 'chunk_size' set
+
+    Returns:
+        dict: Summary with row, fingerprint and per-feature match counts (and the sketched
+            feature_analysis unless config['analyze_features'] is False)
+    """
+    chunk_size = config['chunk_size']
+    output_path = config.get('output_path', 'niyo_fraud_data_new_fp_new.csv')
+    timestamp_column = config.get('timestamp_column')
+    state_path = config.get('state_path')
+
+    # Opened up front so a bad output setting fails before the input is sorted
+    writer = _result_writer_from_config(config, output_path)
+    input_format = _columnar_input_from_config(csv_file_path, config)
+
+    if config.get('n_workers', 1) > 1:
+        print("WARNING: streaming mode processes chunks sequentially, ignoring 'n_workers'")
+    if not timestamp_column:
+        print("WARNING: No timestamp column specified. Using existing order.")
+        print("Make sure your data is already sorted by time for correct fingerprint logic!")
+
+    metrics = _metrics_from_config(config)
+    if state_path and snapshot_exists(state_path):
+        processor = SmartFingerprintProcessor.load_snapshot(state_path, metrics=metrics)
+    else:
+        processor = SmartFingerprintProcessor(metrics=metrics, id_seed=config.get('id_seed'))
+
+    sorted_dir = None
+    if input_format is not None:
+        if timestamp_column and config.get('external_sort', True):
+            print(f"WARNING: external sort only supports CSV input; {input_format} input must already be "
+                  f"sorted by '{timestamp_column}'")
+    elif timestamp_column and config.get('external_sort', True):
+        sorted_dir = tempfile.mkdtemp(prefix='fingerprint_sorted_', dir=config.get('tmp_dir'))
+        sorted_path = os.path.join(sorted_dir, 'sorted.csv')
+        external_sort_csv(csv_file_path, sorted_path, timestamp_column,
+                          chunk_size=config.get('sort_chunk_size', chunk_size),
+                          usecols=config.get('columns_to_load'), tmp_dir=config.get('tmp_dir'))
+        csv_file_path = sorted_path
+
+    try:
+        summary = _stream_fingerprint_chunks(csv_file_path, config, processor, writer, input_format)
+    finally:
+        if sorted_dir:
+            shutil.rmtree(sorted_dir, ignore_errors=True)
+
+    if state_path and summary['total_rows']:
+        processor.save_snapshot(state_path)
+
+    return summary
+
+
+def _stream_fingerprint_chunks(csv_file_path, config, processor, writer, input_format=None):
+    """Match a time-sorted CSV / Parquet / Arrow input chunk by chunk, appending results to a ResultWriter."""
+    chunk_size = config['chunk_size']
+    timestamp_column = config.get('timestamp_column')
+
+    if input_format is not None:
+        print(f"Streaming {input_format} input: {csv_file_path} in chunks of {chunk_size:,} rows")
+        reader = iter_columnar_input(csv_file_path, chunk_size, input_format, **_columnar_read_options(config))
+    else:
+        print(f"Streaming CSV file: {csv_file_path} in chunks of {chunk_size:,} rows")
+        reader = pd.read_csv(csv_file_path, low_memory=False, dtype=str, usecols=config.get('columns_to_load'),
+                             chunksize=chunk_size)
+
+    total_rows = 0
+    new_fingerprints = 0
+    match_breakdown = defaultdict(int)
+    last_timestamp = None
+    ttl_sweep = _ttl_sweep_from_config(config)
+    # Feature analysis is sketched from the chunks as they stream by (no second pass over the input)
+    profile = (DatasetProfile([config['initial_anchor_feature']] + config['search_space_reducers'] +
+                              config['final_identification_features'])
+               if config.get('analyze_features', True) else None)
+    start_time = time.time()
+
+    with writer:
+        for chunk_idx, chunk in enumerate(reader):
+            if timestamp_column:
+                # Null timestamps sort last and are not checked
+                timestamps = chunk[timestamp_column].dropna()
+                if not timestamps.is_monotonic_increasing or (
+                        last_timestamp is not None and len(timestamps) and timestamps.iloc[0] < last_timestamp):
+                    raise ValueError(f"Input is not sorted by '{timestamp_column}' (chunk {chunk_idx}); "
+                                     f"enable config['external_sort'] or sort it before streaming")
+                last_timestamp = timestamps.iloc[-1] if len(timestamps) else last_timestamp
+
+            result_chunk = processor.process_fingerprints_smart(
+                chunk.reset_index(drop=True),
+                config['initial_anchor_feature'],
+                config['search_space_reducers'],
+                config['final_identification_features'],
+                engine=config.get('engine', 'python'),
+                time_column=timestamp_column,
+            )
+            if ttl_sweep is not None:
+                ttl_sweep(processor)
+            if profile is not None:
+                profile.update(chunk)
+
+            writer.write(result_chunk)
+
+            total_rows += len(result_chunk)
+            new_fingerprints += int(result_chunk['is_new_fingerprint'].sum())
+            for feature, count in result_chunk['match_at_feature'].value_counts().items():
+                match_breakdown[feature] += int(count)
+
+            elapsed = time.time() - start_time
+            print(f"Chunk {chunk_idx}: {total_rows:,} rows written, "
+                  f"rate: {total_rows / elapsed if elapsed > 0 else 0:.0f}/s, "
+                  f"fingerprints: {len(processor.signature_store):,} (active: {processor.n_active:,})")
+
+    matched_fingerprints = total_rows - new_fingerprints
+    print(f"\nTotal rows processed: {total_rows:,}")
+    print(f"New fingerprints created: {new_fingerprints:,}")
+    print(f"Rows matched to existing: {matched_fingerprints:,}")
+    if total_rows:
+        print(f"Match rate: {(matched_fingerprints / total_rows) * 100:.1f}%")
+    print(f"Output: {writer.path}")
+
+    summary = {
+        'total_rows': total_rows,
+        'new_fingerprints': new_fingerprints,
+        'matched_rows': matched_fingerprints,
+        'total_fingerprints': len(processor.signature_store) if processor.signature_store is not None else 0,
+        'match_breakdown': dict(match_breakdown),
+        'output_path': writer.path,
+    }
+    if profile is not None:
+        summary['feature_analysis'] = profile.analysis()
+        _print_feature_analysis(summary['feature_analysis'])
+    return summary
+
+
+def _result_writer_from_config(config, output_path):
+    """
+    Result writer for config['output_format'] ('csv', 'parquet' or 'arrow'; by default from the output
+    path's extension). config['partition_by_date'] partitions the output by the date of the timestamp column.
+    """
+    partition_column = None
+    if config.get('partition_by_date'):
+        partition_column = config.get('timestamp_column')
+        if not partition_column:
+            raise ValueError("config['partition_by_date'] needs a 'timestamp_column'")
+    return open_result_writer(output_path, config.get('output_format'), partition_column)
+
+
+def _ttl_sweep_from_config(config):
+    """
+    Function running the TTL sweep configured by config['ttl_days'] on a processor, or None. Stale
+    fingerprints are archived to config['ttl_archive_path'] when set, dropped otherwise.
+    """
+    if not config.get('ttl_days'):
+        return None
+
+    ttl_ms = int(config['ttl_days'] * 86_400_000)
+    archive_tier = None
+    if config.get('ttl_archive_path'):
+        from fingerprint_pool import ColdFingerprintTier  # fingerprint_pool imports this module
+        archive_tier = ColdFingerprintTier(config['ttl_archive_path'])
+
+    return lambda processor: processor.expire_fingerprints(ttl_ms, archive_tier=archive_tier)
+
+
+def _metrics_from_config(config):
+    """MatcherMetrics writing to config['metrics_jsonl_path'] / config['metrics_prometheus_path'], or None."""
+    if not (config.get('metrics_jsonl_path') or config.get('metrics_prometheus_path')):
+        return None
+    return MatcherMetrics(jsonl_path=config.get('metrics_jsonl_path'),
+                          prometheus_path=config.get('metrics_prometheus_path'),
+                          emit_interval=config.get('metrics_interval', 10.0))
 
 
 def process_csv_fingerprints(csv_file_path, config):
@@ -566,18 +1688,32 @@ def process_csv_fingerprints(csv_file_path, config):
 
     Args:
         csv_file_path (str): Path to your CSV file
-        config (dict): Configuration with feature columns and settings
+        config (dict): Configuration with feature columns and settings. Setting 'chunk_size' switches
+            to process_csv_fingerprints_streaming. Set 'id_seed' for reproducible fingerprint ids.
+            'output_format' ('csv', 'parquet' or 'arrow', by default from the 'output_path' extension)
+            and 'partition_by_date' select how results are written. Parquet / Arrow input (by extension
+            or 'input_format') reads only 'columns_to_load', keeps feature columns dictionary-encoded and
+            pushes 'time_range' ([start, end) of 'timestamp_column' values) down to the scan.
 
     Returns:
-        pd.DataFrame: DataFrame with fingerprint results
+        pd.DataFrame: DataFrame with fingerprint results (a summary dict in streaming mode)
     """
+    if config.get('chunk_size'):
+        return process_csv_fingerprints_streaming(csv_file_path, config)
 
-    print(f"Loading CSV file: {csv_file_path}")
+    # Opened up front so a bad output setting fails before the data is processed
+    writer = _result_writer_from_config(config, config.get('output_path', 'niyo_fraud_data_new_fp_new.csv'))
 
+    input_format = _columnar_input_from_config(csv_file_path, config)
     cols_to_load = config.get('columns_to_load')
-    if cols_to_load:
+    if input_format is not None:
+        print(f"Loading {input_format} input: {csv_file_path}")
+        df = read_columnar_input(csv_file_path, input_format, **_columnar_read_options(config))
+    elif cols_to_load:
+        print(f"Loading CSV file: {csv_file_path}")
         df = pd.read_csv(csv_file_path, low_memory=False, dtype=str, usecols=cols_to_load)
     else:
+        print(f"Loading CSV file: {csv_file_path}")
         df = pd.read_csv(csv_file_path, low_memory=False, dtype=str)
 
     print(f"Loaded {len(df):,} rows with {len(df.columns)} columns")
@@ -612,13 +1748,42 @@ def process_csv_fingerprints(csv_file_path, config):
     print("STARTING FINGERPRINT PROCESSING")
     print("=" * 50)
 
-    result_df = process_fingerprints_smart(
-        df=df,
-        initial_anchor_feature=config['initial_anchor_feature'],
-        search_space_reducers=config['search_space_reducers'],
-        final_identification_features=config['final_identification_features'],
-        debug_anchor_value=None,
-    )
+    # Resume from the previous run's state when a snapshot exists
+    state_path = config.get('state_path')
+    metrics = _metrics_from_config(config)
+    processor = None
+    if state_path and snapshot_exists(state_path):
+        processor = SmartFingerprintProcessor.load_snapshot(state_path, metrics=metrics)
+    elif state_path or metrics is not None:
+        processor = SmartFingerprintProcessor(metrics=metrics, id_seed=config.get('id_seed'))
+
+    if config.get('n_workers', 1) > 1 and state_path:
+        print("WARNING: 'state_path' requires sequential processing, ignoring 'n_workers'")
+    if config.get('n_workers', 1) > 1 and metrics is not None and not state_path:
+        print("WARNING: matcher metrics are only collected in sequential mode")
+
+    if config.get('n_workers', 1) > 1 and not state_path:
+        result_df = process_fingerprints_parallel(
+            df=df,
+            initial_anchor_feature=config['initial_anchor_feature'],
+            search_space_reducers=config['search_space_reducers'],
+            final_identification_features=config['final_identification_features'],
+            n_workers=config['n_workers'],
+            engine=config.get('engine', 'python'),
+            id_seed=config.get('id_seed'),
+        )
+    else:
+        result_df = process_fingerprints_smart(
+            df=df,
+            initial_anchor_feature=config['initial_anchor_feature'],
+            search_space_reducers=config['search_space_reducers'],
+            final_identification_features=config['final_identification_features'],
+            debug_anchor_value=None,
+            engine=config.get('engine', 'python'),
+            processor=processor,
+            time_column=config.get('timestamp_column'),
+            id_seed=config.get('id_seed'),
+        )
 
     # Step 4: Results summary
     print("\n" + "=" * 50)
@@ -642,7 +1807,15 @@ def process_csv_fingerprints(csv_file_path, config):
     for feature, count in match_breakdown.items():
         print(f"  {feature}: {count:,} ({count / total_rows * 100:.1f}%)")
 
-    result_df.to_csv('niyo_fraud_data_new_fp_new.csv', index=False)
+    with writer:
+        write_results(result_df, writer)
+
+    if state_path:
+        # Age out stale fingerprints before the state is carried over to the next run
+        ttl_sweep = _ttl_sweep_from_config(config)
+        if ttl_sweep is not None:
+            ttl_sweep(processor)
+        processor.save_snapshot(state_path)
 
     print(f'Finished processing {total_rows:} rows.')
 
@@ -695,7 +1868,6 @@ if __name__ == "__main__":
 
     '''
     file_path = 'shaadi_new_fingerprints_on_input_data_20250923_20251003.csv'
-    result = pd.read_csv(file_path, low_memory=False, dtype=str)
 
     def edit_file_for_better_check_on_sheets(df):
         df.rename(columns={
@@ -713,19 +1885,17 @@ if __name__ == "__main__":
         df = df[final_seq].copy()
         return df
 
-    collision_ids = result[['new_fingerprint', 'deviceId']].groupby('new_fingerprint').agg(
-        'nunique').reset_index()
-    collision_ids = collision_ids.loc[collision_ids['deviceId'] > 1][
-        'new_fingerprint'].tolist()
-    if len(collision_ids) > 0:
-        filtered_result = result.loc[result['new_fingerprint'].isin(collision_ids)].copy()
-        filtered_result = edit_file_for_better_check_on_sheets(filtered_result)
-        print(f'total collision ids: {len(collision_ids)}')
+    # Fingerprints shared by several deviceIds and deviceIds split across fingerprints, sorted by deviceId
+    # and timestamp (streams the result file; see fingerprint_collisions.find_collisions)
+    from fingerprint_collisions import find_collisions
+
+    collision_path = 'shaadi_new_fingerprints_on_input_data_collision_cases_20250923_20251003.csv'
+    summary = find_collisions(file_path, collision_path)
+    if summary['collision_rows']:
+        # The collision cases are few enough to reformat in memory
+        filtered_result = edit_file_for_better_check_on_sheets(pd.read_csv(collision_path, low_memory=False, dtype=str))
+        print(f'total collision ids: {summary["shared_fingerprints"]}, split deviceIds: {summary["split_devices"]}')
         print(f'shape of filtered result df: {filtered_result.shape}')
-        print(f'head of filtered result df: \n{filtered_result.sort_values(by=["deviceId", "timestamp"], ascending=[True, True]).head().to_string(index=False)}\n')
-        filtered_result.to_csv(
-            'shaadi_new_fingerprints_on_input_data_collision_cases_20250923_20251003.csv',
-            index=False)
-    else:
-        print('No collisions detected.')
+        print(f'head of filtered result df: \n{filtered_result.head().to_string(index=False)}\n')
+        filtered_result.to_csv(collision_path, index=False)
     '''
\ No newline at end of file
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from device_fingerprint import SmartFingerprintProcessor, benchmark_parallel_scaling, label_connected_components
+
+ANCHOR_FEATURE = 'anchor_android_id'
+REDUCER_FEATURES = ['reducer_product_sensor_hash', 'reducer_camera_sensor_hash', 'reducer_system_property_hash']
+MATCHER_FEATURES = [
+    'matcher_boot_hw_soc_id', 'matcher_boot_unique_no', 'matcher_debug_gps_hash', 'matcher_oplus_fingerprint_qrcode',
+    'matcher_service_wifi_mac', 'matcher_sys_miui_sno', 'matcher_vivo_hash',
+    'matcher_fallback_ad_id', 'matcher_fallback_gsf_id', 'matcher_last_check_drm_id'
+]
+
+# Share of rows without a value, roughly what we see in production (vendor-specific matchers are mostly empty)
+DEFAULT_NULL_RATIOS = {
+    'anchor_android_id': 0.02,
+    'reducer_product_sensor_hash': 0.05,
+    'reducer_camera_sensor_hash': 0.6,
+    'reducer_system_property_hash': 0.5,
+    'matcher_boot_hw_soc_id': 0.7,
+    'matcher_boot_unique_no': 0.8,
+    'matcher_debug_gps_hash': 0.85,
+    'matcher_oplus_fingerprint_qrcode': 0.9,
+    'matcher_service_wifi_mac': 0.9,
+    'matcher_sys_miui_sno': 0.85,
+    'matcher_vivo_hash': 0.9,
+    'matcher_fallback_ad_id': 0.3,
+    'matcher_fallback_gsf_id': 0.4,
+    'matcher_last_check_drm_id': 0.2,
+}
+
+
+def _hex_values(rng, n_values, n_chars):
+    """n_values random lowercase hex strings of n_chars characters."""
+    n_bytes = (n_chars + 1) // 2
+    raw = rng.integers(0, 256, size=(n_values, n_bytes), dtype=np.uint8)
+    return pd.Index([row.tobytes().hex()[:n_chars] for row in raw], dtype='string')
+
+
+def _categorical_column(rng, value_ids, n_chars, null_ratio):
+    """Turn integer value ids into a categorical column of hex strings with `null_ratio` missing values."""
+    n_values = int(value_ids.max()) + 1 if value_ids.size else 0
+    codes = value_ids.astype(np.int64)
+    codes[rng.random(codes.size) < null_ratio] = -1
+    return pd.Categorical.from_codes(codes, categories=_hex_values(rng, n_values, n_chars))
+
+
+def generate_synthetic_fingerprint_data(n_rows, n_devices=None, n_models=500, null_ratios=None,
+                                        churn_rate=0.1, collision_rate=0.01, seed=0):
+    """
+    Generate time-sorted device rows shaped like the output of prepare_input_data_for_fingerprint.
+
+    Args:
+        n_rows: Number of rows
+        n_devices: Number of distinct physical devices (defaults to n_rows / 5)
+        n_models: Number of device models; reducer_product_sensor_hash is per model and Zipf-skewed,
+            so popular models produce the large reducer posting lists seen in production
+        null_ratios: {feature -> share of missing values}, merged over DEFAULT_NULL_RATIOS
+        churn_rate: Share of devices whose android id is reset (e.g. a factory reset) at a random time
+        collision_rate: Share of matcher values replaced by a small pool of shared junk values
+            (factory-default serials, zeroed MACs) that collide across devices
+        seed: Random seed; the same arguments always produce the same data
+
+    Returns:
+        pd.DataFrame with timestamp, deviceId and the anchor/reducer/matcher columns. Feature columns are
+        categorical to keep memory low at tens of millions of rows.
+    """
+    rng = np.random.default_rng(seed)
+    n_devices = n_devices or max(n_rows // 5, 1)
+    null_ratios = {**DEFAULT_NULL_RATIOS, **(null_ratios or {})}
+
+    # Device activity and model popularity are both heavy-tailed
+    device_weights = rng.pareto(1.5, n_devices) + 1
+    device = rng.choice(n_devices, size=n_rows, p=device_weights / device_weights.sum())
+    model_weights = 1.0 / np.arange(1, n_models + 1)
+    device_model = rng.choice(n_models, size=n_devices, p=model_weights / model_weights.sum())
+
+    # Rows are in time order; a churned device gets a new android id after its reset time
+    row_time = np.arange(n_rows) / max(n_rows, 1)
+    reset_time = np.where(rng.random(n_devices) < churn_rate, rng.random(n_devices), np.inf)
+    anchor_id = device + n_devices * (row_time > reset_time[device])
+
+    data = {
+        'timestamp': pd.Series(1_700_000_000_000 + np.arange(n_rows) * 7, dtype='int64').astype(str),
+        'deviceId': pd.Categorical.from_codes(device, categories=_hex_values(rng, n_devices, 32)),
+        ANCHOR_FEATURE: _categorical_column(rng, anchor_id, 16, null_ratios[ANCHOR_FEATURE]),
+        'reducer_product_sensor_hash': _categorical_column(rng, device_model[device], 64,
+                                                           null_ratios['reducer_product_sensor_hash']),
+        'reducer_camera_sensor_hash': _categorical_column(rng, device, 64, null_ratios['reducer_camera_sensor_hash']),
+        'reducer_system_property_hash': _categorical_column(rng, device, 64,
+                                                            null_ratios['reducer_system_property_hash']),
+    }
+
+    n_junk_values = 16
+    for feature in MATCHER_FEATURES:
+        # Ids past n_devices are the shared junk values
+        value_ids = device.copy()
+        collided = rng.random(n_rows) < collision_rate
+        value_ids[collided] = n_devices + rng.integers(0, n_junk_values, collided.sum())
+        data[feature] = _categorical_column(rng, value_ids, 64 if feature.endswith('_hash') else 20,
+                                            null_ratios[feature])
+
+    return pd.DataFrame(data)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _benchmark_one_size(n_rows, engine, seed):
+    """Run in a fresh process so peak RSS is measured per size."""
+    df = generate_synthetic_fingerprint_data(n_rows, seed=seed)
+    processor = SmartFingerprintProcessor()
+
+    start_time = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        processor.process_fingerprints_smart(df, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES, engine=engine)
+    elapsed = time.time() - start_time
+
+    return {
+        'rows': n_rows,
+        'seconds': elapsed,
+        'rows_per_sec': n_rows / elapsed if elapsed > 0 else 0,
+        'peak_rss_mb': _peak_rss_mb(),
+        'index_mb': (processor.signature_store.memory_usage() + processor.inverted_index.memory_usage()) / 1024 ** 2,
+        'fingerprints': len(processor.signature_store),
+    }
+
+
+def run_benchmark(sizes=(1_000_000, 10_000_000, 50_000_000), engine='python', seed=0,
+                  baseline_path=None, threshold=0.2):
+    """
+    Benchmark process_fingerprints_smart on synthetic data of several sizes.
+
+    Every size runs in its own process. With a baseline file, a size regresses when its rows/s drops, or
+    its peak RSS or index size grows, by more than `threshold` (relative) compared to the baseline.
+
+    Returns:
+        (results, regressions): per-size result dicts and a list of regression messages
+    """
+    results = []
+    for n_rows in sizes:
+        print(f"Benchmarking {n_rows:,} rows (engine={engine})...")
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(_benchmark_one_size, n_rows, engine, seed).result()
+        results.append(result)
+        print(f"  {result['rows_per_sec']:,.0f} rows/s, peak RSS {result['peak_rss_mb']:,.0f}MB, "
+              f"index {result['index_mb']:,.1f}MB, {result['fingerprints']:,} fingerprints")
+
+    regressions = []
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = {entry['rows']: entry for entry in json.load(f)}
+
+        for result in results:
+            reference = baseline.get(result['rows'])
+            if reference is None:
+                continue
+            if result['rows_per_sec'] < reference['rows_per_sec'] * (1 - threshold):
+                regressions.append(f"{result['rows']:,} rows: {result['rows_per_sec']:,.0f} rows/s "
+                                   f"vs baseline {reference['rows_per_sec']:,.0f}")
+            for metric in ('peak_rss_mb', 'index_mb'):
+                if result[metric] > reference[metric] * (1 + threshold):
+                    regressions.append(f"{result['rows']:,} rows: {metric} {result[metric]:,.1f} "
+                                       f"vs baseline {reference[metric]:,.1f}")
+
+    print(f"\n{'Rows':<14} {'Rows/s':<12} {'Peak RSS MB':<13} {'Index MB':<10} {'Fingerprints'}")
+    print("-" * 64)
+    for result in results:
+        print(f"{result['rows']:<14,} {result['rows_per_sec']:<12,.0f} {result['peak_rss_mb']:<13,.0f} "
+              f"{result['index_mb']:<10,.1f} {result['fingerprints']:,}")
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    return results, regressions
+
+
+def compare_parallel(n_rows=1_000_000, worker_counts=(1, 2, 4, 8), engine='python', seed=0):
+    """
+    Time process_fingerprints_parallel per worker count against the sequential run on synthetic data
+    (see benchmark_parallel_scaling). A worker count cannot beat the bound set by the largest
+    independent component, so that bound is reported next to the measured speedup.
+    """
+    df = generate_synthetic_fingerprint_data(n_rows, seed=seed)
+    link_features = [ANCHOR_FEATURE] + MATCHER_FEATURES
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        encoded_arrays, _ = SmartFingerprintProcessor()._preprocess_features(df, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                                                             MATCHER_FEATURES)
+    component_sizes = np.bincount(label_connected_components(encoded_arrays, link_features))
+    largest = int(component_sizes.max())
+    print(f"{n_rows:,} rows: {np.count_nonzero(component_sizes):,} independent components, "
+          f"the largest holding {largest / n_rows:.1%} of the rows")
+
+    report = benchmark_parallel_scaling(df, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES,
+                                        worker_counts=worker_counts, engine=engine)
+    for entry in report[1:]:
+        entry['speedup_bound'] = n_rows / max(largest, n_rows / entry['workers'])
+        print(f"{entry['workers']} workers: {entry['speedup']:.2f}x measured, "
+              f"{entry['speedup_bound']:.2f}x bound by the largest component")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the fingerprint engine on synthetic data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument('--engine', default='python', choices=['python', 'numba'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='JSON file with baseline results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative regression')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--compare-parallel', action='store_true',
+                        help='Report the speedup of the parallel mode per worker count (first --sizes value)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    if args.compare_parallel:
+        compare_parallel(args.sizes[0], worker_counts=args.workers, engine=args.engine, seed=args.seed)
+        sys.exit(0)
+
+    results, regressions = run_benchmark(args.sizes, engine=args.engine, seed=args.seed,
+                                         baseline_path=None if args.save_baseline else args.baseline,
+                                         threshold=args.threshold)
+
+    if args.save_baseline and args.baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from fingerprint_io import external_sort_csv, columnar_input_format, iter_columnar_input
+
+# collision_type of rows whose fingerprint has several devices, whose device has several fingerprints, or both
+SHARED_FINGERPRINT = 'shared_fingerprint'
+SPLIT_DEVICE = 'split_device'
+BOTH = 'both'
+
+
+def _iter_result_chunks(path, chunk_size, columns=None):
+    """Chunks of a result file written by process_csv_fingerprints (CSV, Parquet or Arrow)."""
+    if columnar_input_format(path) is not None:
+        return iter_columnar_input(path, chunk_size, columns=columns)
+    return pd.read_csv(path, low_memory=False, dtype=str, usecols=columns, chunksize=chunk_size)
+
+
+def _partition_pairs(pairs, key_column, partition_paths):
+    """Append distinct (fingerprint, device) pairs to the partition file of their key's hash."""
+    partitions = pd.util.hash_pandas_object(pairs[key_column], index=False).values % np.uint64(len(partition_paths))
+    for partition in np.unique(partitions).tolist():
+        path = partition_paths[partition]
+        pairs.iloc[np.flatnonzero(partitions == partition)].to_csv(path, mode='a', index=False,
+                                                                    header=not os.path.exists(path))
+
+
+def _keys_with_several(partition_paths, key_column, value_column):
+    """Keys having more than one distinct value, one partition in memory at a time."""
+    keys = set()
+    for path in partition_paths:
+        if not os.path.exists(path):
+            continue
+        pairs = pd.read_csv(path, dtype=str).drop_duplicates()
+        counts = pairs[key_column].value_counts()
+        keys.update(counts.index[counts.values > 1].tolist())
+    return keys
+
+
+def find_collisions(result_path, output_path, fingerprint_column='new_fingerprint', device_column='deviceId',
+                    timestamp_column='timestamp', chunk_size=1_000_000, n_partitions=64, tmp_dir=None):
+    """
+    Find fingerprint collisions in a fingerprint result file without loading it in memory.
+
+    A fingerprint collides when it was assigned to more than one device; a device is split when it got
+    more than one fingerprint. The first pass writes the distinct (fingerprint, device) pairs of every chunk
+    to `n_partitions` temp files, hash-partitioned by fingerprint and again by device, and counts each
+    partition on its own, so memory is bounded by the largest partition. The second pass keeps the rows of
+    colliding fingerprints and split devices, tagged with a collision_type column, and writes them to
+    `output_path` (CSV) sorted by device and timestamp with an external sort.
+
+    Returns:
+        dict: Counts of colliding fingerprints, split devices and collision rows, and the output path
+    """
+    work_dir = tempfile.mkdtemp(prefix='fingerprint_collisions_', dir=tmp_dir)
+    try:
+        fingerprint_partitions = [os.path.join(work_dir, f'by_fingerprint_{i:04d}.csv') for i in range(n_partitions)]
+        device_partitions = [os.path.join(work_dir, f'by_device_{i:04d}.csv') for i in range(n_partitions)]
+
+        print(f"Collecting (fingerprint, device) pairs of {result_path}...")
+        for chunk in _iter_result_chunks(result_path, chunk_size, columns=[fingerprint_column, device_column]):
+            pairs = chunk.dropna().astype(str).drop_duplicates()
+            _partition_pairs(pairs, fingerprint_column, fingerprint_partitions)
+            _partition_pairs(pairs, device_column, device_partitions)
+
+        shared_fingerprints = _keys_with_several(fingerprint_partitions, fingerprint_column, device_column)
+        split_devices = _keys_with_several(device_partitions, device_column, fingerprint_column)
+        print(f"Fingerprints with several devices: {len(shared_fingerprints):,}, "
+              f"devices with several fingerprints: {len(split_devices):,}")
+
+        collision_rows = 0
+        filtered_path = os.path.join(work_dir, 'collisions.csv')
+        for chunk in _iter_result_chunks(result_path, chunk_size):
+            shared = chunk[fingerprint_column].astype(str).isin(shared_fingerprints).to_numpy()
+            split = chunk[device_column].astype(str).isin(split_devices).to_numpy()
+            keep = shared | split
+            if not keep.any():
+                continue
+            rows = chunk.loc[keep].copy()
+            rows['collision_type'] = np.where(shared[keep] & split[keep], BOTH,
+                                              np.where(shared[keep], SHARED_FINGERPRINT, SPLIT_DEVICE))
+            rows.to_csv(filtered_path, mode='a', index=False, header=not collision_rows)
+            collision_rows += len(rows)
+
+        if collision_rows:
+            external_sort_csv(filtered_path, output_path, [device_column, timestamp_column],
+                              chunk_size=chunk_size, tmp_dir=work_dir)
+            print(f"Wrote {collision_rows:,} collision rows to {output_path}")
+        else:
+            print('No collisions detected.')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'shared_fingerprints': len(shared_fingerprints),
+        'split_devices': len(split_devices),
+        'collision_rows': collision_rows,
+        'output_path': output_path if collision_rows else None,
+    }
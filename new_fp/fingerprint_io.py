@@ -0,0 +1,428 @@
+import os
+import csv
+import time
+import heapq
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Columnar output is optional; CSV output works without pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow')
+# Output path extension -> format, when the format is not given explicitly
+OUTPUT_FORMAT_EXTENSIONS = {'.parquet': 'parquet', '.arrow': 'arrow', '.arrows': 'arrow', '.ipc': 'arrow'}
+# Partition directory of rows without a parseable time
+UNKNOWN_PARTITION = 'unknown'
+# Input path extension -> columnar input format; anything else (without an explicit format) is read as CSV
+INPUT_FORMAT_EXTENSIONS = dict(OUTPUT_FORMAT_EXTENSIONS, **{'.pq': 'parquet', '.feather': 'arrow'})
+# Leading bytes of the Arrow IPC file (Feather v2) format; Arrow input without them is an IPC stream
+ARROW_FILE_MAGIC = b'ARROW1'
+
+
+def _merge_key(sort_indexes):
+    """Sort key for raw CSV rows: empty (null) values sort last, like pandas na_position='last'."""
+    def key(row):
+        return tuple((row[idx] == '', row[idx]) for idx in sort_indexes)
+    return key
+
+
+def _merge_runs(run_paths, output_path, sort_columns):
+    """K-way merge of sorted CSV runs that share the same header into output_path."""
+    files = [open(path, 'r', encoding='utf-8', newline='') for path in run_paths]
+    try:
+        readers = [csv.reader(f) for f in files]
+        header = None
+        for reader in readers:
+            header = next(reader)
+
+        key = _merge_key([header.index(column) for column in sort_columns])
+        with open(output_path, 'w', encoding='utf-8', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(header)
+            # heapq.merge is stable across runs, so equal keys keep their input order
+            writer.writerows(heapq.merge(*readers, key=key))
+    finally:
+        for f in files:
+            f.close()
+
+
+def external_sort_csv(input_path, output_path, sort_columns, chunk_size=1_000_000, usecols=None,
+                      tmp_dir=None, max_merge_width=128):
+    """
+    Sort a CSV that does not fit in memory by one or more columns (string order, nulls last).
+
+    Sorted runs of `chunk_size` rows are spilled to temp files and k-way merged; more than
+    `max_merge_width` runs are merged in several passes to bound the number of open files.
+    The sort is stable: rows with equal keys keep their input order.
+
+    Args:
+        input_path: CSV file to sort
+        output_path: Where to write the sorted CSV
+        sort_columns: Column name or list of column names to sort by
+        chunk_size: Rows per in-memory run (controls peak memory)
+        usecols: Optional subset of columns to keep
+        tmp_dir: Directory for the spilled runs (defaults to the system temp directory)
+
+    Returns:
+        Number of rows written
+    """
+    if isinstance(sort_columns, str):
+        sort_columns = [sort_columns]
+
+    work_dir = tempfile.mkdtemp(prefix='fingerprint_sort_', dir=tmp_dir)
+    try:
+        run_paths = []
+        total_rows = 0
+        print(f"External sort of {input_path} by {sort_columns}: writing sorted runs...")
+        for chunk in pd.read_csv(input_path, low_memory=False, dtype=str, usecols=usecols, chunksize=chunk_size):
+            chunk = chunk.sort_values(sort_columns, kind='stable', na_position='last')
+            run_path = os.path.join(work_dir, f'run_{len(run_paths):05d}.csv')
+            chunk.to_csv(run_path, index=False)
+            run_paths.append(run_path)
+            total_rows += len(chunk)
+
+        print(f"Merging {len(run_paths)} sorted runs ({total_rows:,} rows)...")
+        merge_pass = 0
+        while len(run_paths) > max_merge_width:
+            merged_paths = []
+            for group_start in range(0, len(run_paths), max_merge_width):
+                merged_path = os.path.join(work_dir, f'merge_{merge_pass}_{len(merged_paths):05d}.csv')
+                _merge_runs(run_paths[group_start:group_start + max_merge_width], merged_path, sort_columns)
+                merged_paths.append(merged_path)
+            for path in run_paths:
+                os.remove(path)
+            run_paths = merged_paths
+            merge_pass += 1
+
+        if len(run_paths) == 1:
+            shutil.move(run_paths[0], output_path)
+        elif run_paths:
+            _merge_runs(run_paths, output_path, sort_columns)
+        else:
+            # Empty input: keep just the header
+            pd.read_csv(input_path, dtype=str, usecols=usecols, nrows=0).to_csv(output_path, index=False)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Sorted file written to {output_path}")
+    return total_rows
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def parse_times_ms(series, fill_missing=True):
+    """
+    Epoch milliseconds (int64) of a Series holding epoch seconds / milliseconds or datetime strings.
+    Values that cannot be parsed get the current time, or stay NaN (float64 result) with fill_missing=False.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.notna().sum() >= series.notna().sum() / 2:
+        # Epoch numbers: anything below 1e11 is too small to be milliseconds, so it is seconds
+        times = numeric.where(numeric >= 1e11, numeric * 1000)
+    else:
+        times = pd.to_datetime(series, errors='coerce', utc=True, format='mixed')
+        times = (times - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(milliseconds=1)
+    if not fill_missing:
+        return times.to_numpy(dtype=np.float64, na_value=np.nan)
+    return times.fillna(now_ms()).to_numpy(dtype=np.int64)
+
+
+def partition_dates(series):
+    """UTC date (YYYY-MM-DD) of every value of a time column; UNKNOWN_PARTITION for null or unparseable values."""
+    times = parse_times_ms(series, fill_missing=False)
+    missing = np.isnan(times)
+    dates = np.full(len(times), UNKNOWN_PARTITION, dtype=object)
+    dates[~missing] = pd.to_datetime(times[~missing].astype(np.int64), unit='ms', utc=True).strftime('%Y-%m-%d')
+    return dates
+
+
+class ResultWriter:
+    """
+    Base class of the fingerprint result writers: results are written chunk by chunk as they are produced.
+
+    Without a partition column all chunks go to one output at `path`. With one, `path` is a directory of
+    Hive-style date partitions (`date=YYYY-MM-DD/part-00000.<ext>`, dates in UTC) that must not exist yet.
+    Input is time-sorted, so the output of a date is closed once a later date shows up; a date showing up
+    again after that gets a new part file.
+    """
+
+    extension = ''
+
+    def __init__(self, path, partition_column=None):
+        self.path = path
+        self.partition_column = partition_column
+        self.rows_written = 0
+        self._sinks = {}  # partition date (None when not partitioned) -> open output
+        self._n_parts = 0
+
+        if partition_column is not None:
+            if os.path.exists(path) and os.listdir(path):
+                raise ValueError(f"Partitioned output directory {path} already exists and is not empty")
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, df):
+        """Write one chunk of results."""
+        if self.partition_column is None:
+            self._write_partition(None, df)
+        else:
+            dates = partition_dates(df[self.partition_column])
+            for date in np.unique(dates):
+                self._write_partition(date, df.iloc[np.flatnonzero(dates == date)])
+        self.rows_written += len(df)
+
+    def _write_partition(self, date, df):
+        if date not in self._sinks:
+            if date is None:
+                output_path = self.path
+            else:
+                directory = os.path.join(self.path, f'date={date}')
+                os.makedirs(directory, exist_ok=True)
+                output_path = os.path.join(directory, f'part-{self._n_parts:05d}{self.extension}')
+                self._n_parts += 1
+            self._sinks[date] = self._open(output_path)
+        self._append(self._sinks[date], df)
+
+        if date is not None and date != UNKNOWN_PARTITION:
+            for finished in [key for key in self._sinks if key < date]:
+                self._close(self._sinks.pop(finished))
+
+    def close(self):
+        for sink in self._sinks.values():
+            self._close(sink)
+        self._sinks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self, output_path):
+        raise NotImplementedError
+
+    def _append(self, sink, df):
+        raise NotImplementedError
+
+    def _close(self, sink):
+        pass
+
+
+class CsvResultWriter(ResultWriter):
+    extension = '.csv'
+
+    def _open(self, output_path):
+        return {'path': output_path, 'header': True}
+
+    def _append(self, sink, df):
+        df.to_csv(sink['path'], mode='w' if sink['header'] else 'a', header=sink['header'], index=False)
+        sink['header'] = False
+
+
+class _ArrowResultWriter(ResultWriter):
+    """
+    Shared conversion for the pyarrow writers. Text and categorical columns are dictionary-encoded per
+    chunk (categoricals reuse their codes); the schema is fixed by the first chunk.
+    """
+
+    def __init__(self, path, partition_column=None):
+        if not PYARROW_AVAILABLE:
+            raise ImportError(f"pyarrow is required for {type(self).__name__}; install it or write CSV output")
+        self.schema = None
+        super().__init__(path, partition_column)
+
+    @staticmethod
+    def _is_text(values):
+        return (isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(values.dtype)
+                or pd.api.types.is_string_dtype(values.dtype))
+
+    def _to_table(self, df):
+        if self.schema is None:
+            self.schema = pa.schema([
+                (column, pa.dictionary(pa.int32(), pa.string()) if self._is_text(df[column])
+                 else pa.array(df[column], from_pandas=True).type)
+                for column in df.columns
+            ])
+
+        arrays = []
+        for field in self.schema:
+            values = df[field.name]
+            if not pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=field.type, from_pandas=True))
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                codes = values.cat.codes.to_numpy().astype(np.int32)
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(codes, mask=codes < 0), pa.array(values.cat.categories.astype(str), type=pa.string())
+                ))
+            else:
+                arrays.append(pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode())
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+
+class ParquetResultWriter(_ArrowResultWriter):
+    """Parquet output: one row group per chunk (and partition)."""
+
+    extension = '.parquet'
+
+    def __init__(self, path, partition_column=None, compression='zstd'):
+        self.compression = compression
+        super().__init__(path, partition_column)
+
+    def _open(self, output_path):
+        return {'path': output_path, 'writer': None}
+
+    def _append(self, sink, df):
+        table = self._to_table(df)
+        if sink['writer'] is None:
+            sink['writer'] = pq.ParquetWriter(sink['path'], table.schema, compression=self.compression)
+        sink['writer'].write_table(table)
+
+    def _close(self, sink):
+        sink['writer'].close()
+
+
+class ArrowResultWriter(_ArrowResultWriter):
+    """
+    Arrow IPC output in the streaming format (read with pyarrow.ipc.open_stream): unlike the IPC file
+    format it allows a new dictionary per chunk.
+    """
+
+    extension = '.arrows'
+
+    def _open(self, output_path):
+        return {'file': pa.OSFile(output_path, 'wb'), 'writer': None}
+
+    def _append(self, sink, df):
+        table = self._to_table(df)
+        if sink['writer'] is None:
+            sink['writer'] = pa.ipc.new_stream(sink['file'], table.schema)
+        sink['writer'].write_table(table)
+
+    def _close(self, sink):
+        sink['writer'].close()
+        sink['file'].close()
+
+
+def open_result_writer(path, output_format=None, partition_column=None):
+    """
+    Writer for fingerprint results: 'csv', 'parquet' or 'arrow' (Arrow IPC stream). The format defaults
+    to the one matching the extension of `path`, CSV otherwise. partition_column partitions by date.
+    """
+    if output_format is None:
+        output_format = OUTPUT_FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv')
+    if output_format == 'csv':
+        return CsvResultWriter(path, partition_column)
+    if output_format == 'parquet':
+        return ParquetResultWriter(path, partition_column)
+    if output_format == 'arrow':
+        return ArrowResultWriter(path, partition_column)
+    raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+
+
+def write_results(result_df, writer, chunk_rows=1_000_000):
+    """Write a complete result frame through a ResultWriter, converting `chunk_rows` rows at a time."""
+    # An empty frame is still written once, so unpartitioned output gets its header / schema
+    for start in range(0, max(len(result_df), 1), chunk_rows):
+        writer.write(result_df.iloc[start:start + chunk_rows])
+
+
+def columnar_input_format(path, input_format=None):
+    """
+    'parquet' or 'arrow' for columnar input, None for CSV. A directory is read as a (Hive partitioned)
+    Parquet dataset, e.g. the partitioned output of ParquetResultWriter.
+    """
+    if input_format is not None:
+        return None if input_format == 'csv' else input_format
+    if os.path.isdir(path):
+        return 'parquet'
+    return INPUT_FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def _columnar_scanner(path, input_format, columns=None, time_column=None, time_range=None,
+                      dictionary_columns=(), batch_size=1_000_000):
+    """
+    Scanner over a Parquet / Arrow input with the column projection and the [start, end) time range
+    pushed down: Parquet row groups whose statistics fall outside the range are skipped unread.
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError(f"pyarrow is required to read {input_format} input")
+
+    if input_format == 'parquet':
+        # Read feature columns as dictionaries even when the file stores them as plain strings
+        file_format = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=list(dictionary_columns)))
+        dataset = ds.dataset(path, format=file_format, partitioning='hive')
+    elif input_format == 'arrow':
+        with open(path, 'rb') as f:
+            is_file_format = f.read(len(ARROW_FILE_MAGIC)) == ARROW_FILE_MAGIC
+        # A stream (as written by ArrowResultWriter) can only be scanned once and the filter is applied
+        # batch by batch
+        dataset = ds.dataset(path, format='ipc') if is_file_format else ds.dataset(pa.ipc.open_stream(path))
+    else:
+        raise ValueError(f"Unknown input format '{input_format}', expected 'parquet' or 'arrow'")
+
+    row_filter = None
+    if time_range is not None:
+        field_type = dataset.schema.field(time_column).type
+        if pa.types.is_dictionary(field_type):
+            field_type = field_type.value_type
+        time_field = ds.field(time_column).cast(field_type)
+        start, end = time_range
+        # Bounds are converted to the column's type, e.g. epoch-millisecond strings for CSV-derived data
+        if start is not None:
+            row_filter = time_field >= pa.scalar(start).cast(field_type)
+        if end is not None:
+            end_filter = time_field < pa.scalar(end).cast(field_type)
+            row_filter = end_filter if row_filter is None else row_filter & end_filter
+
+    return dataset.scanner(columns=list(columns) if columns else None, filter=row_filter, batch_size=batch_size)
+
+
+def _to_frame(table, time_column=None):
+    """
+    pandas frame of an Arrow table: dictionary columns become Categoricals without materializing strings.
+    The time column is decoded to plain values so it sorts and compares by value.
+    """
+    df = table.to_pandas()
+    if time_column in df.columns and isinstance(df[time_column].dtype, pd.CategoricalDtype):
+        df[time_column] = df[time_column].astype(object)
+    return df
+
+
+def read_columnar_input(path, input_format=None, columns=None, time_column=None, time_range=None,
+                        dictionary_columns=()):
+    """Read a whole Parquet / Arrow input into a DataFrame (see _columnar_scanner for the pushdown)."""
+    input_format = columnar_input_format(path, input_format)
+    scanner = _columnar_scanner(path, input_format, columns, time_column, time_range, dictionary_columns)
+    return _to_frame(scanner.to_table(), time_column)
+
+
+def iter_columnar_input(path, chunk_size, input_format=None, columns=None, time_column=None, time_range=None,
+                        dictionary_columns=()):
+    """Yield a Parquet / Arrow input as DataFrames of about `chunk_size` rows, in file order."""
+    input_format = columnar_input_format(path, input_format)
+    scanner = _columnar_scanner(path, input_format, columns, time_column, time_range, dictionary_columns,
+                                batch_size=chunk_size)
+
+    batches = []
+    n_buffered = 0
+    for batch in scanner.to_batches():
+        if not batch.num_rows:
+            continue
+        batches.append(batch)
+        n_buffered += batch.num_rows
+        if n_buffered >= chunk_size:
+            yield _to_frame(pa.Table.from_batches(batches), time_column)
+            batches = []
+            n_buffered = 0
+    if batches:
+        yield _to_frame(pa.Table.from_batches(batches), time_column)
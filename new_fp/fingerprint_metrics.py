@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import bisect
+import numpy as np
+
+
+class MatcherMetrics:
+    """
+    Low-overhead counters for the fingerprint matching hot path.
+
+    The python engine records per-row phase timings and candidate-set sizes; both engines record
+    per-batch outcomes (anchor / matcher hits, new fingerprints) and state gauges (fingerprints, index
+    values and associations, dictionary hit rates). Everything can be read with to_dict(), appended to
+    a JSON-lines file and/or written as a Prometheus text file (node_exporter textfile collector format).
+    """
+
+    PHASES = ('anchor', 'reducer', 'final')
+    # Upper bounds of the candidate-set size histogram buckets
+    CANDIDATE_BUCKETS = (1, 2, 4, 8, 16, 64, 256, 1024, 4096, 16384, 65536)
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, emit_interval=10.0):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.emit_interval = emit_interval
+        self.started_at = time.time()
+        self._last_emit = 0.0
+
+        # Hot-path counters (python engine); phase times are indexed like PHASES
+        self.phase_seconds = [0.0] * len(self.PHASES)
+        self.single_candidate_checks = 0  # Phase 2 answered by checking one signature
+        self.intersections = 0  # Phase 3 needed the intersected reducer posting lists
+        self.matcher_probes = 0  # Phase 3 answered from matcher postings without intersecting the reducers
+        self.reducer_rejects = 0  # Rows without any candidate after phase 2
+        self.candidate_histogram = [0] * (len(self.CANDIDATE_BUCKETS) + 1)
+        self.candidates_total = 0
+
+        # Per-batch counters (both engines)
+        self.rows = 0
+        self.batches = 0
+        self.match_seconds = 0.0
+        self.matches = {}  # feature -> rows matched at that feature
+        self.anchor_matches = 0
+        self.new_fingerprints = 0
+
+        # Gauges, refreshed by observe_state()
+        self.gauges = {}
+        self.dictionaries = {}
+
+    def record_candidates(self, candidates):
+        """
+        Count the candidates of one row after phase 3: None, a single fingerprint id or a CandidateSet.
+        Sizes are only known (and recorded in the histogram) for candidate sets phase 3 materialized.
+        """
+        if candidates is None:
+            self.reducer_rejects += 1
+            return
+        if type(candidates) is int:
+            self.single_candidate_checks += 1
+            size = 1
+        elif not candidates.materialized:
+            self.matcher_probes += 1
+            return
+        else:
+            self.intersections += 1
+            size = candidates.ids.size
+            if not size:
+                self.reducer_rejects += 1
+                return
+        self.candidates_total += size
+        self.candidate_histogram[bisect.bisect_left(self.CANDIDATE_BUCKETS, size)] += 1
+
+    def record_batch(self, features, feature_rows, seconds):
+        """Add the outcomes of one matched batch (feature index per row, -1 for a new fingerprint)."""
+        outcome_counts = np.bincount(feature_rows + 1, minlength=len(features) + 1).tolist()
+        self.new_fingerprints += outcome_counts[0]
+        self.anchor_matches += outcome_counts[1]
+        for feature, count in zip(features, outcome_counts[1:]):
+            self.matches[feature] = self.matches.get(feature, 0) + count
+        self.rows += len(feature_rows)
+        self.batches += 1
+        self.match_seconds += seconds
+
+    def observe_state(self, processor):
+        """Refresh the gauges from a processor's store, index and dictionaries (constant time per feature)."""
+        store = processor.signature_store
+        if store is not None:
+            self.gauges = {
+                'fingerprints': store.n_fingerprints,
+                'active_fingerprints': processor.n_active,
+                'index_values': sum(len(postings) for postings in processor.inverted_index.postings),
+                # Every non-missing signature code has exactly one index entry
+                'index_associations': store.n_present,
+                'mean_signature_size': store.mean_signature_size(),
+            }
+        self.dictionaries = {
+            feature: {
+                'values': len(dictionary),
+                'hit_rate': 1 - dictionary.n_inserts / dictionary.n_lookups if dictionary.n_lookups else 0.0,
+            }
+            for feature, dictionary in processor.category_dictionaries.items()
+        }
+
+    def to_dict(self):
+        hot_path_rows = self.single_candidate_checks + self.intersections + self.matcher_probes
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': time.time() - self.started_at,
+            'rows': self.rows,
+            'batches': self.batches,
+            'match_seconds': self.match_seconds,
+            'rows_per_sec': self.rows / self.match_seconds if self.match_seconds > 0 else 0.0,
+            'phase_seconds': dict(zip(self.PHASES, self.phase_seconds)),
+            'new_fingerprints': self.new_fingerprints,
+            'matches': dict(self.matches),
+            'anchor_hit_rate': self.anchor_matches / self.rows if self.rows else 0.0,
+            'single_candidate_checks': self.single_candidate_checks,
+            'intersections': self.intersections,
+            'matcher_probes': self.matcher_probes,
+            'single_candidate_rate': self.single_candidate_checks / hot_path_rows if hot_path_rows else 0.0,
+            'reducer_rejects': self.reducer_rejects,
+            'candidates_total': self.candidates_total,
+            'candidate_histogram': {
+                str(bound): count
+                for bound, count in zip(self.CANDIDATE_BUCKETS + ('+Inf',), self.candidate_histogram)
+            },
+            'state': dict(self.gauges),
+            'dictionaries': {feature: dict(stats) for feature, stats in self.dictionaries.items()},
+        }
+
+    def to_prometheus(self, prefix='fingerprint'):
+        """Render the metrics in the Prometheus text exposition format."""
+        metrics = self.to_dict()
+        lines = []
+
+        def add(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for labels, value in samples:
+                label_text = '{' + ','.join(f'{key}="{val}"' for key, val in labels.items()) + '}' if labels else ''
+                lines.append(f"{prefix}_{name}{label_text} {value}")
+
+        add('rows_total', 'counter', 'Rows matched.', [({}, metrics['rows'])])
+        add('match_seconds_total', 'counter', 'Time spent in the matching loop.', [({}, metrics['match_seconds'])])
+        add('phase_seconds_total', 'counter', 'Time spent per matching phase (python engine).',
+            [({'phase': phase}, seconds) for phase, seconds in metrics['phase_seconds'].items()])
+        add('matches_total', 'counter', 'Rows matched to an existing fingerprint, by feature.',
+            [({'feature': feature}, count) for feature, count in metrics['matches'].items()])
+        add('new_fingerprints_total', 'counter', 'Rows that created a new fingerprint.',
+            [({}, metrics['new_fingerprints'])])
+        add('single_candidate_checks_total', 'counter', 'Reducer phases answered by a single signature check.',
+            [({}, metrics['single_candidate_checks'])])
+        add('intersections_total', 'counter', 'Rows that intersected the reducer posting lists.',
+            [({}, metrics['intersections'])])
+        add('matcher_probes_total', 'counter', 'Rows answered by probing matcher posting lists only.',
+            [({}, metrics['matcher_probes'])])
+        add('reducer_rejects_total', 'counter', 'Rows without candidates after the reducer phase.',
+            [({}, metrics['reducer_rejects'])])
+
+        cumulative = np.cumsum(self.candidate_histogram).tolist()
+        lines.append(f"# HELP {prefix}_candidates Candidate-set size after the reducer phase.")
+        lines.append(f"# TYPE {prefix}_candidates histogram")
+        for bound, count in zip(self.CANDIDATE_BUCKETS + ('+Inf',), cumulative):
+            lines.append(f'{prefix}_candidates_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{prefix}_candidates_sum {metrics['candidates_total']}")
+        lines.append(f"{prefix}_candidates_count {cumulative[-1]}")
+
+        for name, value in metrics['state'].items():
+            add(name, 'gauge', f"Current {name.replace('_', ' ')}.", [({}, value)])
+        add('dictionary_values', 'gauge', 'Values in the category dictionary.',
+            [({'feature': feature}, stats['values']) for feature, stats in metrics['dictionaries'].items()])
+        add('dictionary_hit_ratio', 'gauge', 'Share of distinct encoded values already in the dictionary.',
+            [({'feature': feature}, stats['hit_rate']) for feature, stats in metrics['dictionaries'].items()])
+
+        return '\n'.join(lines) + '\n'
+
+    def emit(self, force=False):
+        """Append a JSON line and rewrite the Prometheus file, at most once per emit_interval unless forced."""
+        now = time.time()
+        if not force and now - self._last_emit < self.emit_interval:
+            return
+        self._last_emit = now
+
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(self.to_dict()) + '\n')
+
+        if self.prometheus_path:
+            # Write then rename so a scraper never reads a half-written file
+            tmp_path = f"{self.prometheus_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
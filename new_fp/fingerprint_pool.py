@@ -0,0 +1,293 @@
+import os
+import json
+import shutil
+import numpy as np
+
+from device_fingerprint import SmartFingerprintProcessor, snapshot_exists
+from fingerprint_store import CategoryDictionary, save_category_dictionaries, load_category_dictionaries
+
+
+class ColdFingerprintTier:
+    """
+    On-disk tier for evicted fingerprints of one processor.
+
+    Evicting fingerprints writes their signatures and last-seen times to a segment directory and removes
+    them from the signature store and index; their dense ids stay reserved. Before a batch is matched,
+    reload_matching brings back every cold fingerprint sharing a value with any row of the batch, at its
+    original id. Every possible match shares at least one value with the row and ids keep their age
+    order, so results are the same as if nothing had been evicted.
+
+    Only the distinct codes of each segment and feature stay in memory, as a filter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.segments = {}  # segment name -> per-feature sorted distinct codes
+        self.n_fingerprints = 0
+
+        for name in sorted(os.listdir(path)):
+            segment_path = os.path.join(path, name)
+            if not os.path.exists(os.path.join(segment_path, 'segment.json')):
+                # Left over from an interrupted eviction or rewrite
+                shutil.rmtree(segment_path, ignore_errors=True)
+                continue
+            codes = np.load(os.path.join(segment_path, 'codes.npy'), mmap_mode='r')
+            self.segments[name] = self._value_filter(codes)
+            self.n_fingerprints += len(codes)
+
+        self._next_segment = max((int(name.split('_')[1]) for name in self.segments), default=-1) + 1
+
+    @staticmethod
+    def _value_filter(codes):
+        return [np.unique(codes[:, feature_idx][codes[:, feature_idx] >= 0]) for feature_idx in range(codes.shape[1])]
+
+    def _write_segment(self, fingerprint_ids, codes, last_seen):
+        name = f'segment_{self._next_segment:06d}'
+        self._next_segment += 1
+        segment_path = os.path.join(self.path, name)
+        os.makedirs(segment_path)
+
+        np.save(os.path.join(segment_path, 'ids.npy'), fingerprint_ids)
+        np.save(os.path.join(segment_path, 'codes.npy'), codes)
+        np.save(os.path.join(segment_path, 'last_seen.npy'), last_seen)
+        # Written last: a segment without it is incomplete
+        with open(os.path.join(segment_path, 'segment.json'), 'w') as f:
+            json.dump({'n_fingerprints': len(fingerprint_ids)}, f)
+
+        self.segments[name] = self._value_filter(codes)
+        self.n_fingerprints += len(fingerprint_ids)
+
+    def evict(self, processor, fingerprint_ids):
+        """Move the given dense fingerprint ids from the processor's memory to a new segment."""
+        fingerprint_ids = np.unique(np.asarray(fingerprint_ids, dtype=np.int64))
+        if not fingerprint_ids.size:
+            return 0
+
+        store = processor.signature_store
+        self._write_segment(fingerprint_ids, store.codes[fingerprint_ids], store.last_seen[fingerprint_ids])
+        processor._deactivate_fingerprints(fingerprint_ids)
+
+        return len(fingerprint_ids)
+
+    def expire(self, cutoff):
+        """Permanently drop cold fingerprints last seen before `cutoff` (epoch ms); returns how many."""
+        n_expired = 0
+        for name in list(self.segments):
+            segment_path = os.path.join(self.path, name)
+            last_seen = np.load(os.path.join(segment_path, 'last_seen.npy'))
+            keep = last_seen >= cutoff
+            if keep.all():
+                continue
+
+            ids = np.load(os.path.join(segment_path, 'ids.npy'))
+            codes = np.load(os.path.join(segment_path, 'codes.npy'))
+
+            del self.segments[name]
+            self.n_fingerprints -= len(ids)
+            if keep.any():
+                self._write_segment(ids[keep], codes[keep], last_seen[keep])
+            shutil.rmtree(segment_path)
+            n_expired += int((~keep).sum())
+
+        return n_expired
+
+    def reload_matching(self, processor, row_codes):
+        """
+        Reload every cold fingerprint sharing a value with any row of `row_codes` (rows of codes in
+        feature order, -1 = missing). Returns the number of reloaded fingerprints.
+        """
+        if not self.segments:
+            return 0
+
+        batch_values = [np.unique(column[column >= 0]) for column in np.asarray(row_codes).T]
+        reloaded = 0
+        for name, value_filter in list(self.segments.items()):
+            hits = [np.intersect1d(values, segment_values, assume_unique=True)
+                    for values, segment_values in zip(batch_values, value_filter)]
+            if any(hit.size for hit in hits):
+                reloaded += self._reload_from_segment(processor, name, hits)
+        return reloaded
+
+    def _reload_from_segment(self, processor, name, hits):
+        segment_path = os.path.join(self.path, name)
+        ids = np.load(os.path.join(segment_path, 'ids.npy'))
+        codes = np.load(os.path.join(segment_path, 'codes.npy'))
+        last_seen = np.load(os.path.join(segment_path, 'last_seen.npy'))
+
+        selected = np.zeros(len(ids), dtype=bool)
+        for feature_idx, hit in enumerate(hits):
+            if hit.size:
+                selected |= np.isin(codes[:, feature_idx], hit)
+        if not selected.any():
+            return 0
+
+        store = processor.signature_store
+        index = processor.inverted_index
+        n_reloaded = 0
+        for position in np.flatnonzero(selected).tolist():
+            fingerprint_id = int(ids[position])
+            if store.active[fingerprint_id]:
+                # Already resident (e.g. the state was saved before this segment was written); drop the copy
+                continue
+            signature = codes[position].tolist()
+            for feature_idx, code in enumerate(signature):
+                if code >= 0:
+                    store.set(fingerprint_id, feature_idx, code)
+                    index.add(feature_idx, code, fingerprint_id)
+            store.touch(fingerprint_id, last_seen[position])
+            store.active[fingerprint_id] = True
+            n_reloaded += 1
+        processor.n_inactive -= n_reloaded
+
+        # Replace the segment with the fingerprints that stay cold
+        del self.segments[name]
+        self.n_fingerprints -= len(ids)
+        keep = ~selected
+        if keep.any():
+            self._write_segment(ids[keep], codes[keep], last_seen[keep])
+        shutil.rmtree(segment_path)
+
+        return n_reloaded
+
+
+class FingerprintProcessorPool:
+    """
+    Tenant-keyed SmartFingerprintProcessors in one process, each with a memory budget.
+
+    Tenant state lives under root_path/<tenant>/ (state/ snapshot and cold/ tier). When a tenant's
+    processor exceeds its budget after a batch, its least recently seen fingerprints are evicted to the
+    cold tier until usage is below `low_watermark` of the budget; they are reloaded transparently when a
+    later row shares a value with them. With `ttl_ms`, fingerprints not seen for that long are dropped
+    after every batch (see SmartFingerprintProcessor.expire_fingerprints).
+
+    Category dictionaries of `shared_features` are shared by all tenants (saved under
+    root_path/shared_categories). Only share features whose values may be visible across tenants,
+    e.g. model-level hashes: a tenant's snapshot then contains the values seen by every tenant.
+    """
+
+    def __init__(self, root_path, memory_budget=None, tenant_budgets=None, shared_features=(), low_watermark=0.8,
+                 ttl_ms=None):
+        self.root_path = root_path
+        self.memory_budget = memory_budget
+        self.tenant_budgets = dict(tenant_budgets or {})
+        self.shared_features = list(shared_features)
+        self.low_watermark = low_watermark
+        self.ttl_ms = ttl_ms
+        self.processors = {}
+
+        os.makedirs(root_path, exist_ok=True)
+        shared_path = os.path.join(root_path, 'shared_categories')
+        self.shared_dictionaries = (load_category_dictionaries(shared_path)
+                                    if os.path.exists(os.path.join(shared_path, 'features.json')) else {})
+
+    def _tenant_path(self, tenant, name):
+        return os.path.join(self.root_path, tenant, name)
+
+    def budget(self, tenant):
+        """Memory budget of a tenant in bytes (None = unlimited)."""
+        return self.tenant_budgets.get(tenant, self.memory_budget)
+
+    def get(self, tenant):
+        """The tenant's processor, loaded from its last saved state on first use."""
+        if tenant in self.processors:
+            return self.processors[tenant]
+
+        state_path = self._tenant_path(tenant, 'state')
+        if snapshot_exists(state_path):
+            processor = SmartFingerprintProcessor.load_snapshot(state_path)
+        else:
+            processor = SmartFingerprintProcessor()
+
+        # Shared dictionaries are append-only, so they extend the copies saved with the tenant's state
+        for feature in self.shared_features:
+            shared = self.shared_dictionaries.setdefault(feature, CategoryDictionary())
+            own = processor.category_dictionaries.get(feature)
+            if own is not None and own.values != shared.values[:len(own)]:
+                raise ValueError(f"Tenant '{tenant}' dictionary for '{feature}' does not match the shared dictionary")
+            processor.category_dictionaries[feature] = shared
+
+        processor.cold_tier = ColdFingerprintTier(self._tenant_path(tenant, 'cold'))
+        self.processors[tenant] = processor
+        return processor
+
+    def process(self, tenant, df, initial_anchor_feature, search_space_reducers, final_identification_features,
+                engine='python', time_column=None):
+        """Match a batch for one tenant, then expire stale fingerprints and enforce the memory budget."""
+        processor = self.get(tenant)
+        result_df = processor.process_fingerprints_smart(df, initial_anchor_feature, search_space_reducers,
+                                                         final_identification_features, engine=engine,
+                                                         time_column=time_column)
+        if self.ttl_ms is not None:
+            processor.expire_fingerprints(self.ttl_ms)
+        self.enforce_budget(tenant)
+        return result_df
+
+    def enforce_budget(self, tenant):
+        """
+        Compact the tenant's signature store and index, then evict its coldest fingerprints in rounds while
+        it is still over budget, compacting after each round; stops once a round frees nothing. Returns the
+        number evicted.
+        """
+        budget = self.budget(tenant)
+        processor = self.processors.get(tenant)
+        if budget is None or processor is None or processor.signature_store is None:
+            return 0
+
+        usage = processor.memory_usage()
+        if usage <= budget:
+            return 0
+
+        initial_usage = usage
+        store = processor.signature_store
+        # Spare capacity and slots left by deleted postings go first; that alone may be enough
+        store.compact()
+        processor.inverted_index.compact()
+        usage = processor.memory_usage()
+        n_evicted = 0
+        while usage > budget:
+            resident = np.flatnonzero(store.active[:store.n_fingerprints])
+            if not resident.size:
+                break
+
+            # The signature matrix keeps a (blank) row per evicted id, so mostly index memory is freed
+            freeable_per_fingerprint = (usage - store.memory_usage()) / resident.size
+            n_evict = int(np.ceil((usage - budget * self.low_watermark) / max(freeable_per_fingerprint, 1)))
+            n_evict = min(n_evict, resident.size)
+
+            coldest = resident[np.argsort(store.last_seen[resident], kind='stable')[:n_evict]]
+            n_evicted += processor.cold_tier.evict(processor, coldest)
+            store.compact()
+
+            usage, previous_usage = processor.memory_usage(), usage
+            if usage >= previous_usage:
+                break
+
+        print(f"Tenant '{tenant}': evicted {n_evicted:,} cold fingerprints, memory {initial_usage / 1024 ** 2:,.1f}MB "
+              f"-> {usage / 1024 ** 2:,.1f}MB (budget {budget / 1024 ** 2:,.1f}MB)")
+        if usage > budget:
+            print(f"WARNING: Tenant '{tenant}' is still over budget; the signature matrix alone needs "
+                  f"{store.memory_usage() / 1024 ** 2:,.1f}MB")
+        return n_evicted
+
+    def save(self, tenant):
+        """Save a tenant's state (its cold tier is already on disk) and the shared dictionaries."""
+        self.processors[tenant].save_snapshot(self._tenant_path(tenant, 'state'))
+        if self.shared_dictionaries:
+            save_category_dictionaries(os.path.join(self.root_path, 'shared_categories'), self.shared_dictionaries)
+
+    def save_all(self):
+        for tenant in self.processors:
+            self.save(tenant)
+
+    def memory_report(self):
+        """{tenant -> memory usage, budget, resident and cold fingerprint counts}."""
+        report = {}
+        for tenant, processor in self.processors.items():
+            report[tenant] = {
+                'memory_bytes': processor.memory_usage(),
+                'budget_bytes': self.budget(tenant),
+                'resident_fingerprints': processor.n_active,
+                'cold_fingerprints': processor.cold_tier.n_fingerprints,
+            }
+        return report
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-value counter over 64-bit hashes (standard error about 1.04 / sqrt(2 ** precision)).
+
+    Sketches with the same precision merge by taking the register-wise maximum, so per-chunk sketches
+    built in different processes combine into the sketch of the whole input.
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not hashes.size:
+            return
+        value_bits = 64 - self.precision
+        buckets = (hashes >> np.uint64(value_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << value_bits) - 1)
+        # Position of the leftmost 1-bit in the remaining bits; remainders below 2 ** 53 convert exactly
+        bit_length = np.frexp(remainder.astype(np.float64))[1]
+        ranks = (value_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        n_registers = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / n_registers)
+        estimate = alpha * n_registers ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        n_zero = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * n_registers and n_zero:
+            # Small range correction (linear counting)
+            estimate = n_registers * np.log(n_registers / n_zero)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary keeping at most `capacity` counters.
+
+    Counts never underestimate; a value's overestimate is at most the smallest counter of a full summary.
+    Two summaries merge by adding counters, charging a value missing from a full summary that summary's
+    smallest counter, and keeping the `capacity` largest.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+
+    def _floor(self):
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def _truncate(self):
+        if len(self.counts) > self.capacity:
+            self.counts = dict(sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:self.capacity])
+
+    def add_counts(self, value_counts):
+        """Add exact counts of a chunk (a value -> count Series, as returned by value_counts())."""
+        chunk = SpaceSaving(self.capacity)
+        # value_counts is sorted by count, so the first `capacity` entries form the chunk's summary and a
+        # value left out occurred at most as often as the first one dropped
+        chunk.counts = dict(zip(value_counts.index[:self.capacity].tolist(),
+                                value_counts.values[:self.capacity].tolist()))
+        dropped_floor = int(value_counts.values[self.capacity]) if len(value_counts) > self.capacity else 0
+        return self.merge(chunk, other_floor=dropped_floor)
+
+    def merge(self, other, other_floor=None):
+        self_floor = self._floor()
+        if other_floor is None:
+            other_floor = other._floor()
+        merged = {value: count + other.counts.get(value, other_floor) for value, count in self.counts.items()}
+        for value, count in other.counts.items():
+            if value not in merged:
+                merged[value] = count + self_floor
+        self.counts = merged
+        self._truncate()
+        return self
+
+    def top(self, k):
+        """The k largest (value, count) pairs."""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class FeatureProfile:
+    """Mergeable single-pass statistics of one column: exact row / null counts, distinct values and top values."""
+
+    def __init__(self, precision=14, top_capacity=1000):
+        self.n_rows = 0
+        self.n_null = 0
+        self.distinct = HyperLogLog(precision)
+        self.top_values = SpaceSaving(top_capacity)
+
+    def update(self, series):
+        values = series.dropna()
+        self.n_rows += len(series)
+        self.n_null += len(series) - len(values)
+        if len(values):
+            value_counts = values.value_counts()
+            # Duplicates never change a HyperLogLog, so only the chunk's distinct values are hashed
+            self.distinct.add_hashes(pd.util.hash_pandas_object(value_counts.index.to_series(), index=False).values)
+            self.top_values.add_counts(value_counts)
+        return self
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        self.n_null += other.n_null
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+        return self
+
+
+class DatasetProfile:
+    """
+    Streaming replacement for analyze_dataset_characteristics: feed chunks with update() (or merge the
+    profiles of chunks built elsewhere) and read the same analysis dict with analysis().
+    """
+
+    def __init__(self, feature_columns, precision=14, top_capacity=1000):
+        self.feature_columns = list(feature_columns)
+        self.features = {feature: FeatureProfile(precision, top_capacity) for feature in self.feature_columns}
+
+    def update(self, df):
+        for feature, profile in self.features.items():
+            profile.update(df[feature])
+        return self
+
+    def merge(self, other):
+        for feature, profile in self.features.items():
+            profile.merge(other.features[feature])
+        return self
+
+    def analysis(self):
+        """{feature -> unique_values, total_values, selectivity, null_ratio, top_10_coverage, recommendation}."""
+        analysis = {}
+        for feature, profile in self.features.items():
+            total_count = profile.n_rows - profile.n_null
+            if total_count == 0:
+                continue
+
+            # A distinct count can neither exceed the non-null count nor be below the values seen
+            unique_count = min(max(profile.distinct.count(), 1), total_count)
+            selectivity = unique_count / total_count
+            top_10_coverage = min(sum(count for _, count in profile.top_values.top(10)) / total_count, 1.0)
+
+            analysis[feature] = {
+                'unique_values': unique_count,
+                'total_values': total_count,
+                'selectivity': selectivity,
+                'null_ratio': profile.n_null / profile.n_rows,
+                'top_10_coverage': top_10_coverage,
+                'recommendation': 'high_discriminative' if selectivity > 0.1 else
+                'medium_discriminative' if selectivity > 0.01 else 'low_discriminative'
+            }
+        return analysis
+
+
+def _profile_chunk(df, feature_columns, precision, top_capacity):
+    return DatasetProfile(feature_columns, precision, top_capacity).update(df)
+
+
+def profile_csv(csv_file_path, feature_columns, chunk_size=1_000_000, n_workers=1, precision=14,
+                top_capacity=1000):
+    """
+    Profile the feature columns of a CSV in one pass, reading only those columns chunk by chunk.
+    With n_workers > 1 chunks are sketched in a process pool (at most 2 per worker in flight) and merged.
+    """
+    profile = DatasetProfile(feature_columns, precision, top_capacity)
+    reader = pd.read_csv(csv_file_path, low_memory=False, dtype=str, usecols=list(feature_columns),
+                         chunksize=chunk_size)
+
+    if n_workers <= 1:
+        for chunk in reader:
+            profile.update(chunk)
+        return profile
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = []
+        for chunk in reader:
+            pending.append(executor.submit(_profile_chunk, chunk, feature_columns, precision, top_capacity))
+            if len(pending) >= 2 * n_workers:
+                profile.merge(pending.pop(0).result())
+        for future in pending:
+            profile.merge(future.result())
+    return profile
@@ -0,0 +1,237 @@
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+
+from device_fingerprint import SmartFingerprintProcessor, NULL_FEATURE_VALUES, now_ms
+from fingerprint_store import CategoryDictionary
+
+# Code for values a read-only lookup has never seen: no fingerprint can carry it
+UNSEEN_CODE = np.iinfo(np.int32).max
+# Largest request / response line (a micro-batch is sent as one JSON line)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class FingerprintLookupService:
+    """
+    Online fingerprint lookups against the in-memory state of a SmartFingerprintProcessor.
+
+    Payloads are dicts shaped like the output of prepare_input_data_for_fingerprint.process_row. Rows are
+    matched with the same anchor / reducer / matcher phases as batch processing. With update=True (the
+    default) matched signatures are updated and unmatched rows register new fingerprints, exactly as if
+    the rows had been appended to the batch input; with update=False the state is never modified and
+    unmatched rows return no fingerprint.
+    """
+
+    def __init__(self, processor, initial_anchor_feature, search_space_reducers, final_identification_features,
+                 update=True):
+        self.processor = processor
+        self.all_features = [initial_anchor_feature] + list(search_space_reducers) + list(final_identification_features)
+        self.n_reducers = len(search_space_reducers)
+        self.update = update
+        self._null_values = set(NULL_FEATURE_VALUES)
+
+        processor._ensure_state(self.all_features)
+        self._dictionaries = [processor.category_dictionaries.setdefault(feature, CategoryDictionary())
+                              for feature in self.all_features]
+
+    @classmethod
+    def from_snapshot(cls, path, initial_anchor_feature, search_space_reducers, final_identification_features,
+                      update=True):
+        processor = SmartFingerprintProcessor.load_snapshot(path)
+        return cls(processor, initial_anchor_feature, search_space_reducers, final_identification_features,
+                   update=update)
+
+    def _encode(self, payload):
+        """Codes of one payload in feature order (-1 = missing) through the shared category dictionaries."""
+        codes = []
+        for feature, dictionary in zip(self.all_features, self._dictionaries):
+            value = payload.get(feature)
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                codes.append(-1)
+                continue
+            value = str(value)
+            if value in self._null_values:
+                codes.append(-1)
+            elif self.update:
+                codes.append(dictionary.lookup(value, insert=True))
+            else:
+                code = dictionary.lookup(value)
+                codes.append(code if code >= 0 else UNSEEN_CODE)
+        return codes
+
+    def _match(self, codes, seen_at):
+        """Returns (dense fingerprint id or None, matched feature index or -1) for one encoded payload."""
+        processor = self.processor
+        find_match = (processor._find_match_instrumented if processor.metrics is not None
+                      else processor._find_match_by_codes)
+        match_result = find_match(codes, self.n_reducers)
+
+        if match_result is not None:
+            fingerprint_id, feature_idx = match_result
+            if self.update:
+                processor._update_fingerprint_signature(fingerprint_id, codes)
+                processor.signature_store.touch(fingerprint_id, seen_at)
+            return fingerprint_id, feature_idx
+
+        if not self.update:
+            return None, -1
+        fingerprint_id = processor._register_new_fingerprint(codes)
+        processor.signature_store.touch(fingerprint_id, seen_at)
+        return fingerprint_id, -1
+
+    def _result(self, fingerprint_id, feature_idx):
+        return {
+            'new_fingerprint': (self.processor.id_map.external_id(fingerprint_id) if fingerprint_id is not None
+                                else None),
+            'is_new_fingerprint': feature_idx < 0,
+            'match_at_feature': self.all_features[feature_idx] if feature_idx >= 0 else 'No Match',
+        }
+
+    def lookup(self, payload):
+        """Match one device payload; returns new_fingerprint / is_new_fingerprint / match_at_feature."""
+        return self.lookup_batch([payload])[0]
+
+    def lookup_batch(self, payloads):
+        """Match a micro-batch of payloads in order (later rows see the updates of earlier ones)."""
+        start_time = time.time()
+        batch_codes = [self._encode(payload) for payload in payloads]
+
+        # Evicted fingerprints sharing a value with the batch must be back in the index before matching
+        if self.processor.cold_tier is not None and batch_codes:
+            self.processor.cold_tier.reload_matching(self.processor, np.array(batch_codes, dtype=np.int32))
+
+        seen_at = now_ms()
+        matches = [self._match(codes, seen_at) for codes in batch_codes]
+
+        metrics = self.processor.metrics
+        if metrics is not None:
+            metrics.record_batch(self.all_features, np.array([feature_idx for _, feature_idx in matches],
+                                                             dtype=np.int64), time.time() - start_time)
+            metrics.observe_state(self.processor)
+            metrics.emit()
+
+        return [self._result(fingerprint_id, feature_idx) for fingerprint_id, feature_idx in matches]
+
+    def save_snapshot(self, path):
+        self.processor.save_snapshot(path)
+
+
+async def _handle_connection(service, reader, writer):
+    """Newline-delimited JSON: {"id", "row"} or {"id", "rows"} in, {"id", "result"/"results"} out."""
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            request = None
+            try:
+                request = json.loads(line)
+                if 'rows' in request:
+                    response = {'id': request.get('id'), 'results': service.lookup_batch(request['rows'])}
+                else:
+                    response = {'id': request.get('id'), 'result': service.lookup(request['row'])}
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                response = {'id': request.get('id') if isinstance(request, dict) else None, 'error': str(e)}
+
+            writer.write(json.dumps(response).encode('utf-8') + b'\n')
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_lookup_server(service, host='127.0.0.1', port=8765):
+    """
+    Start the asyncio front end. Lookups run on the event loop thread, so requests are applied to the
+    processor state one at a time without locking.
+    """
+    return await asyncio.start_server(lambda reader, writer: _handle_connection(service, reader, writer),
+                                      host, port, limit=MAX_MESSAGE_BYTES)
+
+
+class FingerprintClient:
+    """Minimal asyncio client for the lookup server (a local stand-in for the scoring service)."""
+
+    def __init__(self, host='127.0.0.1', port=8765):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+        self._next_id = 0
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port,
+                                                                    limit=MAX_MESSAGE_BYTES)
+        return self
+
+    async def _request(self, request):
+        self._next_id += 1
+        request['id'] = self._next_id
+        self._writer.write(json.dumps(request, default=str).encode('utf-8') + b'\n')
+        await self._writer.drain()
+        response = json.loads(await self._reader.readline())
+        if 'error' in response:
+            raise ValueError(f"Lookup failed: {response['error']}")
+        return response
+
+    async def lookup(self, payload):
+        return (await self._request({'row': payload}))['result']
+
+    async def lookup_batch(self, payloads):
+        return (await self._request({'rows': payloads}))['results']
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+async def _demo(n_rows, batch_size, port):
+    """Prime a processor on synthetic data, serve it and replay held-out rows through the client."""
+    from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                       MATCHER_FEATURES)
+
+    df = generate_synthetic_fingerprint_data(n_rows)
+    n_history = int(n_rows * 0.9)
+    processor = SmartFingerprintProcessor()
+    processor.process_fingerprints_smart(df.iloc[:n_history].reset_index(drop=True), ANCHOR_FEATURE,
+                                         REDUCER_FEATURES, MATCHER_FEATURES)
+
+    service = FingerprintLookupService(processor, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)
+    server = await start_lookup_server(service, port=port)
+    client = await FingerprintClient(port=port).connect()
+
+    payloads = [{feature: (None if pd.isna(value) else value) for feature, value in row.items()}
+                for row in df.iloc[n_history:].astype(object).to_dict('records')]
+
+    latencies = []
+    for payload in payloads:
+        start_time = time.perf_counter()
+        await client.lookup(payload)
+        latencies.append(time.perf_counter() - start_time)
+    latencies = np.array(latencies) * 1000
+    print(f"Single lookups: {len(latencies):,}, p50 {np.percentile(latencies, 50):.3f}ms, "
+          f"p99 {np.percentile(latencies, 99):.3f}ms (round trip)")
+
+    start_time = time.perf_counter()
+    for batch_start in range(0, len(payloads), batch_size):
+        await client.lookup_batch(payloads[batch_start:batch_start + batch_size])
+    elapsed = time.perf_counter() - start_time
+    print(f"Micro-batches of {batch_size}: {len(payloads) / elapsed:,.0f} rows/s")
+
+    await client.close()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the fingerprint lookup service demo on synthetic data.')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    asyncio.run(_demo(args.rows, args.batch_size, args.port))
@@ -0,0 +1,571 @@
+import os
+import sys
+import json
+import uuid
+import hashlib
+import secrets
+import numpy as np
+import pandas as pd
+
+
+class SignatureStore:
+    """
+    Columnar storage for fingerprint signatures.
+
+    Fingerprints are dense integer ids (0, 1, 2, ...) and row `i` of `codes` holds the latest
+    encoded value of every feature for fingerprint `i`. Missing values are stored as -1, the same
+    sentinel pandas uses for missing categorical codes. The matrix grows by amortized doubling.
+    `last_seen[i]` is the latest time (epoch milliseconds) a row was assigned to fingerprint `i`, and
+    `active[i]` is False once it was evicted or expired (its id stays reserved).
+    """
+
+    MISSING = -1
+
+    def __init__(self, features, initial_capacity=1024):
+        self.features = list(features)
+        self.feature_index = {feature: i for i, feature in enumerate(self.features)}
+        self.codes = np.full((max(initial_capacity, 1), len(self.features)), self.MISSING, dtype=np.int32)
+        self.last_seen = np.zeros(self.codes.shape[0], dtype=np.int64)
+        self.active = np.zeros(self.codes.shape[0], dtype=bool)
+        self.n_fingerprints = 0
+        # Non-missing codes over all fingerprints, kept up to date by add/set (see recount)
+        self.n_present = 0
+
+    def __len__(self):
+        return self.n_fingerprints
+
+    @property
+    def capacity(self):
+        return self.codes.shape[0]
+
+    def reserve(self, min_capacity):
+        """Double the capacity until at least `min_capacity` rows fit."""
+        if min_capacity <= self.capacity:
+            return
+
+        new_capacity = self.capacity
+        while new_capacity < min_capacity:
+            new_capacity *= 2
+
+        new_codes = np.full((new_capacity, len(self.features)), self.MISSING, dtype=np.int32)
+        new_codes[:self.n_fingerprints] = self.codes[:self.n_fingerprints]
+        self.codes = new_codes
+
+        new_last_seen = np.zeros(new_capacity, dtype=np.int64)
+        new_last_seen[:self.n_fingerprints] = self.last_seen[:self.n_fingerprints]
+        self.last_seen = new_last_seen
+
+        new_active = np.zeros(new_capacity, dtype=bool)
+        new_active[:self.n_fingerprints] = self.active[:self.n_fingerprints]
+        self.active = new_active
+
+    def compact(self):
+        """
+        Reallocate the arrays at exactly n_fingerprints rows, giving back the spare capacity left by doubling.
+        Rows of evicted fingerprints stay (blank), since ids are dense; the next add doubles the capacity again.
+        """
+        capacity = max(self.n_fingerprints, 1)
+        if capacity < self.capacity:
+            self.codes = self.codes[:capacity].copy()
+            self.last_seen = self.last_seen[:capacity].copy()
+            self.active = self.active[:capacity].copy()
+
+    def add(self, signature_codes):
+        """Append a signature (sequence of codes in feature order) and return its fingerprint id."""
+        fingerprint_id = self.n_fingerprints
+        if fingerprint_id >= self.capacity:
+            self.reserve(fingerprint_id + 1)
+
+        self.codes[fingerprint_id] = signature_codes
+        self.active[fingerprint_id] = True
+        self.n_present += int((self.codes[fingerprint_id] != self.MISSING).sum())
+        self.n_fingerprints += 1
+        return fingerprint_id
+
+    def touch(self, fingerprint_ids, times):
+        """Advance last_seen of fingerprint_ids to times (arrays, or scalars); never moves it backwards."""
+        np.maximum.at(self.last_seen, fingerprint_ids, times)
+
+    def get(self, fingerprint_id, feature_idx):
+        """Return the code of one feature for a fingerprint, or None when it is missing."""
+        code = int(self.codes[fingerprint_id, feature_idx])
+        return code if code != self.MISSING else None
+
+    def set(self, fingerprint_id, feature_idx, code):
+        existing = int(self.codes[fingerprint_id, feature_idx])
+        self.n_present += (code != self.MISSING) - (existing != self.MISSING)
+        self.codes[fingerprint_id, feature_idx] = code
+
+    def recount(self):
+        """Recompute n_present after `codes` was written directly (e.g. by a compiled kernel or a load)."""
+        self.n_present = int((self.codes[:self.n_fingerprints] != self.MISSING).sum())
+
+    def signature(self, fingerprint_id):
+        """Return a {feature -> code} dict of the non-missing values of a fingerprint (for debugging)."""
+        row = self.codes[fingerprint_id]
+        return {feature: int(row[i]) for i, feature in enumerate(self.features) if row[i] != self.MISSING}
+
+    def mean_signature_size(self):
+        """Average number of non-missing features per fingerprint, in constant time."""
+        return self.n_present / self.n_fingerprints if self.n_fingerprints else 0.0
+
+    def signature_sizes(self):
+        """Number of non-missing features per fingerprint."""
+        return (self.codes[:self.n_fingerprints] != self.MISSING).sum(axis=1)
+
+    def memory_usage(self):
+        """Bytes held by the code matrix, last-seen times and active flags (including unused capacity)."""
+        return self.codes.nbytes + self.last_seen.nbytes + self.active.nbytes
+
+
+class FingerprintIdMap:
+    """
+    Deterministic mapping of dense fingerprint ids to external (output) string ids.
+
+    The external id of dense id `i` is 'new_' followed by a keyed BLAKE2b hash of `i` formatted as a
+    version 4 UUID, so external ids are computed when results are written instead of being stored, stay
+    the same across snapshots and evictions, and the same seed always produces the same ids. The seed
+    defaults to a random one, which keeps ids of unrelated runs distinct.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = int(seed) if seed is not None else secrets.randbits(63)
+        self._key = self.seed.to_bytes(8, 'little', signed=True)
+
+    def external_id(self, fingerprint_id):
+        """External id of one dense fingerprint id."""
+        digest = hashlib.blake2b(int(fingerprint_id).to_bytes(8, 'little'), digest_size=16, key=self._key).digest()
+        return f"new_{uuid.UUID(bytes=digest, version=4)}"
+
+    def external_ids(self, fingerprint_ids):
+        """Object array with the external id of every dense id in an array; each distinct id is hashed once."""
+        unique_ids, inverse = np.unique(np.asarray(fingerprint_ids, dtype=np.int64), return_inverse=True)
+        external = np.array([self.external_id(fingerprint_id) for fingerprint_id in unique_ids.tolist()],
+                            dtype=object)
+        return external[inverse.reshape(-1)]
+
+
+class PostingBitmap:
+    """Growable bitmap of fingerprint ids used for very popular feature values."""
+
+    __slots__ = ('words', 'count')
+
+    def __init__(self, fingerprint_ids=()):
+        fingerprint_ids = np.asarray(fingerprint_ids, dtype=np.int64)
+        n_words = int(fingerprint_ids.max()) // 64 + 1 if fingerprint_ids.size else 1
+        self.words = np.zeros(n_words, dtype=np.uint64)
+        np.bitwise_or.at(self.words, fingerprint_ids >> 6,
+                         np.left_shift(np.uint64(1), (fingerprint_ids & 63).astype(np.uint64)))
+        self.count = int(fingerprint_ids.size)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, fingerprint_id):
+        word = fingerprint_id >> 6
+        return word < self.words.size and bool((int(self.words[word]) >> (fingerprint_id & 63)) & 1)
+
+    def add(self, fingerprint_id):
+        word = fingerprint_id >> 6
+        if word >= self.words.size:
+            new_words = np.zeros(max(word + 1, self.words.size * 2), dtype=np.uint64)
+            new_words[:self.words.size] = self.words
+            self.words = new_words
+        bit = 1 << (fingerprint_id & 63)
+        value = int(self.words[word])
+        if not value & bit:
+            self.words[word] = value | bit
+            self.count += 1
+
+    def discard(self, fingerprint_id):
+        if fingerprint_id in self:
+            word = fingerprint_id >> 6
+            self.words[word] = int(self.words[word]) & ~(1 << (fingerprint_id & 63))
+            self.count -= 1
+
+    def contains_many(self, fingerprint_ids):
+        """Vectorized membership test for an array of fingerprint ids."""
+        words = fingerprint_ids >> 6
+        in_range = words < self.words.size
+        mask = np.zeros(fingerprint_ids.size, dtype=bool)
+        ids = fingerprint_ids[in_range]
+        mask[in_range] = ((self.words[words[in_range]] >> (ids & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+        return mask
+
+    def to_array(self):
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder='little')
+        return np.flatnonzero(bits).astype(np.int32)
+
+    def nbytes(self):
+        return self.words.nbytes
+
+
+class InvertedIndex:
+    """
+    Inverted index: feature -> encoded value -> posting list of fingerprint ids.
+
+    Posting lists use the smallest container that fits (roaring-style container switching):
+    1. A plain int when a value belongs to a single fingerprint (by far the most common case)
+    2. A sorted int32 array for small lists
+    3. A PostingBitmap once a list is both large and dense, e.g. a popular device model hash
+    Empty posting lists are removed, so the index only holds values that are in use.
+    """
+
+    BITMAP_MIN_SIZE = 4096
+    # Switch to a bitmap once a list covers 1/32 of the id space (where a bitmap gets cheaper than int32s)
+    BITMAP_DENSITY = 1 / 32
+
+    def __init__(self, features):
+        self.features = list(features)
+        self.feature_index = {feature: i for i, feature in enumerate(self.features)}
+        self.postings = [{} for _ in self.features]
+
+    @classmethod
+    def from_store(cls, store):
+        """Build the index of every non-missing value in a SignatureStore."""
+        fingerprint_ids = np.arange(store.n_fingerprints, dtype=np.int32)
+        arrays = []
+
+        for feature_idx in range(len(store.features)):
+            codes = store.codes[:store.n_fingerprints, feature_idx]
+            present = codes != store.MISSING
+            # Stable sort keeps fingerprint ids ascending within each code
+            order = np.argsort(codes[present], kind='stable')
+            codes = codes[present][order]
+            ids = fingerprint_ids[present][order]
+
+            starts = np.flatnonzero(np.r_[True, np.diff(codes) != 0]) if codes.size else np.empty(0, dtype=np.int64)
+            arrays.append((codes[starts], np.r_[starts, codes.size].astype(np.int64), ids))
+
+        return cls.from_arrays(store.features, arrays)
+
+    @classmethod
+    def from_arrays(cls, features, arrays):
+        """Rebuild an index from the per-feature (codes, offsets, fingerprint_ids) arrays of to_arrays()."""
+        index = cls(features)
+        for feature_idx, (codes, offsets, ids) in enumerate(arrays):
+            codes = np.asarray(codes)
+            ids = np.asarray(ids, dtype=np.int32)
+            starts, ends = np.asarray(offsets[:-1]), np.asarray(offsets[1:])
+            single = ends - starts == 1
+            # Most values belong to a single fingerprint; their plain int postings are built in one pass
+            postings = dict(zip(codes[single].tolist(), ids[starts[single]].tolist()))
+            for code, start, end in zip(codes[~single].tolist(), starts[~single].tolist(), ends[~single].tolist()):
+                postings[code] = index._make_posting(ids[start:end])
+            index.postings[feature_idx] = postings
+        return index
+
+    def to_arrays(self):
+        """
+        Export the posting lists in CSR form, one (codes, offsets, fingerprint_ids) tuple per feature:
+        the fingerprints of codes[i] are fingerprint_ids[offsets[i]:offsets[i + 1]], sorted ascending.
+        """
+        arrays = []
+        for feature_idx, postings in enumerate(self.postings):
+            codes = np.array(sorted(postings), dtype=np.int32)
+            lists = [self.get(feature_idx, code) for code in codes.tolist()]
+            sizes = np.fromiter((len(ids) for ids in lists), dtype=np.int64, count=len(lists))
+            offsets = np.r_[0, np.cumsum(sizes)].astype(np.int64)
+            ids = np.concatenate(lists).astype(np.int32) if lists else np.empty(0, dtype=np.int32)
+            arrays.append((codes, offsets, ids))
+        return arrays
+
+    def _make_posting(self, fingerprint_ids):
+        """Pick the container for a sorted array of fingerprint ids."""
+        if fingerprint_ids.size == 1:
+            return int(fingerprint_ids[0])
+        if self._wants_bitmap(fingerprint_ids):
+            return PostingBitmap(fingerprint_ids)
+        return fingerprint_ids.copy()
+
+    def _wants_bitmap(self, fingerprint_ids):
+        return (fingerprint_ids.size >= self.BITMAP_MIN_SIZE
+                and fingerprint_ids.size >= self.BITMAP_DENSITY * (int(fingerprint_ids[-1]) + 1))
+
+    def add(self, feature_idx, code, fingerprint_id):
+        postings = self.postings[feature_idx]
+        posting = postings.get(code)
+
+        if posting is None:
+            postings[code] = int(fingerprint_id)
+        elif type(posting) is int:
+            if posting != fingerprint_id:
+                postings[code] = np.array(sorted((posting, fingerprint_id)), dtype=np.int32)
+        elif type(posting) is np.ndarray:
+            new_id = np.array([fingerprint_id], dtype=np.int32)
+            if fingerprint_id > posting[-1]:
+                # New fingerprints have the largest id, so appending is the common case
+                posting = np.concatenate((posting, new_id))
+            else:
+                pos = posting.searchsorted(fingerprint_id)
+                if posting[pos] == fingerprint_id:
+                    return
+                # Slicing + concatenate is much cheaper than np.insert for small arrays
+                posting = np.concatenate((posting[:pos], new_id, posting[pos:]))
+            if self._wants_bitmap(posting):
+                posting = PostingBitmap(posting)
+            postings[code] = posting
+        else:
+            posting.add(fingerprint_id)
+
+    def discard(self, feature_idx, code, fingerprint_id):
+        postings = self.postings[feature_idx]
+        posting = postings.get(code)
+
+        if posting is None:
+            return
+        if isinstance(posting, int):
+            if posting == fingerprint_id:
+                del postings[code]
+        elif isinstance(posting, np.ndarray):
+            pos = np.searchsorted(posting, fingerprint_id)
+            if pos < posting.size and posting[pos] == fingerprint_id:
+                posting = np.concatenate((posting[:pos], posting[pos + 1:]))
+                postings[code] = int(posting[0]) if posting.size == 1 else posting
+        else:
+            posting.discard(fingerprint_id)
+            if len(posting) < self.BITMAP_MIN_SIZE // 2:
+                postings[code] = posting.to_array()
+
+    def compact(self, feature_indices=None):
+        """
+        Reallocate the posting dicts of feature_indices (default: all) at their current size. Python dicts
+        never shrink when entries are deleted, so memory of discarded postings is only given back here.
+        """
+        for feature_idx in (range(len(self.postings)) if feature_indices is None else feature_indices):
+            self.postings[feature_idx] = dict(self.postings[feature_idx])
+
+    def count(self, feature_idx, code):
+        posting = self.postings[feature_idx].get(code)
+        if posting is None:
+            return 0
+        if type(posting) is int:
+            return 1
+        return len(posting)
+
+    def first(self, feature_idx, code):
+        """Smallest (oldest) fingerprint id having `code` for a feature, or None."""
+        posting = self.postings[feature_idx].get(code)
+        if posting is None:
+            return None
+        if isinstance(posting, int):
+            return posting
+        if isinstance(posting, np.ndarray):
+            return int(posting[0])
+        return int(posting.to_array()[0])
+
+    def get(self, feature_idx, code):
+        """Sorted array of fingerprint ids having `code` for a feature (empty if none)."""
+        posting = self.postings[feature_idx].get(code)
+        if posting is None:
+            return np.empty(0, dtype=np.int32)
+        if isinstance(posting, int):
+            return np.array([posting], dtype=np.int32)
+        if isinstance(posting, np.ndarray):
+            return posting
+        return posting.to_array()
+
+    def intersect(self, terms):
+        """
+        Intersect the posting lists of several (feature_idx, code) terms.
+
+        Lists are intersected smallest first, so the cost is driven by the most selective term rather
+        than by hot values. Returns a sorted array of fingerprint ids.
+        """
+        sized_terms = []
+        for feature_idx, code in terms:
+            posting = self.postings[feature_idx].get(code)
+            if posting is None:
+                return np.empty(0, dtype=np.int32)
+            sized_terms.append((1 if type(posting) is int else len(posting), feature_idx, code, posting))
+        if not sized_terms:
+            return np.empty(0, dtype=np.int32)
+        sized_terms.sort(key=lambda term: term[0])
+
+        _, feature_idx, code, _ = sized_terms[0]
+        result = self.get(feature_idx, code)
+
+        for _, feature_idx, code, posting in sized_terms[1:]:
+            if type(posting) is int:
+                result = result[result == posting]
+            elif type(posting) is np.ndarray:
+                positions = np.minimum(posting.searchsorted(result), posting.size - 1)
+                result = result[posting[positions] == result]
+            else:
+                result = result[posting.contains_many(result)]
+
+            if not result.size:
+                break
+
+        return result
+
+    def n_values(self, feature_idx):
+        return len(self.postings[feature_idx])
+
+    def n_associations(self, feature_idx):
+        return sum(1 if isinstance(posting, int) else len(posting)
+                   for posting in self.postings[feature_idx].values())
+
+    def memory_usage(self):
+        """Approximate bytes held by the index: dict tables plus array and bitmap containers."""
+        total = 0
+        for postings in self.postings:
+            total += sys.getsizeof(postings)
+            for posting in postings.values():
+                if isinstance(posting, np.ndarray):
+                    total += posting.nbytes
+                elif isinstance(posting, PostingBitmap):
+                    total += posting.nbytes()
+        return total
+
+
+class CandidateSet:
+    """
+    The fingerprints sharing every present reducer value of a row, intersected only when needed.
+
+    A fingerprint is in the posting list of (feature, code) exactly when its stored code for that feature
+    is code, so membership can be tested on the signature rows. `bound` (the smallest posting list size)
+    is an upper bound of the set size; `ids` materializes the sorted intersection once.
+    """
+
+    __slots__ = ('store', 'index', 'terms', 'bound', 'features', 'codes', '_ids')
+
+    def __init__(self, store, index, terms, bound):
+        self.store = store
+        self.index = index
+        self.terms = terms
+        self.bound = bound
+        self.features = [feature_idx for feature_idx, _ in terms]
+        self.codes = np.array([code for _, code in terms], dtype=np.int32)
+        self._ids = None
+
+    @property
+    def materialized(self):
+        return self._ids is not None
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = self.index.intersect(self.terms)
+        return self._ids
+
+    def __contains__(self, fingerprint_id):
+        signature = self.store.codes[fingerprint_id]
+        for feature_idx, code in self.terms:
+            if signature[feature_idx] != code:
+                return False
+        return True
+
+    def filter(self, fingerprint_ids):
+        """The members of a sorted id array, in order."""
+        if self._ids is not None:
+            positions = np.minimum(self._ids.searchsorted(fingerprint_ids), max(self._ids.size - 1, 0))
+            return fingerprint_ids[self._ids[positions] == fingerprint_ids] if self._ids.size else self._ids
+        signatures = self.store.codes[fingerprint_ids[:, None], self.features]
+        return fingerprint_ids[(signatures == self.codes).all(axis=1)]
+
+
+def save_string_array(path_prefix, values):
+    """
+    Save strings as a flat UTF-8 byte buffer plus int64 offsets (`<prefix>_data.npy`, `<prefix>_offsets.npy`).
+    Both files are plain .npy arrays, so they can be memory-mapped and need no pickle.
+    """
+    encoded = [str(value).encode('utf-8') for value in values]
+    lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+    np.save(f"{path_prefix}_data.npy", np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(f"{path_prefix}_offsets.npy", np.r_[0, np.cumsum(lengths)].astype(np.int64))
+
+
+def load_string_array(path_prefix):
+    """Load strings written by save_string_array as a list."""
+    data = np.load(f"{path_prefix}_data.npy", mmap_mode='r')
+    offsets = np.load(f"{path_prefix}_offsets.npy").tolist()
+    buffer = data.tobytes()
+    return [buffer[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class CategoryDictionary:
+    """
+    Append-only value -> code dictionary for one feature.
+
+    Codes are assigned in first-seen order and never change, so the same value gets the same code in
+    every chunk, run and processor that shares the dictionary. Encoding a batch factorizes it first and
+    only looks up its distinct values in the hash map.
+    """
+
+    def __init__(self, values=()):
+        self.values = [str(value) for value in values]
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        # Distinct non-null values looked up by encode() and how many of them were new
+        self.n_lookups = 0
+        self.n_inserts = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, series, null_values=(), insert=True):
+        """
+        Encode a pandas Series to an int32 code array; nulls and any of `null_values` encode as -1.
+        Unseen values are appended when `insert` is True, otherwise they encode as -1.
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.cat.remove_unused_categories()
+            local_codes = series.cat.codes.values
+            uniques = series.cat.categories
+        else:
+            local_codes, uniques = pd.factorize(series)
+
+        # Cleaning and lookups only touch the distinct values of the batch
+        uniques = pd.Index(uniques).astype('string')
+        is_null = (uniques.isna() | uniques.isin(list(null_values))).tolist()
+        n_before = len(self.values)
+        remap = np.fromiter((-1 if null else self.lookup(value, insert=insert)
+                             for value, null in zip(uniques, is_null)),
+                            dtype=np.int32, count=len(uniques))
+        self.n_lookups += len(is_null) - sum(is_null)
+        self.n_inserts += len(self.values) - n_before
+        remap = np.append(remap, np.int32(-1))  # local code -1 (null) stays -1
+        return remap[local_codes]
+
+    def lookup(self, value, insert=False):
+        """Code of a single value, -1 if it is unknown and `insert` is False."""
+        code = self.codes.get(value)
+        if code is None:
+            if not insert:
+                return -1
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code):
+        return self.values[code] if 0 <= code < len(self.values) else None
+
+    @property
+    def categories(self):
+        return pd.Index(self.values, dtype='string')
+
+    def save(self, path_prefix):
+        save_string_array(path_prefix, self.values)
+
+    @classmethod
+    def load(cls, path_prefix):
+        return cls(load_string_array(path_prefix))
+
+
+def save_category_dictionaries(path, dictionaries):
+    """Save a {feature -> CategoryDictionary} mapping to a directory."""
+    os.makedirs(path, exist_ok=True)
+    features = list(dictionaries)
+    for feature_idx, feature in enumerate(features):
+        dictionaries[feature].save(os.path.join(path, f'categories_{feature_idx}'))
+    with open(os.path.join(path, 'features.json'), 'w') as f:
+        json.dump(features, f, indent=2)
+
+
+def load_category_dictionaries(path):
+    """Load a {feature -> CategoryDictionary} mapping written by save_category_dictionaries."""
+    with open(os.path.join(path, 'features.json')) as f:
+        features = json.load(f)
+    return {feature: CategoryDictionary.load(os.path.join(path, f'categories_{feature_idx}'))
+            for feature_idx, feature in enumerate(features)}
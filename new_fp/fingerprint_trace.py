@@ -0,0 +1,68 @@
+import json
+import time
+from collections import deque
+import numpy as np
+
+
+class FingerprintTracer:
+    """
+    Trace matching decisions for selected anchor values and fingerprints.
+
+    Traced rows are located once per batch with a vectorized lookup, so untraced rows only pay a set
+    membership test. Events go to a bounded ring buffer (oldest events are dropped first) and optionally
+    to a JSON-lines file and stdout. The file is opened for appending on the next event after close(), so
+    the processor closes it after every batch; the tracer can also be used as a context manager.
+
+    Args:
+        anchor_values: Anchor values whose rows are traced
+        fingerprint_ids: External fingerprint ids whose matches are traced
+        max_events: Size of the in-memory ring buffer
+        path: Optional JSON-lines file every event is appended to
+        echo: Print events as they happen
+        follow_fingerprints: Also trace later matches of fingerprints assigned to traced anchor rows
+    """
+
+    def __init__(self, anchor_values=(), fingerprint_ids=(), max_events=10000, path=None, echo=True,
+                 follow_fingerprints=True):
+        self.anchor_values = {str(value) for value in anchor_values}
+        self.fingerprint_ids = set(fingerprint_ids)
+        self.events = deque(maxlen=max_events)
+        self.n_events = 0  # Including events dropped from the ring buffer
+        self.path = path
+        self.echo = echo
+        self.follow_fingerprints = follow_fingerprints
+        self._file = None
+
+    def traced_rows(self, anchor_series):
+        """Positions of the rows carrying one of the traced anchor values."""
+        if not self.anchor_values:
+            return frozenset()
+        mask = anchor_series.isin(self.anchor_values).to_numpy(dtype=bool, na_value=False)
+        return frozenset(np.flatnonzero(mask).tolist())
+
+    def log(self, message, row_idx=None, **fields):
+        """Record one trace event."""
+        event = {'row_idx': row_idx, 'message': message, 'timestamp': time.time(), **fields}
+        self.events.append(event)
+        self.n_events += 1
+
+        if self.path:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(json.dumps(event, default=str) + '\n')
+            self._file.flush()
+
+        if self.echo:
+            print(f"[DEBUG Row {row_idx}] {message}")
+
+    def close(self):
+        """Close the trace file, if open."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
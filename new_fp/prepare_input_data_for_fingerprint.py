@@ -1,12 +1,16 @@
+import io
 import os
 import h3
 import csv
 import ast
 import json
+import mmap
 import hashlib
 import pandas as pd
 from tqdm import tqdm
-from typing import Dict, List, Any, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 
 
 def round_to_nearest_base(number, base):
@@ -195,7 +199,108 @@ def get_file_line_count(file_path: str) -> int:
     return count - 1  # Subtract 1 for header
 
 
-def stream_process_csv(input_file: str, output_file: str, chunk_size: int = 10000, sample_rows: int = 1000):
+def record_aligned_ranges(file_path: str, range_bytes: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Split a CSV into byte ranges of whole records of about range_bytes each.
+
+    A newline ends a record only outside a quoted field, i.e. after an even number of quote characters
+    (escaped quotes are doubled, so they keep the parity). The scan counts quotes between candidate
+    newlines, so it is one pass over the bytes. Returns (header fields, [(start, end)] after the header).
+    """
+    with open(file_path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return [], []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            record_ends = []
+            cursor = 0  # data[:cursor] has been scanned
+            odd_quotes = 0
+            target = 0  # The first record end is the end of the header
+            while True:
+                newline = data.find(b'\n', max(target, cursor))
+                if newline < 0:
+                    break
+                odd_quotes ^= data[cursor:newline].count(b'"') & 1
+                cursor = newline
+                if odd_quotes:
+                    # Newline inside a quoted field, keep looking
+                    target = newline + 1
+                    continue
+                record_ends.append(newline + 1)
+                target = newline + 1 + range_bytes
+            if not record_ends or record_ends[-1] < size:
+                # Last record without a trailing newline
+                record_ends.append(size)
+
+            header = next(csv.reader(io.StringIO(data[:record_ends[0]].decode('utf-8'), newline='')))
+
+    ranges = [(start, end) for start, end in zip(record_ends[:-1], record_ends[1:])]
+    return header, ranges
+
+
+def _process_byte_range(input_file: str, start: int, end: int, header: List[str], available_cols: List[str],
+                        all_fieldnames: List[str]) -> Tuple[int, int, str]:
+    """Worker: transform the records in input_file[start:end]; returns (rows, valid rows, output CSV text)."""
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+
+    output = io.StringIO(newline='')
+    writer = csv.DictWriter(output, fieldnames=all_fieldnames, extrasaction='ignore')
+    total_rows = 0
+    valid_rows = 0
+    for row in csv.DictReader(io.StringIO(text, newline=''), fieldnames=header):
+        total_rows += 1
+        processed_row = process_row({k: row.get(k, '') for k in available_cols})
+        if processed_row:
+            valid_rows += 1
+            writer.writerow({field: processed_row.get(field, None) for field in all_fieldnames})
+    return total_rows, valid_rows, output.getvalue()
+
+
+def _process_csv_parallel(input_file: str, output_file: str, available_cols: List[str], all_fieldnames: List[str],
+                          n_workers: int, range_bytes: int) -> Tuple[int, int]:
+    """
+    Transform record-aligned byte ranges in a process pool. Ranges are written in input order as soon as
+    the oldest one is done; at most 2 ranges per worker are in flight, which bounds memory.
+    """
+    header, ranges = record_aligned_ranges(input_file, range_bytes)
+    print(f"Split into {len(ranges):,} ranges of ~{range_bytes / 1024 ** 2:.0f}MB for {n_workers} workers\n")
+
+    total_rows = 0
+    valid_rows = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as outfile, \
+            ProcessPoolExecutor(max_workers=n_workers) as executor, \
+            tqdm(total=os.path.getsize(input_file), desc="Processing rows", unit="B", unit_scale=True,
+                 dynamic_ncols=True) as pbar:
+        csv.DictWriter(outfile, fieldnames=all_fieldnames).writeheader()
+
+        pending = deque()
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < 2 * n_workers:
+                start, end = ranges[next_range]
+                pending.append((end - start, executor.submit(_process_byte_range, input_file, start, end, header,
+                                                             available_cols, all_fieldnames)))
+                next_range += 1
+
+            n_bytes, future = pending.popleft()
+            range_rows, range_valid, text = future.result()
+            outfile.write(text)
+            total_rows += range_rows
+            valid_rows += range_valid
+
+            pbar.set_postfix({
+                'valid': f"{valid_rows:,}",
+                'valid_rate': f"{(valid_rows / total_rows * 100) if total_rows else 0:.1f}%"
+            })
+            pbar.update(n_bytes)
+
+    return total_rows, valid_rows
+
+
+def stream_process_csv(input_file: str, output_file: str, chunk_size: int = 10000, sample_rows: int = 1000,
+                       n_workers: int = 1, range_bytes: int = 16 * 1024 ** 2):
     """
     Stream process large CSV file in chunks
     Args:
@@ -203,6 +308,9 @@ def stream_process_csv(input_file: str, output_file: str, chunk_size: int = 1000
         output_file: Path to output CSV file
         chunk_size: Number of rows to process before writing (controls memory usage)
         sample_rows: Number of rows to sample to discover all possible columns
+        n_workers: Processes transforming rows; above 1 the input is split into record-aligned byte ranges
+            of about range_bytes that are transformed in parallel and written in input order
+        range_bytes: Size of the byte ranges in parallel mode
     """
 
     cols_required = [
@@ -249,6 +357,12 @@ def stream_process_csv(input_file: str, output_file: str, chunk_size: int = 1000
     print(f"STEP 2: Full File Processing")
     print(f"{'=' * 70}")
 
+    if n_workers > 1:
+        total_rows, valid_rows = _process_csv_parallel(input_file, output_file, available_cols, all_fieldnames,
+                                                       n_workers, range_bytes)
+        _print_summary(output_file, total_rows, valid_rows)
+        return total_rows, valid_rows
+
     # Get total line count for accurate progress bar
     total_lines = get_file_line_count(input_file)
     print(f"Total rows to process: {total_lines:,}\n")
@@ -296,6 +410,11 @@ def stream_process_csv(input_file: str, output_file: str, chunk_size: int = 1000
                 if processed_rows:
                     writer.writerows(processed_rows)
 
+    _print_summary(output_file, total_rows, valid_rows)
+    return total_rows, valid_rows
+
+
+def _print_summary(output_file: str, total_rows: int, valid_rows: int):
     print(f"\n{'=' * 70}")
     print(f"✓ COMPLETED!")
     print(f"{'=' * 70}")
@@ -306,11 +425,10 @@ def stream_process_csv(input_file: str, output_file: str, chunk_size: int = 1000
     print(f"Output file size:     {os.path.getsize(output_file) / (1024 ** 3):.2f} GB")
     print(f"{'=' * 70}\n")
 
-    return total_rows, valid_rows
-
 
 if __name__ == "__main__":
     input_csv = "for_input_file_new.csv"
     output_csv = "niyo_fraud_data_for_fgp_new.csv"
 
-    total, valid = stream_process_csv(input_csv, output_csv, chunk_size=20000, sample_rows=20000)
\ No newline at end of file
+    total, valid = stream_process_csv(input_csv, output_csv, chunk_size=20000, sample_rows=20000,
+                                      n_workers=os.cpu_count() or 1)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+# The modules live next to this directory and import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def quiet():
+    """Factory of a context that swallows the progress output of the code under test."""
+    return lambda: contextlib.redirect_stdout(io.StringIO())
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from device_fingerprint import process_fingerprints_smart
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+from fingerprint_collisions import BOTH, SHARED_FINGERPRINT, SPLIT_DEVICE, find_collisions
+
+
+@pytest.fixture(scope='module')
+def result_df(tmp_path_factory, quiet):
+    df = generate_synthetic_fingerprint_data(5000, n_devices=1500, churn_rate=0.2, collision_rate=0.05, seed=19)
+    with quiet():
+        result = process_fingerprints_smart(df, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES, id_seed=8)
+    # A few rows reported by another device make their fingerprints shared
+    relabeled = result.index[result.index % 89 == 5]
+    result.loc[relabeled, 'deviceId'] = result['deviceId'].iloc[::-1].iloc[:len(relabeled)].to_numpy()
+    # Rows without a device only take part through their fingerprint
+    result.loc[result.index % 97 == 0, 'deviceId'] = None
+    # As the collision pass reads it back
+    path = tmp_path_factory.mktemp('result') / 'result.csv'
+    result.to_csv(path, index=False)
+    return pd.read_csv(path, dtype=str)
+
+
+def _expected(result):
+    pairs = result.dropna(subset=['new_fingerprint', 'deviceId'])
+    devices_per_fingerprint = pairs.groupby('new_fingerprint')['deviceId'].nunique()
+    fingerprints_per_device = pairs.groupby('deviceId')['new_fingerprint'].nunique()
+    shared = result['new_fingerprint'].isin(devices_per_fingerprint.index[devices_per_fingerprint > 1])
+    split = result['deviceId'].isin(fingerprints_per_device.index[fingerprints_per_device > 1])
+
+    rows = result[shared | split].copy()
+    rows['collision_type'] = np.where(shared & split, BOTH, np.where(shared, SHARED_FINGERPRINT, SPLIT_DEVICE))[
+        (shared | split).to_numpy()]
+    rows = rows.sort_values(['deviceId', 'timestamp'], kind='stable', na_position='last').reset_index(drop=True)
+    return int((devices_per_fingerprint > 1).sum()), int((fingerprints_per_device > 1).sum()), rows
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_collisions_match_a_pandas_groupby(result_df, tmp_path, quiet, suffix):
+    result_path = tmp_path / f'result{suffix}'
+    if suffix == '.csv':
+        result_df.to_csv(result_path, index=False)
+    else:
+        result_df.to_parquet(result_path, index=False, row_group_size=400)
+
+    # Small chunks and few partitions: every partition holds pairs of many chunks
+    with quiet():
+        summary = find_collisions(str(result_path), str(tmp_path / 'collisions.csv'), chunk_size=400,
+                                  n_partitions=3, tmp_dir=str(tmp_path))
+
+    n_shared, n_split, expected = _expected(result_df)
+    assert n_shared and n_split
+    assert summary['shared_fingerprints'] == n_shared
+    assert summary['split_devices'] == n_split
+    assert summary['collision_rows'] == len(expected)
+    pd.testing.assert_frame_equal(pd.read_csv(summary['output_path'], dtype=str), expected)
+
+
+def test_no_collisions_writes_nothing(tmp_path, quiet):
+    result = pd.DataFrame({'new_fingerprint': ['a', 'a', 'b'], 'deviceId': ['x', 'x', 'y'],
+                           'timestamp': ['1', '2', '3']})
+    result.to_csv(tmp_path / 'result.csv', index=False)
+    with quiet():
+        summary = find_collisions(str(tmp_path / 'result.csv'), str(tmp_path / 'collisions.csv'))
+
+    assert summary == {'shared_fingerprints': 0, 'split_devices': 0, 'collision_rows': 0, 'output_path': None}
+    assert not (tmp_path / 'collisions.csv').exists()
@@ -0,0 +1,77 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from device_fingerprint import process_csv_fingerprints
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+COLUMNS = ['timestamp', ANCHOR_FEATURE] + REDUCER_FEATURES + MATCHER_FEATURES
+
+
+def _config(output_path, **options):
+    return dict({
+        'initial_anchor_feature': ANCHOR_FEATURE,
+        'search_space_reducers': REDUCER_FEATURES,
+        'final_identification_features': MATCHER_FEATURES,
+        'timestamp_column': 'timestamp',
+        'columns_to_load': COLUMNS,
+        'id_seed': 4,
+        'analyze_features': False,
+        'output_path': str(output_path),
+    }, **options)
+
+
+def _write_input(df, tmp_path, kind):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if kind == 'parquet':
+        path = tmp_path / 'input.parquet'
+        pq.write_table(table, path, row_group_size=300)
+    elif kind == 'arrow_file':
+        path = tmp_path / 'input.arrow'
+        feather.write_feather(table, path, chunksize=300)
+    else:
+        path = tmp_path / 'input.arrows'
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=300)
+    return path
+
+
+def _process(input_path, output_path, quiet, **options):
+    with quiet():
+        process_csv_fingerprints(str(input_path), _config(output_path, **options))
+    return pd.read_csv(output_path, dtype=str)
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return generate_synthetic_fingerprint_data(2000, seed=21)
+
+
+@pytest.mark.parametrize('kind', ['parquet', 'arrow_file', 'arrow_stream'])
+@pytest.mark.parametrize('chunk_size', [None, 700])
+def test_columnar_input_matches_csv_input(frame, tmp_path, quiet, kind, chunk_size):
+    frame.to_csv(tmp_path / 'input.csv', index=False)
+    expected = _process(tmp_path / 'input.csv', tmp_path / 'expected.csv', quiet)
+
+    result = _process(_write_input(frame, tmp_path, kind), tmp_path / 'output.csv', quiet, chunk_size=chunk_size)
+
+    # Only the projected columns are read
+    assert 'deviceId' not in result.columns
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_time_range_matches_filtering_the_csv_input(frame, tmp_path, quiet):
+    times = frame['timestamp'].astype('int64')
+    start, end = str(times.iloc[500]), str(times.iloc[1500])
+    in_range = frame[(times >= int(start)) & (times < int(end))]
+    in_range.to_csv(tmp_path / 'input.csv', index=False)
+    expected = _process(tmp_path / 'input.csv', tmp_path / 'expected.csv', quiet)
+
+    result = _process(_write_input(frame, tmp_path, 'parquet'), tmp_path / 'output.csv', quiet,
+                      time_range=[start, end])
+
+    assert len(result) == len(in_range)
+    pd.testing.assert_frame_equal(result, expected)
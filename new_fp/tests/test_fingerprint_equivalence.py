@@ -0,0 +1,72 @@
+"""Every engine and optimization must assign the same fingerprints as the python engine in config order."""
+import pandas as pd
+import pytest
+
+from device_fingerprint import NUMBA_AVAILABLE, SmartFingerprintProcessor, process_fingerprints_parallel
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+RESULT_COLUMNS = ['new_fingerprint', 'is_new_fingerprint', 'match_at_feature']
+ID_SEED = 42
+
+# Default shape, plus one with many shared matcher values and fewer anchors so phase 3 decides a quarter of the rows
+FRAMES = {
+    'default': dict(n_rows=6000, seed=1),
+    'colliding': dict(n_rows=6000, seed=2, n_models=20, collision_rate=0.2, churn_rate=0.5,
+                      null_ratios={ANCHOR_FEATURE: 0.3, 'reducer_camera_sensor_hash': 0.2}),
+}
+ENGINES = ['python', pytest.param('numba', marks=pytest.mark.skipif(not NUMBA_AVAILABLE,
+                                                                    reason='numba is not installed'))]
+
+
+@pytest.fixture(scope='module', params=list(FRAMES))
+def frame(request):
+    return generate_synthetic_fingerprint_data(**FRAMES[request.param])
+
+
+def _run(df, quiet, batch_size=None, processor=None, engine='python', anchor_fast_path=True):
+    processor = processor or SmartFingerprintProcessor(id_seed=ID_SEED)
+    batch_size = batch_size or len(df)
+    results = []
+    with quiet():
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size].reset_index(drop=True)
+            results.append(processor.process_fingerprints_smart(
+                batch, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES, engine=engine,
+                anchor_fast_path=anchor_fast_path))
+    return pd.concat(results, ignore_index=True)[RESULT_COLUMNS], processor
+
+
+@pytest.fixture(scope='module')
+def reference(frame, quiet):
+    result, _ = _run(frame, quiet, anchor_fast_path=False)
+    return result
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('anchor_fast_path', [False, True])
+def test_engines_and_options_match_config_order(frame, reference, quiet, engine, anchor_fast_path):
+    result, _ = _run(frame, quiet, engine=engine, anchor_fast_path=anchor_fast_path)
+    pd.testing.assert_frame_equal(result, reference)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_snapshot_resume_matches_one_run(frame, quiet, tmp_path, engine):
+    half = len(frame) // 2
+    continuous, _ = _run(frame, quiet, batch_size=half, engine=engine)
+
+    first, processor = _run(frame.iloc[:half], quiet, engine=engine)
+    with quiet():
+        processor.save_snapshot(str(tmp_path / 'state'))
+        resumed = SmartFingerprintProcessor.load_snapshot(str(tmp_path / 'state'))
+    second, _ = _run(frame.iloc[half:], quiet, processor=resumed, engine=engine)
+
+    pd.testing.assert_frame_equal(pd.concat([first, second], ignore_index=True), continuous)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_parallel_matches_config_order(frame, reference, quiet, engine):
+    with quiet():
+        result = process_fingerprints_parallel(frame, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES,
+                                               n_workers=2, engine=engine, id_seed=ID_SEED)
+    pd.testing.assert_frame_equal(result[RESULT_COLUMNS], reference)
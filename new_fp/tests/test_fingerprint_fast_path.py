@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from device_fingerprint import SmartFingerprintProcessor, process_csv_fingerprints
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+RESULT_COLUMNS = ['new_fingerprint', 'is_new_fingerprint', 'match_at_feature']
+
+
+def _run(batches, quiet, anchor_fast_path, features=(ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)):
+    processor = SmartFingerprintProcessor(id_seed=3)
+    with quiet():
+        return pd.concat([processor.process_fingerprints_smart(batch, *features, anchor_fast_path=anchor_fast_path)
+                          for batch in batches], ignore_index=True)[RESULT_COLUMNS]
+
+
+def test_existing_anchor_with_all_null_matcher_in_a_later_batch(quiet):
+    batches = [pd.DataFrame([{'a': 'x', 'r1': 'r', 'm1': 'm'}]),
+               pd.DataFrame([{'a': 'x', 'r1': 'r', 'm1': None}])]
+    result = _run(batches, quiet, True, features=('a', ['r1'], ['m1']))
+    assert result['new_fingerprint'].nunique() == 1
+    assert result['match_at_feature'].tolist() == ['No Match', 'a']
+
+
+def test_small_batches_of_mostly_null_matchers_match_the_row_by_row_run(quiet):
+    df = generate_synthetic_fingerprint_data(600, seed=12)
+    batches = [df.iloc[start:start + 10].reset_index(drop=True) for start in range(0, len(df), 10)]
+    pd.testing.assert_frame_equal(_run(batches, quiet, True), _run(batches, quiet, False))
+
+
+def test_streaming_small_chunks_matches_one_batch(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(600, seed=13)
+    input_path = tmp_path / 'input.csv'
+    df.to_csv(input_path, index=False)
+    config = {
+        'initial_anchor_feature': ANCHOR_FEATURE,
+        'search_space_reducers': REDUCER_FEATURES,
+        'final_identification_features': MATCHER_FEATURES,
+        'timestamp_column': 'timestamp',
+        'chunk_size': 10,
+        'id_seed': 3,
+        'analyze_features': False,
+        'output_path': str(tmp_path / 'output.csv'),
+    }
+    with quiet():
+        process_csv_fingerprints(str(input_path), config)
+    streamed = pd.read_csv(config['output_path'], dtype=str)
+
+    expected = _run([pd.read_csv(input_path, dtype=str)], quiet, False)
+    np.testing.assert_array_equal(streamed['new_fingerprint'].to_numpy(), expected['new_fingerprint'].to_numpy())
+    np.testing.assert_array_equal(streamed['match_at_feature'].to_numpy(), expected['match_at_feature'].to_numpy())
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from fingerprint_io import UNKNOWN_PARTITION, external_sort_csv, partition_dates
+
+
+def test_partition_dates_puts_null_and_unparseable_times_in_unknown():
+    series = pd.Series(['1700000000000', None, 'not a time', '1700086400', ''])
+    assert partition_dates(series).tolist() == ['2023-11-14', UNKNOWN_PARTITION, UNKNOWN_PARTITION, '2023-11-15',
+                                                UNKNOWN_PARTITION]
+
+
+def test_partition_dates_of_datetime_strings():
+    series = pd.Series(['2024-02-29T23:59:59Z', 'garbage', None])
+    assert partition_dates(series).tolist() == ['2024-02-29', UNKNOWN_PARTITION, UNKNOWN_PARTITION]
+
+
+def test_external_sort_matches_a_stable_in_memory_sort(tmp_path, quiet):
+    rng = np.random.default_rng(3)
+    n_rows = 1000
+    df = pd.DataFrame({
+        'timestamp': rng.integers(1_700_000_000_000, 1_700_000_000_050, n_rows).astype(str),
+        'device': rng.integers(0, 20, n_rows).astype(str),
+        'row': np.arange(n_rows).astype(str),
+    })
+    df.loc[rng.random(n_rows) < 0.05, 'timestamp'] = None
+    input_path, output_path = tmp_path / 'input.csv', tmp_path / 'sorted.csv'
+    df.to_csv(input_path, index=False)
+
+    # 27 runs merged 4 at a time: three merge passes
+    with quiet():
+        n_written = external_sort_csv(str(input_path), str(output_path), ['timestamp', 'device'], chunk_size=37,
+                                      tmp_dir=str(tmp_path), max_merge_width=4)
+
+    expected = df.sort_values(['timestamp', 'device'], kind='stable', na_position='last').reset_index(drop=True)
+    assert n_written == n_rows
+    pd.testing.assert_frame_equal(pd.read_csv(output_path, dtype=str), expected)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['input.csv', 'sorted.csv']
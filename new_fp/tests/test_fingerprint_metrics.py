@@ -0,0 +1,57 @@
+import json
+
+import pandas as pd
+import pytest
+
+from device_fingerprint import SmartFingerprintProcessor
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+from fingerprint_metrics import MatcherMetrics
+
+FEATURES = [ANCHOR_FEATURE] + REDUCER_FEATURES + MATCHER_FEATURES
+
+
+def _run(df, quiet, metrics=None, engine='python'):
+    processor = SmartFingerprintProcessor(metrics=metrics, id_seed=5)
+    with quiet():
+        result = pd.concat([processor.process_fingerprints_smart(df.iloc[start:start + 2000].reset_index(drop=True),
+                                                                 ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES,
+                                                                 engine=engine)
+                            for start in range(0, len(df), 2000)], ignore_index=True)
+    return processor, result
+
+
+@pytest.mark.parametrize('engine', ['python', 'numba'])
+def test_counters_match_the_result_and_do_not_change_it(tmp_path, quiet, engine):
+    df = generate_synthetic_fingerprint_data(6000, seed=8)
+    metrics = MatcherMetrics(jsonl_path=str(tmp_path / 'metrics.jsonl'),
+                             prometheus_path=str(tmp_path / 'metrics.prom'))
+    processor, result = _run(df, quiet, metrics, engine=engine)
+    _, reference = _run(df, quiet, engine=engine)
+    pd.testing.assert_frame_equal(result, reference)
+
+    counts = metrics.to_dict()
+    matched = result.loc[~result['is_new_fingerprint'], 'match_at_feature'].value_counts()
+    assert counts['rows'] == len(df)
+    assert counts['batches'] == 3
+    assert counts['new_fingerprints'] == int(result['is_new_fingerprint'].sum())
+    assert counts['matches'] == {feature: int(matched.get(feature, 0)) for feature in FEATURES}
+    assert counts['anchor_hit_rate'] == pytest.approx(matched.get(ANCHOR_FEATURE, 0) / len(df))
+
+    store = processor.signature_store
+    assert counts['state']['fingerprints'] == result['new_fingerprint'].nunique()
+    assert counts['state']['index_associations'] == int((store.codes[:store.n_fingerprints] >= 0).sum())
+    assert {feature: stats['values'] for feature, stats in counts['dictionaries'].items()} == \
+        {feature: int(df[feature].nunique()) for feature in FEATURES}
+
+    # One forced emit per batch; the Prometheus file holds the final totals
+    with open(tmp_path / 'metrics.jsonl') as f:
+        emitted = [json.loads(line) for line in f]
+    assert [line['rows'] for line in emitted][-3:] == [2000, 4000, 6000]
+    with open(tmp_path / 'metrics.prom') as f:
+        samples = dict(line.rsplit(' ', 1) for line in f.read().splitlines() if not line.startswith('#'))
+    assert int(samples['fingerprint_rows_total']) == len(df)
+    assert int(samples['fingerprint_new_fingerprints_total']) == counts['new_fingerprints']
+    for feature in FEATURES:
+        assert int(samples[f'fingerprint_matches_total{{feature="{feature}"}}']) == counts['matches'][feature]
+
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('numba')
+
+from device_fingerprint import SmartFingerprintProcessor
+from fingerprint_store import InvertedIndex
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+
+def _postings(index):
+    return [{code: index.get(feature_idx, code).tolist() for code in postings}
+            for feature_idx, postings in enumerate(index.postings)]
+
+
+def test_kernel_updates_the_index_incrementally(quiet):
+    df = generate_synthetic_fingerprint_data(40_000, seed=7)
+    processor = SmartFingerprintProcessor()
+    with quiet():
+        for start in range(0, len(df), 10_000):
+            processor.process_fingerprints_smart(df.iloc[start:start + 10_000].reset_index(drop=True),
+                                                 ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES, engine='numba')
+
+    store = processor.signature_store
+    assert _postings(processor.inverted_index) == _postings(InvertedIndex.from_store(store))
+    assert store.n_present == int((store.codes[:store.n_fingerprints] != store.MISSING).sum())
+
+
+def test_small_batch_falls_back_to_python(capsys):
+    df = generate_synthetic_fingerprint_data(20_000, seed=8)
+    processor = SmartFingerprintProcessor()
+    processor.process_fingerprints_smart(df.iloc[:19_900], ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES,
+                                         engine='numba')
+    capsys.readouterr()
+    processor.process_fingerprints_smart(df.iloc[19_900:].reset_index(drop=True), ANCHOR_FEATURE,
+                                         REDUCER_FEATURES, MATCHER_FEATURES, engine='numba')
+    assert "with engine='python'" in capsys.readouterr().out
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from device_fingerprint import SmartFingerprintProcessor
+from fingerprint_store import FingerprintIdMap, InvertedIndex
+from fingerprint_pool import ColdFingerprintTier, FingerprintProcessorPool
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+
+def test_evicting_a_few_fingerprints_compacts_the_index(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(20_000, seed=5)
+    processor = SmartFingerprintProcessor()
+    with quiet():
+        processor.process_fingerprints_smart(df, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)
+    processor.cold_tier = ColdFingerprintTier(str(tmp_path / 'cold'))
+
+    # Few enough that postings are discarded one by one instead of rebuilding the index
+    processor.cold_tier.evict(processor, np.arange(300))
+    rebuilt = InvertedIndex.from_store(processor.signature_store)
+    assert processor.inverted_index.memory_usage() <= rebuilt.memory_usage() * 1.05
+
+
+def test_enforce_budget_gets_under_budget_without_changing_results(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(30_000, seed=6)
+    batches = [df.iloc[start:start + 5000].reset_index(drop=True) for start in range(0, len(df), 5000)]
+
+    reference = SmartFingerprintProcessor(id_seed=1)
+    with quiet():
+        expected = pd.concat([reference.process_fingerprints_smart(batch, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                                                   MATCHER_FEATURES) for batch in batches],
+                             ignore_index=True)
+
+    budget = reference.memory_usage() // 2
+    pool = FingerprintProcessorPool(str(tmp_path / 'pool'), memory_budget=budget)
+    pool.get('tenant').id_map = FingerprintIdMap(1)
+    with quiet():
+        results = pd.concat([pool.process('tenant', batch, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)
+                             for batch in batches], ignore_index=True)
+
+    assert pool.memory_report()['tenant']['memory_bytes'] <= budget
+    assert pool.memory_report()['tenant']['cold_fingerprints'] > 0
+    pd.testing.assert_series_equal(results['new_fingerprint'], expected['new_fingerprint'])
+
+
+def test_enforce_budget_does_not_evict_what_compaction_frees(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(60_000, seed=14)
+    batches = [df.iloc[start:start + 10_000].reset_index(drop=True) for start in range(0, len(df), 10_000)]
+
+    reference = SmartFingerprintProcessor()
+    with quiet():
+        for batch in batches:
+            reference.process_fingerprints_smart(batch, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)
+    reference.signature_store.compact()
+    reference.inverted_index.compact()
+
+    pool = FingerprintProcessorPool(str(tmp_path / 'pool'), memory_budget=int(reference.memory_usage() * 1.05))
+    with quiet():
+        for batch in batches:
+            pool.process('tenant', batch, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)
+    assert pool.memory_report()['tenant']['cold_fingerprints'] == 0
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from device_fingerprint import analyze_dataset_characteristics
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+from fingerprint_profile import HyperLogLog, SpaceSaving, profile_csv
+
+FEATURES = [ANCHOR_FEATURE] + REDUCER_FEATURES + MATCHER_FEATURES
+
+
+def _hashes(values):
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).values
+
+
+@pytest.mark.parametrize('n_distinct', [50, 3000, 200_000])
+def test_hyperloglog_count_is_within_four_standard_errors(n_distinct):
+    sketch = HyperLogLog(precision=12)
+    values = [f'value_{i}' for i in range(n_distinct)]
+    # Repeated values never change the registers
+    sketch.add_hashes(_hashes(values + values[:n_distinct // 2]))
+
+    standard_error = 1.04 / np.sqrt(2 ** 12)
+    assert abs(sketch.count() - n_distinct) <= 4 * standard_error * n_distinct + 1
+
+
+def test_merged_hyperloglog_equals_the_sketch_of_all_values():
+    hashes = _hashes([f'value_{i}' for i in range(20_000)])
+    whole = HyperLogLog(precision=10)
+    whole.add_hashes(hashes)
+    merged = HyperLogLog(precision=10)
+    for part in np.array_split(hashes, 7):
+        sketch = HyperLogLog(precision=10)
+        sketch.add_hashes(part)
+        merged.merge(sketch)
+
+    assert np.array_equal(merged.registers, whole.registers)
+    with pytest.raises(ValueError):
+        merged.merge(HyperLogLog(precision=11))
+
+
+def test_space_saving_counts_stay_within_the_floor_of_the_true_counts():
+    rng = np.random.default_rng(7)
+    stream = pd.Series(rng.zipf(1.3, 100_000) % 5000)
+    summary = SpaceSaving(capacity=100)
+    for start in range(0, len(stream), 4347):
+        summary.add_counts(stream.iloc[start:start + 4347].value_counts())
+
+    true_counts = stream.value_counts()
+    floor = summary._floor()
+    assert len(summary.counts) == 100
+    for value, count in summary.counts.items():
+        assert true_counts[value] <= count <= true_counts[value] + floor
+    # Any value left out occurred at most `floor` times, so every heavier value is tracked
+    assert set(true_counts[true_counts > floor].index) <= set(summary.counts)
+    assert [value for value, _ in summary.top(5)] == true_counts.index[:5].tolist()
+
+
+def test_profile_matches_the_exact_analysis(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(20_000, seed=17)
+    df.to_csv(tmp_path / 'input.csv', index=False)
+    with quiet():
+        exact = analyze_dataset_characteristics(pd.read_csv(tmp_path / 'input.csv', dtype=str), FEATURES)
+
+    profile = profile_csv(str(tmp_path / 'input.csv'), FEATURES, chunk_size=3000)
+    sketched = profile.analysis()
+    parallel = profile_csv(str(tmp_path / 'input.csv'), FEATURES, chunk_size=3000, n_workers=2).analysis()
+
+    assert sketched == parallel
+    assert set(sketched) == set(exact)
+    standard_error = 1.04 / np.sqrt(2 ** 14)
+    for feature, stats in exact.items():
+        assert sketched[feature]['total_values'] == stats['total_values']
+        assert sketched[feature]['null_ratio'] == pytest.approx(stats['null_ratio'])
+        assert abs(sketched[feature]['unique_values'] - stats['unique_values']) <= \
+            4 * standard_error * stats['unique_values'] + 1
+        assert sketched[feature]['top_10_coverage'] >= stats['top_10_coverage'] - 1e-12
@@ -0,0 +1,93 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from device_fingerprint import SmartFingerprintProcessor
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+from fingerprint_service import FingerprintClient, FingerprintLookupService, start_lookup_server
+
+RESULT_COLUMNS = ['new_fingerprint', 'is_new_fingerprint', 'match_at_feature']
+N_HISTORY = 3000
+
+
+def _primed_service(df, quiet, update=True):
+    processor = SmartFingerprintProcessor(id_seed=6)
+    with quiet():
+        processor.process_fingerprints_smart(df.iloc[:N_HISTORY].reset_index(drop=True), ANCHOR_FEATURE,
+                                             REDUCER_FEATURES, MATCHER_FEATURES)
+    return FingerprintLookupService(processor, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES, update=update)
+
+
+def _payloads(df):
+    return [{feature: (None if pd.isna(value) else value) for feature, value in row.items()}
+            for row in df.astype(object).to_dict('records')]
+
+
+def _signatures(processor):
+    store = processor.signature_store
+    features = [ANCHOR_FEATURE] + REDUCER_FEATURES + MATCHER_FEATURES
+    return [{feature: processor.category_dictionaries[feature].decode(code)
+             for feature, code in zip(features, row) if code >= 0}
+            for row in store.codes[:store.n_fingerprints].tolist()]
+
+
+def test_lookups_match_batch_processing_of_the_same_rows(quiet):
+    df = generate_synthetic_fingerprint_data(4000, seed=12)
+    processor = SmartFingerprintProcessor(id_seed=6)
+    with quiet():
+        expected = pd.concat([processor.process_fingerprints_smart(batch.reset_index(drop=True), ANCHOR_FEATURE,
+                                                                   REDUCER_FEATURES, MATCHER_FEATURES)
+                              for batch in (df.iloc[:N_HISTORY], df.iloc[N_HISTORY:])], ignore_index=True)
+
+    service = _primed_service(df, quiet)
+    payloads = _payloads(df.iloc[N_HISTORY:])
+    # Single lookups and micro-batches both apply their updates in row order
+    results = [service.lookup(payload) for payload in payloads[:100]]
+    for start in range(100, len(payloads), 64):
+        results.extend(service.lookup_batch(payloads[start:start + 64]))
+
+    pd.testing.assert_frame_equal(pd.DataFrame(results, columns=RESULT_COLUMNS),
+                                  expected.iloc[N_HISTORY:][RESULT_COLUMNS].reset_index(drop=True),
+                                  check_dtype=False)
+    # The service encodes row by row, so dictionary codes may differ; the signature values may not
+    assert _signatures(service.processor) == _signatures(processor)
+
+
+def test_read_only_lookups_leave_the_state_alone(quiet):
+    df = generate_synthetic_fingerprint_data(4000, seed=12)
+    service = _primed_service(df, quiet, update=False)
+    store = service.processor.signature_store
+    n_fingerprints = store.n_fingerprints
+    codes = store.codes[:n_fingerprints].copy()
+    dictionaries = service.processor.category_dictionaries
+    dictionary_sizes = {feature: len(dictionary) for feature, dictionary in dictionaries.items()}
+
+    payloads = _payloads(df.iloc[N_HISTORY:])
+    results = service.lookup_batch(payloads)
+
+    assert service.lookup_batch(payloads) == results
+    assert all(result['new_fingerprint'] is None for result in results if result['is_new_fingerprint'])
+    assert any(result['new_fingerprint'] is not None for result in results)
+    assert store.n_fingerprints == n_fingerprints
+    assert np.array_equal(store.codes[:n_fingerprints], codes)
+    assert {feature: len(dictionary) for feature, dictionary in dictionaries.items()} == dictionary_sizes
+
+
+def test_server_round_trip_matches_direct_lookups(quiet):
+    df = generate_synthetic_fingerprint_data(3500, seed=13)
+    payloads = _payloads(df.iloc[N_HISTORY:])
+    expected = _primed_service(df, quiet).lookup_batch(payloads)
+
+    async def serve_and_lookup(service):
+        server = await start_lookup_server(service, port=0)
+        client = await FingerprintClient(port=server.sockets[0].getsockname()[1]).connect()
+        try:
+            return [await client.lookup(payloads[0])] + await client.lookup_batch(payloads[1:])
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(serve_and_lookup(_primed_service(df, quiet))) == expected
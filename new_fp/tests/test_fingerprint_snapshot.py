@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import device_fingerprint
+from device_fingerprint import SmartFingerprintProcessor, snapshot_exists
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+
+def _processor(df, quiet):
+    processor = SmartFingerprintProcessor(id_seed=1)
+    with quiet():
+        processor.process_fingerprints_smart(df, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES)
+    return processor
+
+
+def test_interrupted_save_keeps_the_previous_snapshot(tmp_path, monkeypatch, quiet):
+    df = generate_synthetic_fingerprint_data(4000, seed=9)
+    path = str(tmp_path / 'state')
+    first = _processor(df.iloc[:2000].reset_index(drop=True), quiet)
+    with quiet():
+        first.save_snapshot(path)
+
+    second = _processor(df, quiet)
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(device_fingerprint, 'save_category_dictionaries', crash)
+    with pytest.raises(KeyboardInterrupt), quiet():
+        second.save_snapshot(path)
+    monkeypatch.undo()
+
+    assert sorted(os.listdir(tmp_path)) == ['state']
+    with quiet():
+        loaded = SmartFingerprintProcessor.load_snapshot(path)
+    assert loaded.signature_store.n_fingerprints == first.signature_store.n_fingerprints
+
+
+def test_swap_interrupted_before_moving_the_new_snapshot_in_rolls_back(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(2000, seed=10)
+    path = str(tmp_path / 'state')
+    processor = _processor(df, quiet)
+    with quiet():
+        processor.save_snapshot(path)
+    # What a crash between the two renames of save_snapshot leaves behind
+    os.replace(path, path + '.previous')
+
+    assert snapshot_exists(path)
+    with quiet():
+        loaded = SmartFingerprintProcessor.load_snapshot(path)
+        processor.save_snapshot(path)
+    assert loaded.signature_store.n_fingerprints == processor.signature_store.n_fingerprints
+    assert sorted(os.listdir(tmp_path)) == ['state']
+
+
+def test_loaded_index_matches_the_saved_one(tmp_path, quiet):
+    processor = _processor(generate_synthetic_fingerprint_data(5000, seed=11), quiet)
+    with quiet():
+        processor.save_snapshot(str(tmp_path / 'state'))
+        loaded = SmartFingerprintProcessor.load_snapshot(str(tmp_path / 'state'))
+
+    for feature_idx, postings in enumerate(processor.inverted_index.postings):
+        loaded_postings = loaded.inverted_index.postings[feature_idx]
+        assert sorted(loaded_postings) == sorted(postings)
+        for code, posting in postings.items():
+            assert type(loaded_postings[code]) is type(posting)
+            assert loaded.inverted_index.get(feature_idx, code).tolist() == \
+                processor.inverted_index.get(feature_idx, code).tolist()
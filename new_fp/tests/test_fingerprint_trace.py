@@ -0,0 +1,56 @@
+import json
+
+from device_fingerprint import SmartFingerprintProcessor
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+from fingerprint_trace import FingerprintTracer
+
+
+def _outcomes(events):
+    return [event for event in events if 'fingerprint' in event]
+
+
+def test_traced_anchor_outcomes_match_the_result_and_the_file_is_closed(tmp_path, quiet):
+    df = generate_synthetic_fingerprint_data(3000, seed=4)
+    anchor_value = df[ANCHOR_FEATURE].dropna().value_counts().index[0]
+    traced_rows = df.index[df[ANCHOR_FEATURE] == anchor_value].tolist()
+    path = tmp_path / 'trace.jsonl'
+
+    tracer = FingerprintTracer(anchor_values=[anchor_value], path=str(path), echo=False,
+                               follow_fingerprints=False)
+    processor = SmartFingerprintProcessor(tracer=tracer, id_seed=2)
+    results = []
+    with quiet():
+        for start in (0, 1500):
+            batch = df.iloc[start:start + 1500].reset_index(drop=True)
+            results.append(processor.process_fingerprints_smart(batch, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                                                MATCHER_FEATURES))
+            # Closed after every batch; the second batch reopens the file for appending
+            assert tracer._file is None
+
+    outcomes = _outcomes(tracer.events)
+    assert len(outcomes) == len(traced_rows)
+    for event, row_idx in zip(outcomes, traced_rows):
+        batch_result = results[row_idx // 1500]
+        assert event['row_idx'] == row_idx % 1500
+        assert event['fingerprint'] == batch_result['new_fingerprint'].iloc[row_idx % 1500]
+        expected_feature = batch_result['match_at_feature'].iloc[row_idx % 1500]
+        assert event['matched_feature'] == (None if expected_feature == 'No Match' else expected_feature)
+
+    with open(path) as f:
+        written = [json.loads(line) for line in f]
+    assert len(written) == tracer.n_events
+    assert [event['fingerprint'] for event in _outcomes(written)] == [event['fingerprint'] for event in outcomes]
+
+
+def test_tracer_closes_its_file_as_a_context_manager(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    with FingerprintTracer(path=str(path), echo=False) as tracer:
+        tracer.log('first', 0)
+        assert not tracer._file.closed
+    assert tracer._file is None
+    tracer.log('second', 1)
+    tracer.close()
+
+    with open(path) as f:
+        assert [json.loads(line)['message'] for line in f] == ['first', 'second']
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from device_fingerprint import SmartFingerprintProcessor
+from fingerprint_benchmark import (generate_synthetic_fingerprint_data, ANCHOR_FEATURE, REDUCER_FEATURES,
+                                   MATCHER_FEATURES)
+
+DAY_MS = 86_400_000
+
+
+def _process(processor, df, quiet):
+    with quiet():
+        return processor.process_fingerprints_smart(df, ANCHOR_FEATURE, REDUCER_FEATURES, MATCHER_FEATURES,
+                                                    time_column='timestamp')
+
+
+def test_null_timestamp_does_not_advance_the_data_clock(quiet):
+    df = generate_synthetic_fingerprint_data(2000, seed=3)
+    times = 1_700_000_000_000 + np.arange(len(df)) * (60 * DAY_MS // len(df))
+    df['timestamp'] = times.astype(str)
+    df.loc[1500, 'timestamp'] = np.nan
+    df.loc[1600, 'timestamp'] = 'not a time'
+
+    processor = SmartFingerprintProcessor()
+    _process(processor, df, quiet)
+    store = processor.signature_store
+    last_seen = store.last_seen[:store.n_fingerprints].copy()
+
+    valid_times = np.delete(times, [1500, 1600])
+    assert last_seen.max() == valid_times.max()
+    assert (last_seen > 0).all()
+
+    with quiet():
+        n_expired = processor.expire_fingerprints(30 * DAY_MS)
+    assert n_expired == int((last_seen < valid_times.max() - 30 * DAY_MS).sum())
+    assert 0 < n_expired < store.n_fingerprints
+
+
+def test_fingerprint_created_by_untimed_row_gets_latest_valid_time(quiet):
+    df = generate_synthetic_fingerprint_data(200, seed=4)
+    df['timestamp'] = (1_700_000_000_000 + np.arange(len(df)) * 1000).astype(str)
+    untimed = df.iloc[[0]].copy()
+    untimed[ANCHOR_FEATURE] = untimed[ANCHOR_FEATURE].astype(object)
+    untimed.loc[:, ANCHOR_FEATURE] = 'never-seen-anchor'
+    for feature in REDUCER_FEATURES + MATCHER_FEATURES:
+        untimed[feature] = np.nan
+    untimed['timestamp'] = np.nan
+
+    processor = SmartFingerprintProcessor()
+    _process(processor, pd.concat([df, untimed], ignore_index=True), quiet)
+    store = processor.signature_store
+    assert store.last_seen[store.n_fingerprints - 1] == 1_700_000_000_000 + (len(df) - 1) * 1000
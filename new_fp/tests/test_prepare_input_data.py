@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+
+import numpy as np
+import pytest
+
+from prepare_input_data_for_fingerprint import record_aligned_ranges, stream_process_csv
+
+
+def _write_raw_input(path, n_rows, seed=0, trailing_newline=True):
+    rng = np.random.default_rng(seed)
+    header = ['timestamp', 'deviceId', 'androidId', 'adId', 'modelName', 'latitude', 'longitude',
+              'totalInternalStorageSpace.total', 'totalInternalStorageSpace.available', 'systemPropertiesParsed']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(n_rows):
+            properties = {
+                'ro.product.model': f'model "{i % 7}"',
+                'ro.boot.hw.soc.id': str(rng.integers(0, 50)),
+                'vendor.debug.gps.c0': str(rng.choice(['0', '1.5', 'inf', ''])),
+                'vendor.debug.gps.c1': '2.5',
+                # Quoted newlines must not end a record
+                'gsm.serial': 'line one\nline two' if i % 5 == 0 else f'serial-{i}',
+            }
+            system_properties = '' if i % 11 == 0 else json.dumps(properties)  # Invalid rows are skipped
+            writer.writerow([1_700_000_000_000 + i, f'device-{i % 40}', f'android-{i % 60}', f'ad-{i % 90}',
+                             'model, with comma', f'{12.9 + i / 1000:.4f}', '77.5946', '128000', str(1000 * (i % 97)),
+                             system_properties])
+    if not trailing_newline:
+        with open(path, 'rb+') as f:
+            f.seek(-2, 2)
+            f.truncate()
+
+
+@pytest.mark.parametrize('trailing_newline', [True, False])
+def test_ranges_cover_the_file_in_whole_records(tmp_path, trailing_newline):
+    path = tmp_path / 'input.csv'
+    _write_raw_input(path, 300, trailing_newline=trailing_newline)
+    header, ranges = record_aligned_ranges(str(path), range_bytes=1000)
+
+    data = path.read_bytes()
+    expected = list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+    assert header == expected[0]
+    assert len(ranges) > 10
+    assert ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    records = []
+    for start, end in ranges:
+        records.extend(csv.reader(io.StringIO(data[start:end].decode('utf-8'), newline='')))
+    assert records == expected[1:]
+
+
+@pytest.mark.parametrize('range_bytes', [500, 5000, 10 ** 7])
+def test_parallel_output_is_byte_identical_to_the_serial_output(tmp_path, quiet, range_bytes):
+    input_path = tmp_path / 'input.csv'
+    _write_raw_input(input_path, 400, seed=3)
+    with quiet():
+        serial = stream_process_csv(str(input_path), str(tmp_path / 'serial.csv'), chunk_size=64)
+        parallel = stream_process_csv(str(input_path), str(tmp_path / 'parallel.csv'), n_workers=3,
+                                      range_bytes=range_bytes)
+
+    assert serial == parallel == (400, 400 - 37)
+    assert (tmp_path / 'parallel.csv').read_bytes() == (tmp_path / 'serial.csv').read_bytes()